@@ -1,9 +1,10 @@
 import dash
 from dash import dcc, html
-import pandas as pd
 
 from agility.components import Sidebar
 from budge.config.main import CONFIG_SIDEBAR, STORE_ID, DATA_STORE
+from budge.core import catalog, catalog_api
+from budge.monitoring import metrics, payload, profiling
 from budge.project import Project
 
 external_scripts = [
@@ -31,28 +32,44 @@ def init_app(
         title=app_title,  # Update title if needed or use a variable
     )
     #    dash_app.config.suppress_callback_exceptions = True
+    metrics.instrument_app(dash_app, f"/{project_slug}/metrics")
+    payload.instrument_app(dash_app, f"/{project_slug}/payloads")
+    profiling.instrument_app(dash_app)
+    catalog_api.register_routes(dash_app, route_path_name)
 
     sidebar = Sidebar(CONFIG_SIDEBAR, STORE_ID, Project(), dash_app)
-    material_data = pd.read_csv(
-        "materials_factor.csv", encoding="ISO-8859-1"
-    ).to_dict()
+    sidebar_layout = sidebar.layout()
+    # builds the search index once, up front, instead of on the first search
+    catalog.load_catalog()
+    catalog.start_watcher()
 
-    dash_app.layout = html.Div(
-        [
-            dcc.Store(id=STORE_ID, storage_type="session", data=None),
-            dcc.Store(id = DATA_STORE, storage_type="session", data = material_data),
-            dcc.Location(id="url", refresh=False),
-            html.Div(
-                sidebar.layout(),
-                className="w-72 border-r-2 border-gray-200 min-h-screen",
-            ),
-            html.Div(
-                id="page-content", children=[dash.page_container], className="w-full"
-            ),
-            #  dash.page_container,
-        ],
-        className="flex min-h-screen w-full bg-gray-100",
-    )
+    # a function, so every page load reports the catalog version current at that time
+    def layout():
+        version = catalog.get_catalog().version
+        return html.Div(
+            [
+                dcc.Store(id=STORE_ID, storage_type="session", data=None),
+                # the catalog itself is fetched from its cacheable endpoint, not shipped with the layout;
+                # kept in memory, as a session copy would pin the version of the first page load
+                dcc.Store(
+                    id=DATA_STORE,
+                    storage_type="memory",
+                    data={"version": version, "url": catalog_api.catalog_url(route_path_name, version)},
+                ),
+                dcc.Location(id="url", refresh=False),
+                html.Div(
+                    sidebar_layout,
+                    className="w-72 border-r-2 border-gray-200 min-h-screen",
+                ),
+                html.Div(
+                    id="page-content", children=[dash.page_container], className="w-full"
+                ),
+                #  dash.page_container,
+            ],
+            className="flex min-h-screen w-full bg-gray-100",
+        )
+
+    dash_app.layout = layout
 
     """ 
     dash_app.layout = html.Div(
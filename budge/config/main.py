@@ -1,5 +1,13 @@
+import os
+
 STORE_ID = "budge" + "_store"
 DATA_STORE = "material_store_data"
+MATERIAL_DATA_PATH = os.environ.get("BUDGE_MATERIAL_DATA", "materials_factor.csv")
+# Catalog layers stacked over the base catalog, lowest priority first, as
+# "name=path" entries separated by os.pathsep, e.g. "vendor=vendor.csv;client=acme.csv"
+CATALOG_LAYERS = os.environ.get("BUDGE_CATALOG_LAYERS", "")
+# Seconds between checks of the catalog file for changes; 0 disables hot reload
+CATALOG_POLL_INTERVAL = float(os.environ.get("BUDGE_CATALOG_POLL_INTERVAL", 30))
 PROJECT_NAME = "budge".replace("_", " ").title()
 PROJECT_SLUG = "budge"
 
@@ -10,5 +18,50 @@ CONFIG_SIDEBAR = {
         {"name": "Start", "path": "bw-start"},
         {"name": "BudgeWiser", "path": "bw-estimation"},
         {"name": "Report", "path": "bw-report"},
+        {"name": "History", "path": "bw-history"},
     ],
 }
+
+# Server-side project storage. Leave BUDGE_PROJECT_DB unset to keep the whole
+# project in the browser session store.
+PROJECT_DB_PATH = os.environ.get("BUDGE_PROJECT_DB", "")
+PROJECT_MAX_BYTES = int(os.environ.get("BUDGE_PROJECT_MAX_BYTES", 10_000_000))
+PROJECT_MAX_LINE_ITEMS = int(os.environ.get("BUDGE_PROJECT_MAX_LINE_ITEMS", 20_000))
+PROJECT_IDLE_TIMEOUT = float(os.environ.get("BUDGE_PROJECT_IDLE_TIMEOUT", 7 * 24 * 3600))
+# Revisions kept per server-side project, 0 disables the history; a full
+# snapshot is stored every BUDGE_HISTORY_SNAPSHOT_INTERVAL revisions
+PROJECT_HISTORY_REVISIONS = int(os.environ.get("BUDGE_PROJECT_HISTORY", 200))
+HISTORY_SNAPSHOT_INTERVAL = int(os.environ.get("BUDGE_HISTORY_SNAPSHOT_INTERVAL", 25))
+
+# Shared on-disk cache of computed project results, used by every worker
+# process on the host and kept across restarts; leave BUDGE_RESULT_CACHE unset
+# to keep results in process memory only
+RESULT_CACHE_PATH = os.environ.get("BUDGE_RESULT_CACHE", "")
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("BUDGE_RESULT_CACHE_MAX_BYTES", 256_000_000))
+RESULT_CACHE_MAX_ENTRY_BYTES = int(os.environ.get("BUDGE_RESULT_CACHE_MAX_ENTRY_BYTES", 16_000_000))
+
+# Largest number of parallel units tried when splitting an item sized beyond its range
+MAX_PARALLEL_UNITS = int(os.environ.get("BUDGE_MAX_PARALLEL_UNITS", 10))
+
+# Callback and function timing, exported at /<project slug>/metrics
+METRICS_ENABLED = os.environ.get("BUDGE_METRICS", "1") != "0"
+# Size accounting of the project and catalog stores in callback payloads,
+# summarised at /<project slug>/payloads
+PAYLOAD_TRACKING = os.environ.get("BUDGE_PAYLOAD_TRACKING", "1") != "0"
+PAYLOAD_WARN_BYTES = int(os.environ.get("BUDGE_PAYLOAD_WARN_BYTES", 1_000_000))
+# Request profiling: BUDGE_PROFILE=1 profiles every callback whose output id
+# contains BUDGE_PROFILE_TARGET; clients that send BUDGE_PROFILE_TOKEN in the
+# X-Budge-Profile-Token header, or connect from an allow-listed address, can
+# instead send the X-Budge-Profile header for a single request. Both are off by
+# default. Behind a reverse proxy every request comes from the proxy's address,
+# so use the token there.
+PROFILE_ENABLED = os.environ.get("BUDGE_PROFILE", "0") == "1"
+PROFILE_TARGET = os.environ.get("BUDGE_PROFILE_TARGET", "")
+PROFILE_ALLOWED_ADDRS = tuple(
+    addr.strip()
+    for addr in os.environ.get("BUDGE_PROFILE_ALLOWED_ADDRS", "").split(",")
+    if addr.strip()
+)
+PROFILE_TOKEN = os.environ.get("BUDGE_PROFILE_TOKEN", "")
+PROFILE_DIR = os.environ.get("BUDGE_PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.environ.get("BUDGE_PROFILE_KEEP", 50))
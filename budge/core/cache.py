@@ -0,0 +1,94 @@
+"""Process-wide caches that many threads read and write at once.
+
+Reads take no lock. Entries live in a plain dict that only writers modify,
+under the cache's lock; a dict lookup is atomic in CPython, so a reader sees
+either the old or the new entry, never a torn one. Recency is tracked by
+stamping each entry with a tick from a shared counter on every hit, which
+readers can do without a lock, and the least recently stamped entries are
+evicted by the writer that overflows the cache. Eviction drops a slice of the
+cache at once so its sort is paid rarely.
+
+Cached values are shared between threads, so they must not be modified after
+they are stored; ``freeze`` makes numpy arrays read-only to enforce this.
+"""
+
+import itertools
+import threading
+from typing import Any, Callable, Dict, Hashable, List
+
+import numpy as np
+
+_MISSING = object()
+
+
+def freeze(value):
+    """Makes the numpy arrays in ``value``, a result built from dicts, lists and tuples, read-only. Returns ``value``."""
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    elif isinstance(value, dict):
+        for item in value.values():
+            freeze(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            freeze(item)
+    return value
+
+
+class SharedCache:
+    """
+    Least recently used cache with lock-free reads.
+
+    Args:
+        maxsize (int): Number of entries kept.
+        evict_fraction (float): Share of the entries dropped when the cache overflows.
+    """
+
+    def __init__(self, maxsize: int, evict_fraction: float = 0.125):
+        self.maxsize = maxsize
+        self._evict = max(1, int(maxsize * evict_fraction))
+        self._entries: Dict[Hashable, List[Any]] = {}
+        self._clock = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        entry[1] = next(self._clock)
+        return entry[0]
+
+    def put(self, key, value):
+        """Stores ``value`` unless another thread stored one for ``key`` first. Returns the stored value."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry[0]
+            self._entries[key] = [value, next(self._clock)]
+            if len(self._entries) > self.maxsize:
+                oldest = sorted(self._entries.items(), key=lambda item: item[1][1])
+                for victim, _ in oldest[: len(self._entries) - self.maxsize + self._evict - 1]:
+                    del self._entries[victim]
+        return value
+
+    def get_or_compute(self, key, compute: Callable[[], Any]):
+        """
+        The cached value for ``key``, computed and stored on a miss.
+
+        ``compute`` runs without the lock held, so two threads that miss the
+        same key at once may both compute it; the first value stored wins and
+        both return it.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = self.put(key, compute())
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries = {}
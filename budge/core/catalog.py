@@ -0,0 +1,365 @@
+"""Process-wide material factor catalog with layering and hot reload.
+
+A catalog is built from one or more layers: the base catalog, then for example
+vendor quotes, then client-specific overrides. Layers are merged once at build
+time, so a lookup costs the same however many layers there are.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from budge.config.main import CATALOG_LAYERS, CATALOG_POLL_INTERVAL, MATERIAL_DATA_PATH
+from budge.core.curves import CostCurves
+from budge.core.definitions import Factors
+from budge.core.records import CatalogArrays, CatalogRow
+from budge.core.schema import categorize, conform, read_dtypes
+from budge.core.search import CatalogSearchIndex
+from budge.core.units import REGISTRY
+
+BASE_LAYER = "base"
+
+# (layer name, csv path), lowest priority first
+Layers = Sequence[Tuple[str, str]]
+
+logger = logging.getLogger(__name__)
+
+
+def read_material_data(path, name: str = BASE_LAYER) -> pd.DataFrame:
+    """
+    Reads a material factor csv file, or a buffer holding one, and checks it against the catalog schema.
+
+    Raises:
+        CatalogSchemaError: If the file does not match the schema.
+    """
+    return conform(pd.read_csv(path, encoding="ISO-8859-1", dtype=read_dtypes()), name)
+
+
+def parse_layers(spec: str = CATALOG_LAYERS, base_path: str = MATERIAL_DATA_PATH) -> List[Tuple[str, str]]:
+    """
+    Turns a layer specification into ``(name, path)`` pairs, starting with the base catalog.
+
+    Args:
+        spec (str): "name=path" entries separated by ``os.pathsep``.
+        base_path (str): Path of the base catalog.
+    """
+    layers = [(BASE_LAYER, base_path)]
+    for entry in filter(None, (e.strip() for e in spec.split(os.pathsep))):
+        name, sep, path = entry.partition("=")
+        if not sep or not name or not path:
+            raise ValueError(f"Catalog layer must be given as name=path, got '{entry}'")
+        layers.append((name.strip(), path.strip()))
+    return layers
+
+
+def read_layer_files(layers: Layers) -> Tuple[str, List[Tuple[str, bytes]]]:
+    """
+    Reads every layer file once.
+
+    Returns:
+        tuple: The short content hash over all layer files, used as the catalog
+        version, and the ``(name, content)`` of each layer.
+    """
+    digest = hashlib.sha256()
+    contents = []
+    for name, path in layers:
+        with open(path, "rb") as f:
+            content = f.read()
+        digest.update(name.encode())
+        digest.update(content)
+        contents.append((name, content))
+    return digest.hexdigest()[:16], contents
+
+
+def layers_signature(layers: Layers) -> Tuple[Tuple[int, int], ...]:
+    """Cheap change detection: modification time and size of every layer file."""
+    signature = []
+    for _, path in layers:
+        stat = os.stat(path)
+        signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def merge_layers(frames: Sequence[Tuple[str, pd.DataFrame]]) -> pd.DataFrame:
+    """
+    Stacks catalog layers into one table, lowest priority first.
+
+    A row in a higher layer overrides the row with the same method, plant type,
+    equipment and equipment type below it. Cells it leaves empty keep the value
+    from below, so a vendor layer can carry just the cost coefficients. Rows
+    that only exist in a higher layer are added. The ``Layer`` column names the
+    highest layer that contributed to each row. Keys must be unique within a
+    layer, which ``read_material_data`` checks.
+    """
+    key = list(Factors.KEY_COLUMNS)
+    merged = None
+    for name, frame in frames:
+        missing = set(key) - set(frame.columns)
+        if missing:
+            raise ValueError(f"Catalog layer '{name}' is missing columns: {', '.join(sorted(missing))}")
+        frame = frame.assign(**{Factors.LAYER: name})
+        frame = frame.set_index(key)
+        if merged is None:
+            merged = frame
+            continue
+        for column in frame.columns.difference(merged.columns, sort=False):
+            merged[column] = pd.Series(np.nan, index=merged.index, dtype=frame[column].dtype)
+        overridden = frame.index.isin(merged.index)
+        merged.update(frame[overridden])
+        merged = pd.concat([merged, frame[~overridden]])
+    return merged.reset_index()
+
+
+class Catalog:
+    """
+    The material factor data together with the indexes built from it.
+
+    Text columns are categoricals, so filtering on them compares integer codes
+    (see ``mask`` and ``options``). A catalog is never modified after it is built. Reloading builds a new
+    catalog and swaps it in, so a request that fetched a catalog keeps a
+    consistent view until it finishes.
+
+    Attributes:
+        data (pd.DataFrame): The material factor table.
+        version (str): Identifies the source data; changes whenever the data does.
+        search_index (CatalogSearchIndex): Free text index over the equipment columns.
+        curves (CostCurves): Tabulated cost curves of the rows that have one.
+        arrays (CatalogArrays): The typed fields as one numpy array per column.
+    """
+
+    def __init__(self, data: pd.DataFrame, version: str = ""):
+        self.data = data.reset_index(drop=True)
+        if Factors.LAYER not in self.data:
+            self.data[Factors.LAYER] = BASE_LAYER
+        categorize(self.data)
+        self.version = version
+        self.curves = CostCurves.from_catalog(self.data)
+        if len(self.curves):
+            # a curve without explicit limits is valid over its tabulated range
+            rows = np.flatnonzero(self.curves.curve_of_row >= 0)
+            bounds = self.curves.bounds()[self.curves.curve_of_row[rows]]
+            for column, bound in ((Factors.S_LOWER, bounds[:, 0]), (Factors.S_UPPER, bounds[:, 1])):
+                values = self.data[column].to_numpy(dtype=float, copy=True)
+                values[rows] = np.where(np.isnan(values[rows]), bound, values[rows])
+                self.data[column] = values
+        self.arrays = CatalogArrays.from_frame(self.data)
+        self.codes: Dict[str, np.ndarray] = {
+            column: self.data[column].cat.codes.to_numpy()
+            for column in self.data.columns
+            if isinstance(self.data[column].dtype, pd.CategoricalDtype)
+        }
+        # unit registry index of each row's sizing unit, for converting entered sizes
+        self.unit_ids = REGISTRY.indices(self.data[Factors.UNITS].to_numpy(dtype=object))
+        self._rows: Dict[int, CatalogRow] = {}
+        self.search_index = CatalogSearchIndex(self.data)
+        self.index: Dict[tuple, int] = {
+            key: position
+            for position, key in enumerate(
+                zip(*(self.data[column].tolist() for column in Factors.KEY_COLUMNS))
+            )
+        }
+
+    def locate(self, method, plant_type, equipment, equipment_type) -> int:
+        """
+        Position of the row with the given key in the merged catalog.
+
+        Raises:
+            KeyError: If no layer has a matching row.
+        """
+        try:
+            return self.index[(method, plant_type, equipment, equipment_type)]
+        except KeyError:
+            raise KeyError(
+                f"No catalog entry for {method} / {plant_type} / {equipment} / {equipment_type}."
+            ) from None
+
+    def row(self, position: int) -> CatalogRow:
+        """The record of the row at ``position``. Records are built on first use and kept."""
+        record = self._rows.get(position)
+        if record is None:
+            # setdefault is atomic, so threads that race here all get the same record
+            record = self._rows.setdefault(position, self.arrays.row(position))
+        return record
+
+    def find(self, method, plant_type, equipment, equipment_type) -> CatalogRow:
+        """The catalog row with the given key. Raises KeyError if there is none."""
+        return self.row(self.locate(method, plant_type, equipment, equipment_type))
+
+    def mask(self, filters: Dict[str, str]) -> np.ndarray:
+        """
+        Boolean mask of the rows whose columns equal the given values.
+
+        Args:
+            filters (dict): Column name -> value, e.g. ``{Factors.METHOD: "Hand"}``.
+                Only categorical columns can be filtered on.
+        """
+        mask = np.ones(len(self.data), dtype=bool)
+        for column, value in filters.items():
+            categories = self.data[column].cat.categories
+            if value not in categories:
+                return np.zeros(len(self.data), dtype=bool)
+            mask &= self.codes[column] == categories.get_loc(value)
+        return mask
+
+    def options(self, column: str, filters: Optional[Dict[str, str]] = None) -> list:
+        """Distinct values of ``column`` on the rows matching ``filters``, in catalog order, without missing values."""
+        codes = self.codes[column]
+        if filters:
+            codes = codes[self.mask(filters)]
+        codes = pd.unique(codes)
+        return self.data[column].cat.categories[codes[codes >= 0]].tolist()
+
+    def search(self, query: str, limit: int = 20) -> pd.DataFrame:
+        """Returns the rows best matching ``query``, best match first, with a ``score`` column."""
+        matches = self.search_index.search(query, limit=limit)
+        positions = [position for position, _ in matches]
+        rows = self.data.iloc[positions].copy()
+        rows["score"] = [score for _, score in matches]
+        return rows
+
+
+def build_catalog(layers: Layers) -> Catalog:
+    """Reads, merges and indexes the catalog layers."""
+    version, contents = read_layer_files(layers)
+    return parse_catalog(contents, version)
+
+
+def parse_catalog(contents: Sequence[Tuple[str, bytes]], version: str) -> Catalog:
+    """Merges and indexes catalog layers already read by ``read_layer_files``."""
+    frames = [(name, read_material_data(io.BytesIO(content), name)) for name, content in contents]
+    return Catalog(merge_layers(frames), version=version)
+
+
+_catalog: Optional[Catalog] = None
+_catalog_lock = threading.Lock()
+# held while the catalog is loaded on first use, so concurrent first requests build it once
+_load_lock = threading.Lock()
+_reload_listeners: List[Callable[[Catalog, Catalog], None]] = []
+
+
+def set_catalog(catalog: Catalog) -> None:
+    """Makes ``catalog`` the process-wide catalog and notifies reload listeners."""
+    global _catalog
+    with _catalog_lock:
+        previous, _catalog = _catalog, catalog
+    if previous is not None and previous.version != catalog.version:
+        for listener in list(_reload_listeners):
+            try:
+                listener(previous, catalog)
+            except Exception:
+                logger.exception("Catalog reload listener failed")
+
+
+def load_catalog(layers: Optional[Layers] = None) -> Catalog:
+    """Builds the catalog from ``layers`` (the configured layers by default) and makes it the process-wide catalog."""
+    catalog = build_catalog(layers or parse_layers())
+    set_catalog(catalog)
+    return catalog
+
+
+def get_catalog() -> Catalog:
+    """
+    Returns the process-wide catalog, loading it on first use.
+
+    Fetch the catalog once per request and use that object throughout, so a
+    reload in the middle of the request cannot mix two versions. Once the
+    catalog is loaded this takes no lock.
+    """
+    catalog = _catalog
+    if catalog is None:
+        with _load_lock:
+            catalog = _catalog
+            if catalog is None:
+                catalog = load_catalog()
+    return catalog
+
+
+def add_reload_listener(listener: Callable[[Catalog, Catalog], None]) -> None:
+    """
+    Registers ``listener(old, new)`` to be called after a new catalog version is swapped in.
+
+    Use it to drop caches that hold results computed from the old version.
+    """
+    _reload_listeners.append(listener)
+
+
+class CatalogWatcher:
+    """
+    Polls the catalog layer files and hot-swaps a rebuilt catalog when their content changes.
+
+    The modification times and sizes are checked on every poll; the files are
+    only read and hashed when they change, and only parsed when the hash does.
+
+    Args:
+        layers (list): The catalog layers, as ``(name, path)`` pairs.
+        interval (float): Seconds between polls.
+    """
+
+    def __init__(self, layers: Layers, interval: float = CATALOG_POLL_INTERVAL):
+        self.layers = list(layers)
+        self.interval = interval
+        self._signature = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def check(self) -> bool:
+        """Reloads the catalog if a layer file changed. Returns True if a new version was swapped in."""
+        try:
+            signature = layers_signature(self.layers)
+        except OSError:
+            logger.warning("A catalog layer file is not readable: %s", self.layers)
+            return False
+        if signature == self._signature:
+            return False
+
+        current = get_catalog()
+        try:
+            version, contents = read_layer_files(self.layers)
+            if version == current.version:
+                self._signature = signature
+                return False
+            catalog = parse_catalog(contents, version)
+        except Exception:
+            # most likely a file is still being written; try again on the next poll
+            logger.exception("Failed to rebuild catalog from %s", self.layers)
+            return False
+        set_catalog(catalog)
+        self._signature = signature
+        logger.info("Catalog reloaded: version %s -> %s", current.version, catalog.version)
+        return True
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._signature = layers_signature(self.layers)
+        self._thread = threading.Thread(target=self._run, name="catalog-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Catalog watcher check failed")
+
+
+_watcher: Optional[CatalogWatcher] = None
+
+
+def start_watcher(layers: Optional[Layers] = None, interval: float = CATALOG_POLL_INTERVAL) -> Optional[CatalogWatcher]:
+    """Starts watching the catalog layer files for changes. A non-positive interval disables reloading."""
+    global _watcher
+    if interval <= 0 or _watcher is not None:
+        return _watcher
+    _watcher = CatalogWatcher(layers or parse_layers(), interval)
+    _watcher.start()
+    return _watcher
@@ -0,0 +1,118 @@
+"""Read-only HTTP endpoint serving the material factor catalog.
+
+The catalog is served column by column: text columns as their categories
+plus one integer code per row, numeric columns as plain lists with null for
+missing values. Each version is encoded and gzipped once and kept. A
+versioned URL never changes content, so it is sent with a strong ETag and a
+one year immutable ``Cache-Control``. Browsers and reverse proxies then fetch
+each catalog version once. The unversioned URL always answers with the
+current version and must be revalidated, which costs a 304 while the version
+stays the same.
+"""
+
+import gzip
+import json
+from typing import NamedTuple
+
+import flask
+import numpy as np
+import pandas as pd
+
+from budge.core import catalog
+from budge.core.cache import SharedCache
+
+CONTENT_TYPE = "application/json"
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# a few versions, for requests still holding the previous catalog while a reload swaps in the next
+_payloads = SharedCache(4)
+
+
+class CatalogPayload(NamedTuple):
+    version: str
+    body: bytes
+    gzip_body: bytes
+
+    def etag(self, gzipped: bool) -> str:
+        # strong ETags must differ between the encodings of one version
+        return f"{self.version}-gzip" if gzipped else self.version
+
+
+def encode_catalog(material_catalog: catalog.Catalog) -> bytes:
+    """The catalog as compact columnar JSON."""
+    columns = {}
+    for column in material_catalog.data.columns:
+        series = material_catalog.data[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            columns[column] = {
+                "categories": series.cat.categories.tolist(),
+                "codes": material_catalog.codes[column].tolist(),
+            }
+        else:
+            values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            columns[column] = {"values": [None if v != v else v for v in values.tolist()]}
+    document = {"version": material_catalog.version, "rows": len(material_catalog.data), "columns": columns}
+    return json.dumps(document, separators=(",", ":"), allow_nan=False).encode()
+
+
+def get_payload(material_catalog: catalog.Catalog) -> CatalogPayload:
+    """The encoded catalog, built once per version."""
+
+    def build():
+        body = encode_catalog(material_catalog)
+        return CatalogPayload(material_catalog.version, body, gzip.compress(body, compresslevel=9, mtime=0))
+
+    return _payloads.get_or_compute(material_catalog.version, build)
+
+
+def catalog_response(payload: CatalogPayload, cache_control: str) -> flask.Response:
+    """The payload in the encoding the client accepts, or 304 if the client's copy is current."""
+    gzipped = flask.request.accept_encodings["gzip"] > 0
+    etag = payload.etag(gzipped)
+    if flask.request.if_none_match.contains_weak(etag):
+        response = flask.Response(status=304)
+    else:
+        response = flask.Response(payload.gzip_body if gzipped else payload.body, mimetype=CONTENT_TYPE)
+        if gzipped:
+            response.headers["Content-Encoding"] = "gzip"
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+
+def catalog_url(prefix: str, version: str) -> str:
+    return f"{prefix}catalog/{version}.json"
+
+
+def register_routes(dash_app, prefix: str) -> None:
+    """
+    Serves the catalog at ``{prefix}catalog`` and ``{prefix}catalog/<version>.json``.
+
+    Args:
+        dash_app (dash.Dash): The app whose server gets the routes.
+        prefix (str): URL prefix, e.g. "/budge/".
+    """
+    server = dash_app.server
+
+    @server.route(f"{prefix}catalog")
+    def current_catalog():
+        material_catalog = catalog.get_catalog()
+        response = catalog_response(get_payload(material_catalog), REVALIDATE)
+        response.headers["Content-Location"] = catalog_url(prefix, material_catalog.version)
+        return response
+
+    @server.route(f"{prefix}catalog/<version>.json")
+    def versioned_catalog(version):
+        material_catalog = catalog.get_catalog()
+        if version != material_catalog.version:
+            payload = _payloads.get(version)
+            if payload is None:
+                return flask.Response(
+                    f"Catalog version {version} is not available, the current version is {material_catalog.version}.",
+                    status=404,
+                    mimetype="text/plain",
+                )
+            return catalog_response(payload, IMMUTABLE)
+        return catalog_response(get_payload(material_catalog), IMMUTABLE)
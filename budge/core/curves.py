@@ -0,0 +1,150 @@
+"""Tabulated cost curves, e.g. from vendor quotes.
+
+A catalog row can carry (size, cost) points instead of, or on top of, the
+``a + b * S**n`` correlation. All curves of a catalog are packed into three flat
+arrays so a batch of items on different curves is evaluated in one vectorized
+pass.
+"""
+
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+from budge.core.definitions import Factors
+
+LINEAR = "linear"
+LOG = "log"
+INTERPOLATION_MODES = (LINEAR, LOG)
+
+
+def parse_points(value) -> np.ndarray:
+    """Parses a "10; 20; 50" cell into a float array. Empty cells give an empty array."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return np.empty(0)
+    text = str(value).strip()
+    if not text:
+        return np.empty(0)
+    return np.array([float(part) for part in text.split(";") if part.strip()])
+
+
+class CostCurves:
+    """
+    Cost curves packed in compressed sparse row form.
+
+    Curve ``i`` has its points in ``sizes[offsets[i]:offsets[i + 1]]`` and
+    ``costs[offsets[i]:offsets[i + 1]]``, sorted by size. ``curve_of_row`` maps
+    each catalog row to its curve, or -1 if the row uses the correlation.
+    """
+
+    def __init__(
+        self,
+        curve_of_row: np.ndarray,
+        offsets: np.ndarray,
+        sizes: np.ndarray,
+        costs: np.ndarray,
+        log_scale: np.ndarray,
+    ):
+        self.curve_of_row = curve_of_row
+        self.offsets = offsets
+        self.sizes = sizes
+        self.costs = costs
+        self.log_scale = log_scale
+        self._log_sizes = np.log(np.where(sizes > 0, sizes, np.nan))
+        self._log_costs = np.log(np.where(costs > 0, costs, np.nan))
+
+    @classmethod
+    def from_catalog(cls, data: pd.DataFrame) -> "CostCurves":
+        """
+        Packs the ``Curve Sizes`` / ``Curve Costs`` columns of a catalog.
+
+        Raises:
+            ValueError: If a curve is malformed.
+        """
+        curve_of_row = np.full(len(data), -1, dtype=np.int64)
+        offsets, sizes, costs, log_scale = [0], [], [], []
+        if Factors.CURVE_SIZES in data and Factors.CURVE_COSTS in data:
+            modes = (
+                data[Factors.CURVE_INTERPOLATION]
+                if Factors.CURVE_INTERPOLATION in data
+                else pd.Series(LOG, index=data.index)
+            )
+            columns = zip(data[Factors.CURVE_SIZES], data[Factors.CURVE_COSTS], modes)
+            for position, (size_cell, cost_cell, mode) in enumerate(columns):
+                curve_sizes, curve_costs = parse_points(size_cell), parse_points(cost_cell)
+                if curve_sizes.size == 0 and curve_costs.size == 0:
+                    continue
+                row_name = " / ".join(str(data[c].iloc[position]) for c in Factors.KEY_COLUMNS)
+                if curve_sizes.size != curve_costs.size or curve_sizes.size < 2:
+                    raise ValueError(f"Cost curve of {row_name} needs at least two (size, cost) points.")
+                mode = LOG if pd.isna(mode) or not str(mode).strip() else str(mode).strip().lower()
+                if mode not in INTERPOLATION_MODES:
+                    raise ValueError(f"Cost curve of {row_name} has unknown interpolation '{mode}'.")
+                if mode == LOG and (np.any(curve_sizes <= 0) or np.any(curve_costs <= 0)):
+                    raise ValueError(f"Log-log cost curve of {row_name} needs positive sizes and costs.")
+                order = np.argsort(curve_sizes, kind="stable")
+                if np.any(np.diff(curve_sizes[order]) == 0):
+                    raise ValueError(f"Cost curve of {row_name} has repeated sizes.")
+                curve_of_row[position] = len(offsets) - 1
+                sizes.append(curve_sizes[order])
+                costs.append(curve_costs[order])
+                offsets.append(offsets[-1] + curve_sizes.size)
+                log_scale.append(mode == LOG)
+        return cls(
+            curve_of_row,
+            np.asarray(offsets, dtype=np.int64),
+            np.concatenate(sizes) if sizes else np.empty(0),
+            np.concatenate(costs) if costs else np.empty(0),
+            np.asarray(log_scale, dtype=bool),
+        )
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def bounds(self) -> np.ndarray:
+        """Smallest and largest tabulated size of each curve, shape (n_curves, 2)."""
+        return np.column_stack((self.sizes[self.offsets[:-1]], self.sizes[self.offsets[1:] - 1]))
+
+    def evaluate(self, curves: Sequence[int], sizes: Sequence[float]) -> np.ndarray:
+        """
+        Interpolates costs for a batch of items on any mix of curves.
+
+        Each item is placed in its curve's segment by a vectorized binary search
+        over the packed size array, then interpolated linearly or in log-log
+        space. Sizes outside a curve extend its first or last segment.
+
+        Args:
+            curves: Curve number of each item.
+            sizes: Size of each item.
+
+        Returns:
+            np.ndarray: Cost of each item.
+        """
+        curves = np.asarray(curves, dtype=np.int64)
+        sizes = np.asarray(sizes, dtype=float)
+        if curves.size == 0:
+            return np.empty(0)
+
+        # search for the segment start in [first point, second to last point] of each curve
+        lo = self.offsets[curves]
+        hi = self.offsets[curves + 1] - 2
+        while True:
+            active = lo < hi
+            if not active.any():
+                break
+            mid = (lo + hi + 1) // 2
+            right = active & (self.sizes[mid] <= sizes)
+            left = active & ~right
+            lo = np.where(right, mid, lo)
+            hi = np.where(left, mid - 1, hi)
+
+        log_scale = self.log_scale[curves]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x = np.where(log_scale, np.log(sizes), sizes)
+            x0 = np.where(log_scale, self._log_sizes[lo], self.sizes[lo])
+            x1 = np.where(log_scale, self._log_sizes[lo + 1], self.sizes[lo + 1])
+            y0 = np.where(log_scale, self._log_costs[lo], self.costs[lo])
+            y1 = np.where(log_scale, self._log_costs[lo + 1], self.costs[lo + 1])
+            y = y0 + (x - x0) * (y1 - y0) / (x1 - x0)
+        y[log_scale] = np.exp(y[log_scale])
+        return y
@@ -25,6 +25,14 @@ class Factors:
     DESIGN_AND_ENGINEERING_FACTOR = "Design and Engineering Factor"
     CONTINGENCY = "Contingency"
     LOCATION_FACTOR = "Location Factor"
+    """ Optional tabulated cost curve, as ";"-separated numbers """
+    CURVE_SIZES = "Curve Sizes"
+    CURVE_COSTS = "Curve Costs"
+    CURVE_INTERPOLATION = "Curve Interpolation"
+    """ Added when the catalog is built """
+    LAYER = "Layer"
+
+    KEY_COLUMNS = (METHOD, PLANT_TYPE, EQUIPMENT, EQUIPMENT_TYPE)
 
 class Methods:
     """ Method types """  
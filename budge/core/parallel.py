@@ -0,0 +1,287 @@
+"""Batch pricing of very large item lists on a pool of worker processes.
+
+Nothing sizeable is pickled between processes. The catalog's pricing arrays
+are packed once into a shared memory block, and each worker builds a
+``PricingCatalog`` over read-only views of it when it starts. The item
+positions and sizes go into a second block. Results come back through a
+third block: a fixed number of slots of one chunk each, reused round-robin.
+A task is just a slot number and a row range. The worker prices the rows and
+writes the costs into its slot, and the parent copies each slot out in input
+order before handing the slot to a later chunk.
+
+The slots bound both the work in flight and the memory used for results,
+however many items are priced, so the caller can stream the chunks to disk.
+"""
+
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, Iterator, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from budge.core import pricing, scenarios
+from budge.core.curves import CostCurves
+from budge.core.records import FLOAT_FIELDS, TEXT_FIELDS, CatalogArrays
+
+CHUNK_ROWS = 50_000
+ALIGNMENT = 64
+
+CURVE_FIELDS = ("curve_of_row", "offsets", "sizes", "costs", "log_scale")
+COST_FIELDS = ("purchased_cost", "installed_cost", "isbl_cost", "total_fixed_capital_cost")
+
+
+class ArrayLayout(NamedTuple):
+    """
+    Where the arrays of a ``SharedArrays`` block are; small enough to pickle.
+
+    Attributes:
+        name (str): Name of the shared memory block.
+        fields (tuple): ``(array name, offset, dtype, shape)`` of every array in the block.
+    """
+
+    name: str
+    fields: Tuple[Tuple[str, int, str, Tuple[int, ...]], ...]
+
+
+def _views(shm: shared_memory.SharedMemory, layout: ArrayLayout, writeable: bool) -> Dict[str, np.ndarray]:
+    views = {}
+    for name, offset, dtype, shape in layout.fields:
+        view = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+        view.flags.writeable = writeable
+        views[name] = view
+    return views
+
+
+class SharedArrays:
+    """
+    Named numpy arrays in one shared memory block, owned by the creating process.
+
+    Use as a context manager; the block is released on exit.
+
+    Args:
+        specs (dict): Array name -> ``(dtype, shape)``.
+    """
+
+    def __init__(self, specs: Dict[str, Tuple[np.dtype, Tuple[int, ...]]]):
+        fields, offset = [], 0
+        for name, (dtype, shape) in specs.items():
+            dtype = np.dtype(dtype)
+            offset = -(-offset // ALIGNMENT) * ALIGNMENT
+            fields.append((name, offset, dtype.str, tuple(shape)))
+            offset += dtype.itemsize * int(np.prod(shape))
+        self._shm = shared_memory.SharedMemory(create=True, size=offset + ALIGNMENT)
+        self.layout = ArrayLayout(self._shm.name, tuple(fields))
+        self.arrays = _views(self._shm, self.layout, writeable=True)
+
+    @classmethod
+    def copy_of(cls, arrays: Dict[str, np.ndarray]) -> "SharedArrays":
+        """A block holding a copy of ``arrays``."""
+        shared = cls({name: (values.dtype, values.shape) for name, values in arrays.items()})
+        for name, values in arrays.items():
+            shared.arrays[name][...] = values
+        return shared
+
+    def close(self) -> None:
+        # the views must go before the block can be closed
+        self.arrays = {}
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self) -> "SharedArrays":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def attach(layout: ArrayLayout, writeable: bool = False) -> Tuple[Dict[str, np.ndarray], shared_memory.SharedMemory]:
+    """
+    Views of the arrays of a block created by ``SharedArrays`` in another process.
+
+    Returns:
+        tuple: The arrays and the attached block, which must stay open while the arrays are used.
+    """
+    # workers share the resource tracker of the process that created the
+    # block, which unlinks it; registering it again on attach is a no-op
+    shm = shared_memory.SharedMemory(name=layout.name)
+    return _views(shm, layout, writeable), shm
+
+
+class PricingCatalog:
+    """
+    The parts of a catalog that ``budge.core.pricing`` reads: ``arrays``, ``curves`` and ``version``.
+
+    Args:
+        version (str): Catalog version.
+        arrays (CatalogArrays): The row fields.
+        curves (CostCurves): The tabulated cost curves.
+    """
+
+    def __init__(self, version: str, arrays: CatalogArrays, curves: CostCurves):
+        self.version = version
+        self.arrays = arrays
+        self.curves = curves
+
+
+class CatalogLayout(NamedTuple):
+    """
+    A catalog shared by ``share_catalog``.
+
+    Attributes:
+        arrays (ArrayLayout): The block with the numeric fields, the text field codes and the curves.
+        version (str): Catalog version.
+        categories (dict): Text field -> its distinct values, indexed by the codes in the block.
+    """
+
+    arrays: ArrayLayout
+    version: str
+    categories: Dict[str, tuple]
+
+
+def share_catalog(material_catalog) -> Tuple[SharedArrays, CatalogLayout]:
+    """Copies a catalog's pricing arrays into a shared block. Returns the block and its layout."""
+    arrays, categories = {}, {}
+    for name in TEXT_FIELDS:
+        arrays[name] = getattr(material_catalog.arrays, name)
+        categories[name] = tuple(material_catalog.arrays.categories[name].tolist())
+    for name in FLOAT_FIELDS:
+        arrays[name] = getattr(material_catalog.arrays, name)
+    for name in CURVE_FIELDS:
+        arrays[f"curves.{name}"] = getattr(material_catalog.curves, name)
+    shared = SharedArrays.copy_of(arrays)
+    return shared, CatalogLayout(shared.layout, material_catalog.version, categories)
+
+
+def attach_catalog(layout: CatalogLayout) -> Tuple[PricingCatalog, shared_memory.SharedMemory]:
+    """The catalog shared by ``share_catalog``, over read-only views of its block."""
+    views, shm = attach(layout.arrays)
+    arrays = CatalogArrays.from_codes(
+        {name: views[name] for name in TEXT_FIELDS},
+        {name: np.array(layout.categories[name], dtype=object) for name in TEXT_FIELDS},
+        {name: views[name] for name in FLOAT_FIELDS},
+    )
+    curves = CostCurves(*(views[f"curves.{name}"] for name in CURVE_FIELDS))
+    return PricingCatalog(layout.version, arrays, curves), shm
+
+
+def price_chunk(
+    material_catalog,
+    positions: np.ndarray,
+    sizes: np.ndarray,
+    allow_extrapolation: bool = False,
+    scenario_list: Sequence[dict] = (),
+) -> Dict[str, np.ndarray]:
+    """
+    Prices one chunk: the cost arrays and ``status`` of ``pricing.price_items``, plus the
+    items x scenarios total fixed capital cost as ``scenarios`` when ``scenario_list`` is given.
+    """
+    costs = pricing.price_items(material_catalog, positions, sizes, allow_extrapolation)
+    if scenario_list:
+        costs["scenarios"] = scenarios.price_scenarios(
+            material_catalog, positions, costs["isbl_cost"], scenario_list
+        )["total_fixed_capital_cost"]
+    return costs
+
+
+# set in each worker by ``_init_worker``: the catalog, inputs and result slots, and the blocks they live in
+_worker: dict = {}
+
+
+def _init_worker(catalog_layout: CatalogLayout, input_layout: ArrayLayout, output_layout: ArrayLayout) -> None:
+    _worker["catalog"], catalog_shm = attach_catalog(catalog_layout)
+    _worker["inputs"], input_shm = attach(input_layout)
+    _worker["outputs"], output_shm = attach(output_layout, writeable=True)
+    _worker["blocks"] = (catalog_shm, input_shm, output_shm)
+
+
+def _price_task(slot: int, start: int, stop: int, allow_extrapolation: bool, scenario_list: list) -> int:
+    inputs, outputs = _worker["inputs"], _worker["outputs"]
+    positions, sizes = inputs["positions"][start:stop], inputs["sizes"][start:stop]
+    costs = price_chunk(_worker["catalog"], positions, sizes, allow_extrapolation, scenario_list)
+    for name, values in outputs.items():
+        values[slot, : len(positions)] = costs[name]
+    return len(positions)
+
+
+def default_workers() -> int:
+    return len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+
+
+def price_batches(
+    material_catalog,
+    positions: Sequence[int],
+    sizes: Sequence[float],
+    allow_extrapolation: bool = False,
+    scenario_list: Sequence[dict] = (),
+    workers: Optional[int] = None,
+    chunk_rows: int = CHUNK_ROWS,
+    max_pending: Optional[int] = None,
+) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Prices a batch of items in chunks on a process pool and yields the chunk results in order.
+
+    With one worker, or a single chunk, the items are priced in this process without a pool.
+
+    Args:
+        material_catalog (Catalog): The catalog to price against.
+        positions: Catalog row position of each item.
+        sizes: Sizing value of each item, in catalog units.
+        allow_extrapolation (bool): Price items outside their sizing limits instead of rejecting them.
+        scenario_list (list): Scenarios to price every item under, optional.
+        workers (int, optional): Worker processes; one per available CPU by default.
+        chunk_rows (int): Items per task.
+        max_pending (int, optional): Chunks in flight, and result slots; twice the workers by default.
+
+    Yields:
+        dict: For each chunk of ``chunk_rows`` items, in input order, the
+        ``price_chunk`` arrays. They are copies the caller may keep.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    sizes = np.asarray(sizes, dtype=np.float64)
+    workers = workers or default_workers()
+    scenario_list = list(scenario_list)
+    fields = (*COST_FIELDS, "status", *(("scenarios",) if scenario_list else ()))
+    starts = range(0, len(positions), chunk_rows)
+    if workers == 1 or len(starts) <= 1:
+        for start in starts:
+            stop = start + chunk_rows
+            costs = price_chunk(material_catalog, positions[start:stop], sizes[start:stop], allow_extrapolation, scenario_list)
+            yield {name: costs[name] for name in fields}
+        return
+
+    max_pending = max_pending or 2 * workers
+    specs = {name: (np.float64, (max_pending, chunk_rows)) for name in COST_FIELDS}
+    specs["status"] = (np.int8, (max_pending, chunk_rows))
+    if scenario_list:
+        specs["scenarios"] = (np.float64, (max_pending, chunk_rows, len(scenario_list)))
+
+    shared_catalog, catalog_layout = share_catalog(material_catalog)
+    inputs = SharedArrays.copy_of({"positions": positions, "sizes": sizes})
+    outputs = SharedArrays(specs)
+    # spawn, not fork: the web server that may call this runs threads
+    pool = ProcessPoolExecutor(
+        workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(catalog_layout, inputs.layout, outputs.layout),
+    )
+    with shared_catalog, inputs, outputs, pool:
+        pending = deque()
+
+        def collect():
+            slot, future = pending.popleft()
+            rows = future.result()
+            return {name: outputs.arrays[name][slot, :rows].copy() for name in fields}
+
+        for i, start in enumerate(starts):
+            # the slot was last used by chunk i - max_pending, which has been collected
+            slot = i % max_pending
+            task = pool.submit(_price_task, slot, start, start + chunk_rows, allow_extrapolation, scenario_list)
+            pending.append((slot, task))
+            if len(pending) == max_pending:
+                yield collect()
+        while pending:
+            yield collect()
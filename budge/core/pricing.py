@@ -0,0 +1,211 @@
+"""Vectorized pricing of a batch of line items against a catalog."""
+
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from budge.core.scenarios import fixed_capital_cost
+from budge.core.validation import check_ranges, priceable
+
+
+def correlation_cost(a, b, n, size):
+    """Purchased equipment cost from the correlation ``a + b * S**n``. Works on scalars and arrays."""
+    return a + b * np.power(size, n)
+
+
+def purchased_cost(material_catalog, positions: Sequence[int], sizes: Sequence[float]) -> np.ndarray:
+    """
+    Purchased equipment cost of each item.
+
+    Rows with a tabulated cost curve are interpolated on the curve, all other
+    rows use the correlation. Both kinds can be mixed freely in one batch.
+
+    Args:
+        material_catalog (Catalog): The catalog to price against.
+        positions: Catalog row position of each item.
+        sizes: Sizing value of each item, in catalog units.
+
+    Returns:
+        np.ndarray: The purchased cost of each item.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    sizes = np.asarray(sizes, dtype=float)
+    arrays = material_catalog.arrays
+    cost = correlation_cost(arrays.a[positions], arrays.b[positions], arrays.n[positions], sizes)
+    curves = material_catalog.curves.curve_of_row[positions]
+    tabulated = curves >= 0
+    if tabulated.any():
+        cost[tabulated] = material_catalog.curves.evaluate(curves[tabulated], sizes[tabulated])
+    return cost
+
+
+def checked_purchased_cost(
+    material_catalog,
+    positions: Sequence[int],
+    sizes: Sequence[float],
+    allow_extrapolation: bool = False,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Purchased cost and ``RangeStatus`` of each item; items that may not be priced get NaN.
+
+    Args:
+        material_catalog (Catalog): The catalog to price against.
+        positions: Catalog row position of each item.
+        sizes: Sizing value of each item, in catalog units.
+        allow_extrapolation (bool): Price items outside their sizing limits instead of rejecting them.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    sizes = np.asarray(sizes, dtype=float)
+    status = check_ranges(material_catalog, positions, sizes)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        purchased = purchased_cost(material_catalog, positions, sizes)
+    purchased[~priceable(status, allow_extrapolation)] = np.nan
+    return purchased, status
+
+
+def isbl_cost(material_catalog, positions: Sequence[int], purchased: np.ndarray) -> np.ndarray:
+    """ISBL cost of each item from its purchased cost and the installation factors of its catalog row."""
+    positions = np.asarray(positions, dtype=np.int64)
+    arrays = material_catalog.arrays
+
+    def factor(values):
+        return values[positions]
+
+    return purchased * (
+        (1 + factor(arrays.piping_factor)) * factor(arrays.material_factor)
+        + factor(arrays.equipment_erection_factor)
+        + factor(arrays.electrical_factor)
+        + factor(arrays.instrumentation_and_control_factor)
+        + factor(arrays.civil_factor)
+        + factor(arrays.structures_and_buildings_factor)
+        + factor(arrays.lagging_and_paint_factor)
+    )
+
+
+def installed_cost(material_catalog, positions: Sequence[int], purchased: np.ndarray, isbl: np.ndarray) -> np.ndarray:
+    """Installed cost for Hand method items, the ISBL cost for the others."""
+    positions = np.asarray(positions, dtype=np.int64)
+    arrays = material_catalog.arrays
+    return np.where(arrays.is_hand[positions], purchased * arrays.installation_factor[positions], isbl)
+
+
+def price_items(
+    material_catalog,
+    positions: Sequence[int],
+    sizes: Sequence[float],
+    allow_extrapolation: bool = False,
+) -> Dict[str, np.ndarray]:
+    """
+    Prices a batch of line items.
+
+    Sizes are validated for the whole batch at once. Items that fail validation
+    get NaN costs and a status code, the rest of the batch is priced normally.
+
+    Args:
+        material_catalog (Catalog): The catalog to price against.
+        positions: Catalog row position of each item.
+        sizes: Sizing value of each item, in catalog units.
+        allow_extrapolation (bool): Price items outside their sizing limits instead of rejecting them.
+
+    Returns:
+        dict: Arrays with one entry per item:
+            - purchased_cost: purchased equipment cost.
+            - installed_cost: installed cost for the Hand method, ISBL cost otherwise.
+            - isbl_cost: ISBL cost; not meaningful for Hand items.
+            - total_fixed_capital_cost: for the material factors method; NaN for Hand items.
+            - status: ``RangeStatus`` code.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    arrays = material_catalog.arrays
+
+    def factor(values):
+        return values[positions]
+
+    purchased, status = checked_purchased_cost(material_catalog, positions, sizes, allow_extrapolation)
+    isbl = isbl_cost(material_catalog, positions, purchased)
+    total_fixed_capital_cost = fixed_capital_cost(
+        isbl,
+        factor(arrays.offsites_factor),
+        factor(arrays.design_and_engineering_factor),
+        factor(arrays.contingency),
+        factor(arrays.location_factor),
+    )
+    installed = installed_cost(material_catalog, positions, purchased, isbl)
+    total_fixed_capital_cost[arrays.is_hand[positions]] = np.nan
+
+    return {
+        "purchased_cost": purchased,
+        "installed_cost": installed,
+        "isbl_cost": isbl,
+        "total_fixed_capital_cost": total_fixed_capital_cost,
+        "status": status,
+    }
+
+
+# waterfall steps from purchased cost to total fixed capital cost, in order
+BREAKDOWN_STEPS = (
+    ("purchased_cost", "Purchased Equipment"),
+    ("material", "Materials"),
+    ("piping", "Piping"),
+    ("equipment_erection", "Equipment Erection"),
+    ("electrical", "Electrical"),
+    ("instrumentation_and_control", "Instrumentation & Control"),
+    ("civil", "Civil"),
+    ("structures_and_buildings", "Structures & Buildings"),
+    ("lagging_and_paint", "Lagging & Paint"),
+    ("offsites", "Offsites"),
+    ("design_and_engineering", "Design & Engineering"),
+    ("contingency", "Contingency"),
+    ("location", "Location"),
+)
+
+
+def cost_breakdown(
+    material_catalog, positions: Sequence[int], purchased: np.ndarray, project_factors: Optional[dict] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Splits each item's total fixed capital cost into the increment each factor adds.
+
+    The increments of one item add up to its total fixed capital cost, in the
+    order of ``BREAKDOWN_STEPS``. Only meaningful for material factor items.
+
+    Args:
+        material_catalog (Catalog): The catalog the items were priced against.
+        positions: Catalog row position of each item.
+        purchased: Purchased equipment cost of each item.
+        project_factors (dict, optional): Project overrides of the offsites, design and
+            engineering, contingency and location factors; None values keep the catalog factor.
+
+    Returns:
+        dict: One array per ``BREAKDOWN_STEPS`` key.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    arrays = material_catalog.arrays
+
+    def factor(values):
+        return values[positions]
+
+    def project_factor(name):
+        override = (project_factors or {}).get(name)
+        return factor(getattr(arrays, name)) if override is None else float(override)
+
+    material = factor(arrays.material_factor)
+    steps = {
+        "purchased_cost": purchased,
+        "material": purchased * (material - 1),
+        "piping": purchased * factor(arrays.piping_factor) * material,
+        "equipment_erection": purchased * factor(arrays.equipment_erection_factor),
+        "electrical": purchased * factor(arrays.electrical_factor),
+        "instrumentation_and_control": purchased * factor(arrays.instrumentation_and_control_factor),
+        "civil": purchased * factor(arrays.civil_factor),
+        "structures_and_buildings": purchased * factor(arrays.structures_and_buildings_factor),
+        "lagging_and_paint": purchased * factor(arrays.lagging_and_paint_factor),
+    }
+    isbl = sum(steps.values())
+    steps["offsites"] = isbl * project_factor("offsites_factor")
+    with_offsites = isbl + steps["offsites"]
+    steps["design_and_engineering"] = with_offsites * project_factor("design_and_engineering_factor")
+    steps["contingency"] = with_offsites * project_factor("contingency")
+    before_location = with_offsites + steps["design_and_engineering"] + steps["contingency"]
+    steps["location"] = before_location * (project_factor("location_factor") - 1)
+    return steps
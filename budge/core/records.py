@@ -0,0 +1,180 @@
+"""Compact typed views of the catalog rows.
+
+``CatalogRow`` is one catalog row as an immutable record with plain attribute
+access, for pricing and displaying a single item without pandas overhead.
+``CatalogArrays`` holds the same fields as one array per column, for pricing
+batches of items with numpy. Its text fields are integer codes into a small
+table of distinct values, so no per-row strings are kept.
+"""
+
+from dataclasses import dataclass
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from budge.core.definitions import Factors, Methods
+
+TEXT_FIELDS = ("method", "plant_type", "equipment", "equipment_type", "sizing_quantity", "units", "layer")
+FLOAT_FIELDS = (
+    "s_lower",
+    "s_upper",
+    "a",
+    "b",
+    "n",
+    "installation_factor",
+    "material_factor",
+    "equipment_erection_factor",
+    "piping_factor",
+    "instrumentation_and_control_factor",
+    "electrical_factor",
+    "civil_factor",
+    "structures_and_buildings_factor",
+    "lagging_and_paint_factor",
+    "isbl_cost_factor",
+    "offsites_factor",
+    "design_and_engineering_factor",
+    "contingency",
+    "location_factor",
+)
+
+# record field -> catalog column, e.g. "piping_factor" -> Factors.PIPING_FACTOR
+COLUMNS = {name: getattr(Factors, name.upper()) for name in TEXT_FIELDS + FLOAT_FIELDS}
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogRow:
+    """One catalog row. Missing text is an empty string, missing numbers are NaN."""
+
+    method: str
+    plant_type: str
+    equipment: str
+    equipment_type: str
+    sizing_quantity: str
+    units: str
+    layer: str
+    s_lower: float
+    s_upper: float
+    a: float
+    b: float
+    n: float
+    installation_factor: float
+    material_factor: float
+    equipment_erection_factor: float
+    piping_factor: float
+    instrumentation_and_control_factor: float
+    electrical_factor: float
+    civil_factor: float
+    structures_and_buildings_factor: float
+    lagging_and_paint_factor: float
+    isbl_cost_factor: float
+    offsites_factor: float
+    design_and_engineering_factor: float
+    contingency: float
+    location_factor: float
+
+    @property
+    def key(self) -> tuple:
+        return (self.method, self.plant_type, self.equipment, self.equipment_type)
+
+    @property
+    def is_hand(self) -> bool:
+        return self.method == Methods.HAND
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogArrays:
+    """
+    Struct-of-arrays view of the catalog: one array per ``CatalogRow`` field, indexed by row position.
+
+    Text fields are int32 codes into ``categories``, the distinct values of
+    each text field; ``text`` and ``row`` turn them into strings. Numeric fields
+    are float64 arrays with NaN for missing values. Index any field with an
+    array of positions to gather a batch, e.g. ``arrays.a[positions]``.
+    """
+
+    method: np.ndarray
+    plant_type: np.ndarray
+    equipment: np.ndarray
+    equipment_type: np.ndarray
+    sizing_quantity: np.ndarray
+    units: np.ndarray
+    layer: np.ndarray
+    s_lower: np.ndarray
+    s_upper: np.ndarray
+    a: np.ndarray
+    b: np.ndarray
+    n: np.ndarray
+    installation_factor: np.ndarray
+    material_factor: np.ndarray
+    equipment_erection_factor: np.ndarray
+    piping_factor: np.ndarray
+    instrumentation_and_control_factor: np.ndarray
+    electrical_factor: np.ndarray
+    civil_factor: np.ndarray
+    structures_and_buildings_factor: np.ndarray
+    lagging_and_paint_factor: np.ndarray
+    isbl_cost_factor: np.ndarray
+    offsites_factor: np.ndarray
+    design_and_engineering_factor: np.ndarray
+    contingency: np.ndarray
+    location_factor: np.ndarray
+    is_hand: np.ndarray
+    categories: Dict[str, np.ndarray]
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame) -> "CatalogArrays":
+        """Extracts the arrays from a catalog table. Columns the table lacks are filled with blanks."""
+        count = len(data)
+        codes, categories, floats = {}, {}, {}
+        for name in TEXT_FIELDS:
+            column = COLUMNS[name]
+            if column in data:
+                # the catalog's own categoricals; missing values get an extra "" category
+                categorical = pd.Categorical(data[column])
+                labels = np.append(np.asarray(categorical.categories, dtype=object), "")
+                codes[name] = np.where(categorical.codes < 0, len(labels) - 1, categorical.codes).astype(np.int32)
+                categories[name] = labels
+            else:
+                codes[name] = np.zeros(count, dtype=np.int32)
+                categories[name] = np.array([""], dtype=object)
+        for name in FLOAT_FIELDS:
+            column = COLUMNS[name]
+            if column in data:
+                floats[name] = pd.to_numeric(data[column], errors="coerce").to_numpy(dtype=np.float64, copy=True)
+            else:
+                floats[name] = np.full(count, np.nan)
+        return cls.from_codes(codes, categories, floats)
+
+    @classmethod
+    def from_codes(
+        cls, codes: Dict[str, np.ndarray], categories: Dict[str, np.ndarray], floats: Dict[str, np.ndarray]
+    ) -> "CatalogArrays":
+        """
+        Assembles the arrays from the text field codes, their categories and the numeric fields.
+
+        Args:
+            codes (dict): Text field -> int32 code of each row into ``categories``.
+            categories (dict): Text field -> object array of its distinct values.
+            floats (dict): Numeric field -> float64 value of each row.
+        """
+        hand = np.flatnonzero(categories["method"] == Methods.HAND)
+        arrays = {**codes, **floats, "is_hand": np.isin(codes["method"], hand)}
+        for values in (*arrays.values(), *categories.values()):
+            values.flags.writeable = False
+        return cls(**arrays, categories=categories)
+
+    def __len__(self) -> int:
+        return len(self.a)
+
+    def text(self, name: str, positions) -> np.ndarray:
+        """The values of text field ``name`` at ``positions``, as an object array."""
+        return self.categories[name][getattr(self, name)[positions]]
+
+    def row(self, position: int) -> CatalogRow:
+        """The record at ``position``."""
+        return CatalogRow(
+            *(str(self.categories[name][getattr(self, name)[position]]) for name in TEXT_FIELDS),
+            *(float(getattr(self, name)[position]) for name in FLOAT_FIELDS),
+        )
+
@@ -0,0 +1,203 @@
+"""Computed results shared by every process on a host through a SQLite file.
+
+The in-process memos are lost on restart and not shared between the worker
+processes of a server. A ``ResultStore`` keeps results in a local SQLite
+database instead: every process opens its own connections, and WAL mode lets
+them read while one of them writes. Results are stored under a content key,
+e.g. a node key of ``budge.project.graph``, together with the catalog
+version they were computed from.
+
+The store is bounded. Entries larger than ``max_entry_bytes`` are not stored,
+and once the stored results exceed ``max_bytes`` the least recently used ones
+are deleted down to a low watermark. Hits refresh an entry's access time at
+most once per ``ACCESS_RESOLUTION`` seconds, so reads rarely write.
+
+Values are pickled. The database must live on a local disk that only the
+server's user can write to, and its format version is checked on open: a
+file written by another version of the format is cleared.
+
+Any error of the database makes the store behave as empty; results are then
+just computed again.
+"""
+
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from budge.config.main import RESULT_CACHE_MAX_BYTES, RESULT_CACHE_MAX_ENTRY_BYTES, RESULT_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+# bump when the pickled results change shape, so older files are cleared on open
+FORMAT_VERSION = 1
+ACCESS_RESOLUTION = 60.0
+# eviction deletes down to this share of max_bytes so it does not run on every insert
+LOW_WATERMARK = 0.8
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_last_access ON results (last_access);
+"""
+
+
+class ResultStore:
+    """
+    Bounded, least recently used store of pickled results in a SQLite file.
+
+    Args:
+        path (str): Database file.
+        max_bytes (int): Total size of the stored results before the oldest are evicted.
+        max_entry_bytes (int): Largest result stored.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = RESULT_CACHE_MAX_BYTES,
+        max_entry_bytes: int = RESULT_CACHE_MAX_ENTRY_BYTES,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = min(max_entry_bytes, max_bytes)
+        self._local = threading.local()
+        # bytes written by this process since it last checked the total size
+        self._written = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.executescript(SCHEMA)
+        with connection:
+            # under the write lock, so a process opening the file cannot clear what another just stored
+            connection.execute("BEGIN IMMEDIATE")
+            if connection.execute("PRAGMA user_version").fetchone()[0] != FORMAT_VERSION:
+                connection.execute("DELETE FROM results")
+                connection.execute(f"PRAGMA user_version = {FORMAT_VERSION}")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite connections cannot be shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """The result stored under ``key``, or ``default``."""
+        try:
+            connection = self._connection()
+            row = connection.execute(
+                "SELECT value, last_access FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return default
+            value = pickle.loads(row[0])
+            now = time.time()
+            if now - row[1] > ACCESS_RESOLUTION:
+                with connection:
+                    connection.execute("UPDATE results SET last_access = ? WHERE key = ?", (now, key))
+            return value
+        except (sqlite3.Error, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as exc:
+            logger.warning("Result cache read of %s failed: %s", key, exc)
+            return default
+
+    def put(self, key: str, value: Any, version: str = "") -> bool:
+        """
+        Stores ``value`` under ``key``, replacing any stored result.
+
+        Returns:
+            bool: Whether the value was stored; results larger than ``max_entry_bytes`` are not.
+        """
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError) as exc:
+            logger.warning("Result %s cannot be cached: %s", key, exc)
+            return False
+        if len(blob) > self.max_entry_bytes:
+            return False
+        try:
+            connection = self._connection()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                    (key, version, blob, len(blob), time.time()),
+                )
+            with self._lock:
+                self._written += len(blob)
+                # other processes write too; the total is checked after every
+                # share of max_bytes written here
+                check = self._written > self.max_bytes * (1 - LOW_WATERMARK) / 2
+                if check:
+                    self._written = 0
+            if check:
+                self.evict()
+        except sqlite3.Error as exc:
+            logger.warning("Result cache write of %s failed: %s", key, exc)
+            return False
+        return True
+
+    def evict(self) -> int:
+        """Deletes the least recently used results while the store is larger than ``max_bytes``. Returns the number deleted."""
+        connection = self._connection()
+        with connection:
+            # take the write lock before reading the total, so processes evicting at once do not each free the same excess
+            connection.execute("BEGIN IMMEDIATE")
+            total = connection.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM results").fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            excess = total - int(self.max_bytes * LOW_WATERMARK)
+            victims, freed = [], 0
+            for key, size_bytes in connection.execute("SELECT key, size_bytes FROM results ORDER BY last_access"):
+                if freed >= excess:
+                    break
+                victims.append((key,))
+                freed += size_bytes
+            connection.executemany("DELETE FROM results WHERE key = ?", victims)
+        return len(victims)
+
+    def size(self) -> int:
+        """Total size of the stored results in bytes."""
+        return self._connection().execute("SELECT COALESCE(SUM(size_bytes), 0) FROM results").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def clear(self, version: Optional[str] = None) -> None:
+        """Deletes every result, or only those computed from catalog ``version``."""
+        connection = self._connection()
+        with connection:
+            if version is None:
+                connection.execute("DELETE FROM results")
+            else:
+                connection.execute("DELETE FROM results WHERE version = ?", (version,))
+
+
+_store: Optional[ResultStore] = None
+_store_failed = False
+_store_lock = threading.Lock()
+
+
+def get_result_store() -> Optional[ResultStore]:
+    """Returns the configured store, or None when the shared result cache is disabled or cannot be opened."""
+    global _store, _store_failed
+    if _store is None and RESULT_CACHE_PATH and not _store_failed:
+        with _store_lock:
+            if _store is None and not _store_failed:
+                try:
+                    _store = ResultStore(RESULT_CACHE_PATH)
+                except (sqlite3.Error, OSError) as exc:
+                    logger.error("Result cache %s cannot be opened, it is disabled: %s", RESULT_CACHE_PATH, exc)
+                    _store_failed = True
+    return _store
@@ -0,0 +1,77 @@
+"""Scenario matrix: one equipment list priced under several sets of project-level factors at once.
+
+A scenario overrides some of the factors that turn the ISBL cost into the
+total fixed capital cost. Every item is priced under every scenario in one
+broadcast over an items x scenarios grid, rather than re-pricing the list
+once per scenario.
+"""
+
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+BASE_SCENARIO = "base"
+
+# CatalogArrays fields a scenario can override
+SCENARIO_FACTORS = ("offsites_factor", "design_and_engineering_factor", "contingency", "location_factor")
+
+
+def scenario_names(scenarios: Sequence[dict]) -> List[str]:
+    return [scenario["name"] for scenario in scenarios]
+
+
+def override_matrix(scenarios: Sequence[dict]) -> Dict[str, np.ndarray]:
+    """One array per overridable factor with an entry per scenario, NaN where the scenario keeps the catalog value."""
+    return {
+        name: np.array(
+            [np.nan if scenario.get(name) is None else float(scenario[name]) for scenario in scenarios],
+            dtype=np.float64,
+        )
+        for name in SCENARIO_FACTORS
+    }
+
+
+def fixed_capital_cost(isbl, offsites, design_and_engineering, contingency, location):
+    """Total fixed capital cost from the ISBL cost. Broadcasts over any array shapes."""
+    return isbl * (1 + offsites) * (1 + design_and_engineering + contingency) * location
+
+
+def price_scenarios(
+    material_catalog,
+    positions: Sequence[int],
+    isbl: np.ndarray,
+    scenarios: Sequence[dict],
+) -> Dict[str, np.ndarray]:
+    """
+    Total fixed capital cost of each item under each scenario.
+
+    Args:
+        material_catalog (Catalog): The catalog the items were priced against.
+        positions: Catalog row position of each item.
+        isbl: ISBL cost of each item, NaN for items that could not be priced.
+        scenarios (list): Scenario dicts with a ``name`` and optional factor overrides.
+
+    Returns:
+        dict: ``total_fixed_capital_cost`` and the effective value of every
+        overridable factor, each an items x scenarios array. Hand method items
+        have no total fixed capital cost and get NaN.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    arrays = material_catalog.arrays
+    overrides = override_matrix(scenarios)
+
+    effective = {}
+    for name in SCENARIO_FACTORS:
+        catalog_values = getattr(arrays, name)[positions][:, np.newaxis]
+        override = overrides[name][np.newaxis, :]
+        effective[name] = np.where(np.isnan(override), catalog_values, override)
+
+    total = fixed_capital_cost(
+        np.asarray(isbl, dtype=np.float64)[:, np.newaxis],
+        effective["offsites_factor"],
+        effective["design_and_engineering_factor"],
+        effective["contingency"],
+        effective["location_factor"],
+    )
+    total[arrays.is_hand[positions]] = np.nan
+    return {"total_fixed_capital_cost": total, **effective}
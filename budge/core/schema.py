@@ -0,0 +1,122 @@
+"""Column types of the material factor catalog, applied and checked when a layer is read.
+
+Text columns repeat a handful of values over many rows, so the catalog keeps
+them as categoricals: one small table of distinct strings plus an integer code
+per row. Factor columns are always float64, with NaN for empty cells. Key
+values are kept exactly as written in the file, trailing spaces included,
+because saved projects refer to them.
+"""
+
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from budge.core.definitions import Factors
+
+CATEGORY_COLUMNS = Factors.KEY_COLUMNS + (Factors.SIZING_QUANTITY, Factors.UNITS, Factors.LAYER)
+TEXT_COLUMNS = (Factors.CURVE_SIZES, Factors.CURVE_COSTS, Factors.CURVE_INTERPOLATION)
+FLOAT_COLUMNS = (
+    Factors.S_LOWER,
+    Factors.S_UPPER,
+    Factors.A,
+    Factors.B,
+    Factors.N,
+    Factors.INSTALLATION_FACTOR,
+    Factors.MATERIAL_FACTOR,
+    Factors.EQUIPMENT_ERECTION_FACTOR,
+    Factors.PIPING_FACTOR,
+    Factors.INSTRUMENTATION_AND_CONTROL_FACTOR,
+    Factors.ELECTRICAL_FACTOR,
+    Factors.CIVIL_FACTOR,
+    Factors.STRUCTURES_AND_BUILDINGS_FACTOR,
+    Factors.LAGGING_AND_PAINT_FACTOR,
+    Factors.ISBL_COST_FACTOR,
+    Factors.OFFSITES_FACTOR,
+    Factors.DESIGN_AND_ENGINEERING_FACTOR,
+    Factors.CONTINGENCY,
+    Factors.LOCATION_FACTOR,
+)
+
+# rows listed per problem in an error message
+MAX_REPORTED_ROWS = 5
+
+
+class CatalogSchemaError(ValueError):
+    """Raised when a catalog file does not match the catalog schema."""
+
+
+def read_dtypes() -> dict:
+    """``pd.read_csv`` dtypes: text columns as strings. Factor columns are converted by ``conform``."""
+    return {column: str for column in CATEGORY_COLUMNS + TEXT_COLUMNS}
+
+
+def _rows(mask: pd.Series) -> str:
+    # csv line numbers: one header line, counting from 1
+    lines = (np.flatnonzero(mask.to_numpy()) + 2).tolist()
+    shown = ", ".join(str(line) for line in lines[:MAX_REPORTED_ROWS])
+    return shown + (f" and {len(lines) - MAX_REPORTED_ROWS} more" if len(lines) > MAX_REPORTED_ROWS else "")
+
+
+def conform(frame: pd.DataFrame, name: str) -> pd.DataFrame:
+    """
+    Checks a catalog layer against the schema and converts its factor columns to float64.
+
+    Args:
+        frame (pd.DataFrame): The layer as read from its csv file.
+        name (str): Layer name, used in error messages.
+
+    Returns:
+        pd.DataFrame: The layer with float64 factor columns.
+
+    Raises:
+        CatalogSchemaError: If key columns are missing or empty, two rows have
+            the same key, a factor cell is not a number, or a lower sizing
+            limit is above the upper one.
+    """
+    problems: List[str] = []
+    missing = [column for column in Factors.KEY_COLUMNS if column not in frame]
+    if missing:
+        raise CatalogSchemaError(f"Catalog layer '{name}' is missing columns: {', '.join(missing)}")
+
+    any_empty = pd.Series(False, index=frame.index)
+    for column in Factors.KEY_COLUMNS:
+        empty = frame[column].isna() | (frame[column].str.strip() == "")
+        if empty.any():
+            problems.append(f"empty {column} on lines {_rows(empty)}")
+        any_empty |= empty
+
+    # a key must name one row of the layer; only later layers may override it
+    duplicated = frame.duplicated(list(Factors.KEY_COLUMNS), keep=False) & ~any_empty
+    if duplicated.any():
+        problems.append(f"duplicate {' / '.join(Factors.KEY_COLUMNS)} on lines {_rows(duplicated)}")
+
+    frame = frame.copy()
+    for column in FLOAT_COLUMNS:
+        if column not in frame:
+            continue
+        values = pd.to_numeric(frame[column], errors="coerce").astype(np.float64)
+        invalid = values.isna() & frame[column].notna()
+        if frame[column].dtype == object:
+            # blank cells are empty, not invalid
+            invalid &= frame[column].astype(str).str.strip() != ""
+        if invalid.any():
+            problems.append(f"{column} is not a number on lines {_rows(invalid)}")
+        frame[column] = values
+
+    if Factors.S_LOWER in frame and Factors.S_UPPER in frame:
+        reversed_limits = frame[Factors.S_LOWER] > frame[Factors.S_UPPER]
+        if reversed_limits.any():
+            problems.append(f"{Factors.S_LOWER} is above {Factors.S_UPPER} on lines {_rows(reversed_limits)}")
+
+    if problems:
+        raise CatalogSchemaError(f"Catalog layer '{name}' is invalid: " + "; ".join(problems))
+    return frame
+
+
+def categorize(data: pd.DataFrame) -> pd.DataFrame:
+    """Converts the text columns of a merged catalog to categoricals, in place. Returns ``data``."""
+    for column in CATEGORY_COLUMNS:
+        if column in data and not isinstance(data[column].dtype, pd.CategoricalDtype):
+            data[column] = data[column].astype("category")
+    return data
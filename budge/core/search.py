@@ -0,0 +1,113 @@
+"""Token and trigram search index over the material factor catalog."""
+
+import re
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from budge.core.definitions import Factors
+
+SEARCH_COLUMNS = (Factors.EQUIPMENT, Factors.EQUIPMENT_TYPE, Factors.SIZING_QUANTITY)
+
+_TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+# a query token that matches a whole catalog token counts as this many trigrams
+TOKEN_WEIGHT = 2.0
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased alphanumeric tokens of ``text``."""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def trigrams(token: str) -> List[str]:
+    """Trigrams of a token padded so that short tokens and word starts still match."""
+    padded = f"  {token} "
+    return [padded[i : i + 3] for i in range(len(padded) - 2)]
+
+
+class CatalogSearchIndex:
+    """
+    Inverted index from tokens and trigrams to catalog row positions.
+
+    The index is built once when the catalog is loaded. A query only touches the
+    posting lists of its own trigrams and tokens, so its cost follows the number
+    of matching rows rather than the size of the catalog.
+
+    Args:
+        data (pd.DataFrame): The catalog. Rows are referred to by position.
+        columns (tuple): The text columns to index.
+    """
+
+    def __init__(self, data: pd.DataFrame, columns: Tuple[str, ...] = SEARCH_COLUMNS):
+        gram_postings: Dict[str, List[int]] = {}
+        token_postings: Dict[str, List[int]] = {}
+        lengths = np.empty(len(data), dtype=np.int32)
+
+        text_columns = [data[column].astype(object).fillna("").astype(str).to_numpy() for column in columns]
+        for position, values in enumerate(zip(*text_columns)):
+            tokens = set(tokenize(" ".join(values)))
+            grams = {gram for token in tokens for gram in trigrams(token)}
+            for gram in grams:
+                gram_postings.setdefault(gram, []).append(position)
+            for token in tokens:
+                token_postings.setdefault(token, []).append(position)
+            lengths[position] = len(grams)
+
+        self._grams = {k: np.asarray(v, dtype=np.int32) for k, v in gram_postings.items()}
+        self._tokens = {k: np.asarray(v, dtype=np.int32) for k, v in token_postings.items()}
+        self._lengths = lengths
+        self._empty = np.empty(0, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def search(self, query: str, limit: int = 20, min_score: float = 0.5) -> List[Tuple[int, float]]:
+        """
+        Ranks catalog rows against ``query``.
+
+        Rows score by the fraction of query trigrams they contain, with a bonus
+        for whole-token matches. Ties go to the row with the shorter text.
+
+        Args:
+            query (str): Free text, e.g. "vert vessel cs".
+            limit (int): Maximum number of results.
+            min_score (float): Minimum fraction of query trigrams a row must contain.
+
+        Returns:
+            list: ``(row position, score)`` tuples, best match first.
+        """
+        query_tokens = set(tokenize(query))
+        query_grams = {gram for token in query_tokens for gram in trigrams(token)}
+        if not query_grams:
+            return []
+
+        grams = np.concatenate([self._grams.get(gram, self._empty) for gram in query_grams])
+        tokens = np.concatenate(
+            [self._tokens.get(token, self._empty) for token in query_tokens] + [self._empty]
+        )
+        threshold = min_score * len(query_grams)
+
+        if grams.size * 8 > len(self):
+            # broad queries: counting into dense arrays beats sorting the postings
+            gram_hits = np.bincount(grams, minlength=len(self))
+            token_hits = np.bincount(tokens, minlength=len(self))
+            candidates = np.flatnonzero(gram_hits >= max(threshold, 1))
+            scores = (gram_hits[candidates] + TOKEN_WEIGHT * token_hits[candidates]) / len(query_grams)
+        else:
+            candidates, gram_hits = np.unique(grams, return_counts=True)
+            keep = gram_hits >= threshold
+            candidates, gram_hits = candidates[keep], gram_hits[keep]
+            scores = gram_hits / len(query_grams)
+            if tokens.size and candidates.size:
+                token_rows, token_hits = np.unique(tokens, return_counts=True)
+                found = np.searchsorted(token_rows, candidates).clip(max=token_rows.size - 1)
+                matched = token_rows[found] == candidates
+                scores[matched] += TOKEN_WEIGHT * token_hits[found[matched]] / len(query_grams)
+
+        if candidates.size > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            candidates, scores = candidates[top], scores[top]
+        order = np.lexsort((self._lengths[candidates], -scores))
+        return [(int(candidates[i]), float(scores[i])) for i in order]
@@ -0,0 +1,128 @@
+"""Parallel-unit designs for line items sized beyond their catalog range.
+
+An item of size ``S`` can be built as ``n`` parallel units whose sizes add up
+to ``S``, each within ``S lower``..``S upper``. With ``n < 1`` the cost of a
+unit grows slower than its size, so the cheapest design is usually the fewest
+units that fit, but the fixed term ``a`` and tabulated curves can make a
+different count cheaper.
+
+Each candidate design is ``n - 1`` units of size ``u`` and one unit of the
+remaining size ``S - (n - 1) * u``. ``u`` runs from the equal split ``S / n``
+to the largest size that leaves a remainder of at least ``S lower``. For a
+concave cost curve the optimum of a given count lies at one of these two ends;
+the steps in between cover tabulated curves. Every count, step and item is
+priced in one vectorized pass over an items x counts x steps array.
+"""
+
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from budge.core import pricing
+from budge.core.scenarios import price_scenarios
+
+INSTALLED_COST = "installed_cost"
+TOTAL_FIXED_CAPITAL_COST = "total_fixed_capital_cost"
+OBJECTIVES = (INSTALLED_COST, TOTAL_FIXED_CAPITAL_COST)
+
+MAX_UNITS = 10
+SIZE_STEPS = 16
+
+
+def unit_cost_factor(
+    material_catalog, positions: np.ndarray, objective: str, project_factors: Optional[dict] = None
+) -> np.ndarray:
+    """
+    The objective cost per unit of purchased cost of each item.
+
+    The installed and total fixed capital costs are the purchased cost times
+    factors of the catalog row, so a candidate unit only needs its purchased
+    cost. Hand items have no total fixed capital cost and use their installed cost.
+    """
+    ones = np.ones(len(positions))
+    isbl = pricing.isbl_cost(material_catalog, positions, ones)
+    installed = pricing.installed_cost(material_catalog, positions, ones, isbl)
+    if objective == INSTALLED_COST:
+        return installed
+    project = [{"name": "project", **(project_factors or {})}]
+    total = price_scenarios(material_catalog, positions, isbl, project)["total_fixed_capital_cost"][:, 0]
+    return np.where(np.isfinite(total), total, installed)
+
+
+def split_units(
+    material_catalog,
+    positions: Sequence[int],
+    sizes: Sequence[float],
+    objective: str = TOTAL_FIXED_CAPITAL_COST,
+    project_factors: Optional[dict] = None,
+    max_units: int = MAX_UNITS,
+    size_steps: int = SIZE_STEPS,
+) -> Dict[str, np.ndarray]:
+    """
+    Finds the cheapest parallel-unit design of every item.
+
+    Args:
+        material_catalog (Catalog): The catalog to price against.
+        positions: Catalog row position of each item.
+        sizes: Required size of each item, in catalog units.
+        objective (str): ``"installed_cost"`` or ``"total_fixed_capital_cost"``.
+        project_factors (dict, optional): Project overrides of the factors that give the total fixed capital cost.
+        max_units (int): Largest number of parallel units considered.
+        size_steps (int): Unit sizes tried per unit count, at least 2.
+
+    Returns:
+        dict: Arrays with one entry per item:
+            - units: number of parallel units, 0 if no design fits.
+            - unit_size: size of each of the first ``units - 1`` units.
+            - last_unit_size: size of the last unit, at most ``unit_size``.
+            - cost: objective cost of the design, summed over its units.
+            - single_unit_cost: objective cost of one unit of the full size, extrapolated beyond the range.
+
+    Raises:
+        ValueError: If ``objective`` is unknown.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective {objective!r}, expected one of {', '.join(OBJECTIVES)}.")
+    positions = np.asarray(positions, dtype=np.int64)
+    sizes = np.asarray(sizes, dtype=np.float64)
+    arrays = material_catalog.arrays
+    factor = unit_cost_factor(material_catalog, positions, objective, project_factors)
+
+    # items x counts x steps
+    s = sizes[:, np.newaxis, np.newaxis]
+    lower = arrays.s_lower[positions][:, np.newaxis, np.newaxis]
+    upper = arrays.s_upper[positions][:, np.newaxis, np.newaxis]
+    n = np.arange(1, max_units + 1, dtype=np.float64)[np.newaxis, :, np.newaxis]
+    t = np.linspace(0.0, 1.0, max(size_steps, 2))[np.newaxis, np.newaxis, :]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        u_low = s / n
+        u_high = np.where(n > 1, np.minimum(upper, (s - lower) / (n - 1)), s)
+        # a count fits when n * S lower <= S <= n * S upper
+        fits = (s > 0) & (lower > 0) & (u_low <= upper * (1 + 1e-12)) & (s >= n * lower * (1 - 1e-12))
+        u = np.clip(u_low + t * np.maximum(u_high - u_low, 0), lower, upper)
+        last = np.clip(s - (n - 1) * u, lower, upper)
+
+        shape = np.broadcast_shapes(u.shape, last.shape, fits.shape)
+        flat_positions = np.broadcast_to(positions[:, np.newaxis, np.newaxis], shape).ravel()
+        u = np.broadcast_to(u, shape)
+        last = np.broadcast_to(last, shape)
+        unit_cost = pricing.purchased_cost(material_catalog, flat_positions, u.ravel()).reshape(shape)
+        last_cost = pricing.purchased_cost(material_catalog, flat_positions, last.ravel()).reshape(shape)
+        cost = ((n - 1) * unit_cost + last_cost) * factor[:, np.newaxis, np.newaxis]
+        cost = np.where(np.broadcast_to(fits, shape) & np.isfinite(cost), cost, np.inf)
+
+        single_unit_cost = pricing.purchased_cost(material_catalog, positions, sizes) * factor
+
+    best = cost.reshape(len(positions), -1).argmin(axis=1)
+    rows = np.arange(len(positions))
+    best_count, best_step = np.unravel_index(best, shape[1:])
+    best_cost = cost[rows, best_count, best_step]
+    found = np.isfinite(best_cost)
+    return {
+        "units": np.where(found, best_count + 1, 0),
+        "unit_size": np.where(found, u[rows, best_count, best_step], np.nan),
+        "last_unit_size": np.where(found, last[rows, best_count, best_step], np.nan),
+        "cost": np.where(found, best_cost, np.nan),
+        "single_unit_cost": single_unit_cost,
+    }
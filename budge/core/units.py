@@ -0,0 +1,211 @@
+"""Units of the sizing values and their conversion to the catalog units.
+
+Every unit belongs to a physical quantity and has a factor to the SI unit of
+that quantity. Unit text is looked up by a normalized code: stripped,
+lowercased, superscripts folded to digits and common mis-encodings repaired,
+so ``"m³/h"``, ``"m3/hr"`` and ``"mÂ³/h"`` are the same unit. The registry
+holds a square matrix of conversion factors between all of its units, NaN
+between units of different quantities.
+
+A batch of sizes is converted by looking up each distinct unit text once,
+gathering one factor per item from the matrix and multiplying the sizes by it.
+"""
+
+import re
+import unicodedata
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+UNKNOWN = -1
+BLANK = -2
+
+# markers of UTF-8 text decoded as cp1252, e.g. "mÂ²" for "m²"
+MOJIBAKE_MARKERS = ("Â", "Ã", "â")
+
+SECOND, MINUTE, HOUR, DAY = 1.0, 60.0, 3600.0, 86400.0
+LITRE, US_GALLON, CUBIC_FOOT, BARREL = 1e-3, 3.785411784e-3, 0.028316846592, 0.158987294928
+POUND = 0.45359237
+
+
+class Unit(NamedTuple):
+    """
+    A unit of the sizing value.
+
+    Attributes:
+        code (str): The unit as shown, e.g. "m³/h".
+        quantity (str): Physical quantity; units of one quantity convert into each other.
+        factor (float): Size of the unit in the SI unit of its quantity.
+        aliases (tuple): Other spellings accepted for the unit.
+    """
+
+    code: str
+    quantity: str
+    factor: float
+    aliases: Tuple[str, ...] = ()
+
+
+UNITS = (
+    Unit("W", "power", 1.0),
+    Unit("kW", "power", 1e3),
+    Unit("MW", "power", 1e6),
+    Unit("hp", "power", 745.699872),
+    Unit("kcal/h", "power", 4186.8 / HOUR),
+    Unit("GJ/h", "power", 1e9 / HOUR),
+    Unit("Btu/h", "power", 1055.05585262 / HOUR, ("btuh",)),
+    Unit("kg", "mass", 1.0),
+    Unit("g", "mass", 1e-3),
+    Unit("t", "mass", 1e3, ("tonne", "tonnes", "te")),
+    Unit("lb", "mass", POUND, ("lbs",)),
+    Unit("kg/s", "mass flowrate", 1.0),
+    Unit("kg/min", "mass flowrate", 1.0 / MINUTE),
+    Unit("kg/h", "mass flowrate", 1.0 / HOUR),
+    Unit("t/h", "mass flowrate", 1e3 / HOUR, ("tph", "te/h", "tonne/h", "tonnes/h")),
+    Unit("t/d", "mass flowrate", 1e3 / DAY, ("tpd", "te/d", "tonne/d", "tonnes/d")),
+    Unit("lb/h", "mass flowrate", POUND / HOUR, ("lbs/h",)),
+    Unit("m³", "volume", 1.0),
+    Unit("liters", "volume", LITRE, ("l",)),
+    Unit("gal", "volume", US_GALLON, ("usgal",)),
+    Unit("ft³", "volume", CUBIC_FOOT, ("cuft",)),
+    Unit("bbl", "volume", BARREL),
+    Unit("m³/s", "volume flowrate", 1.0),
+    Unit("m³/h", "volume flowrate", 1.0 / HOUR),
+    Unit("m³/d", "volume flowrate", 1.0 / DAY),
+    Unit("liters/s", "volume flowrate", LITRE, ("l/s", "lps")),
+    Unit("liters/min", "volume flowrate", LITRE / MINUTE, ("l/min", "lpm")),
+    Unit("gal/min", "volume flowrate", US_GALLON / MINUTE, ("gpm", "usgpm")),
+    Unit("ft³/min", "volume flowrate", CUBIC_FOOT / MINUTE, ("cfm",)),
+    Unit("bbl/d", "volume flowrate", BARREL / DAY, ("bpd",)),
+    Unit("m", "length", 1.0),
+    Unit("cm", "length", 1e-2),
+    Unit("mm", "length", 1e-3),
+    Unit("ft", "length", 0.3048),
+    Unit("in", "length", 0.0254),
+    Unit("m²", "area", 1.0),
+    Unit("cm²", "area", 1e-4),
+    Unit("ft²", "area", 0.09290304, ("sqft",)),
+)
+
+
+def _repair(text: str) -> str:
+    if any(marker in text for marker in MOJIBAKE_MARKERS):
+        try:
+            return text.encode("cp1252").decode("utf-8")
+        except UnicodeError:
+            pass
+    return text
+
+
+def normalize(text) -> str:
+    """The lookup code of a unit text, e.g. ``"m3/h"`` for ``" m³/hr"``; empty for a blank unit."""
+    if text is None or text != text:
+        return ""
+    # NFKC folds superscripts, "³" -> "3"
+    code = unicodedata.normalize("NFKC", _repair(str(text))).strip().lower()
+    code = re.sub(r"\s+per\s+", "/", code)
+    code = re.sub(r"[\s^.]", "", code)
+    code = re.sub(r"^(liters|litres|liter|litre|ltr|lt)(?=/|$)", "l", code)
+    code = re.sub(r"/(hr|hour)$", "/h", code)
+    code = re.sub(r"/(sec|second)$", "/s", code)
+    code = re.sub(r"/(mins|minute)$", "/min", code)
+    code = re.sub(r"/(day)$", "/d", code)
+    return code
+
+
+class UnitRegistry:
+    """
+    The units that sizing values may be entered in.
+
+    Args:
+        units (list): The units; codes and aliases must normalize to distinct codes.
+    """
+
+    def __init__(self, units: Sequence[Unit]):
+        self.units = tuple(units)
+        self._index = {}
+        for i, unit in enumerate(self.units):
+            for name in (unit.code, *unit.aliases):
+                key = normalize(name)
+                if self._index.setdefault(key, i) != i:
+                    raise ValueError(f"Unit {name!r} is also a spelling of {self.units[self._index[key]].code!r}.")
+        quantities = np.array([unit.quantity for unit in self.units], dtype=object)
+        factors = np.array([unit.factor for unit in self.units], dtype=np.float64)
+        count = len(self.units)
+        # a last row and column of NaN, reached by the UNKNOWN index -1
+        self.matrix = np.full((count + 1, count + 1), np.nan)
+        self.matrix[:count, :count] = np.where(
+            quantities[:, np.newaxis] == quantities[np.newaxis, :], factors[:, np.newaxis] / factors[np.newaxis, :], np.nan
+        )
+
+    def index(self, text) -> int:
+        """Registry index of a unit text; ``BLANK`` for no unit and ``UNKNOWN`` for text that is not a unit."""
+        code = normalize(text)
+        if not code:
+            return BLANK
+        return self._index.get(code, UNKNOWN)
+
+    def indices(self, values: Sequence) -> np.ndarray:
+        """Registry index of every unit text, looking up each distinct text once."""
+        raw_codes, distinct = pd.factorize(np.asarray(values, dtype=object), use_na_sentinel=False)
+        lookup = np.array([self.index(text) for text in distinct], dtype=np.int64)
+        return lookup[raw_codes]
+
+    def code(self, text) -> Optional[str]:
+        """The registry code of a unit text, e.g. "m³/h" for "m3/hr"; None if it is not a unit."""
+        i = self.index(text)
+        return self.units[i].code if i >= 0 else None
+
+    def compatible(self, text) -> List[str]:
+        """Codes of the units the given unit converts to, itself first; empty if it is not a unit."""
+        i = self.index(text)
+        if i < 0:
+            return []
+        others = [unit.code for unit in self.units if unit.quantity == self.units[i].quantity and unit.code != self.units[i].code]
+        return [self.units[i].code, *others]
+
+    def factors(self, from_indices: np.ndarray, to_indices: np.ndarray) -> np.ndarray:
+        """
+        Factor from each ``from`` unit to the matching ``to`` unit.
+
+        Blank ``from`` units keep the ``to`` unit and get 1. Unknown units and
+        units of different quantities get NaN.
+        """
+        from_indices = np.asarray(from_indices, dtype=np.int64)
+        to_indices = np.asarray(to_indices, dtype=np.int64)
+        factors = self.matrix[np.maximum(from_indices, UNKNOWN), np.maximum(to_indices, UNKNOWN)]
+        factors[from_indices == BLANK] = 1.0
+        return factors
+
+
+REGISTRY = UnitRegistry(UNITS)
+
+
+def to_catalog_units(
+    material_catalog, positions: np.ndarray, sizes: np.ndarray, sizing_units: Sequence
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converts a batch of sizes to the units of their catalog rows.
+
+    Args:
+        material_catalog (Catalog): The catalog; ``unit_ids`` holds the registry index of each row's unit.
+        positions: Catalog row position of each item.
+        sizes: Sizing value of each item, in its ``sizing_units``.
+        sizing_units: Unit text of each item; blank for the catalog unit.
+
+    Returns:
+        tuple: The sizes in catalog units, NaN where the unit does not convert,
+        and a mask of the items whose unit converts.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    sizes = np.asarray(sizes, dtype=np.float64)
+    factors = REGISTRY.factors(REGISTRY.indices(sizing_units), material_catalog.unit_ids[positions])
+    convertible = ~np.isnan(factors)
+    return sizes * factors, convertible
+
+
+def entered_units(material_catalog, positions: np.ndarray, known: np.ndarray, sizing_units: Sequence) -> np.ndarray:
+    """The unit each size is entered in: its own unit, else the unit of its catalog row; empty for unknown items."""
+    entered = np.array([str(unit).strip() if unit is not None and unit == unit else "" for unit in sizing_units], dtype=object)
+    catalog_units = np.where(known, material_catalog.arrays.text("units", np.asarray(positions, dtype=np.int64)), "")
+    return np.where(entered != "", entered, catalog_units).astype(object)
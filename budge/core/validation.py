@@ -0,0 +1,115 @@
+"""Vectorized range validation of line item sizes against the catalog limits."""
+
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+
+class RangeStatus:
+    """Per-item status codes, stored as int8 arrays."""
+
+    IN_RANGE = 0
+    BELOW_RANGE = 1
+    ABOVE_RANGE = 2
+    MISSING_BOUNDS = 3
+    INVALID_SIZE = 4
+    UNKNOWN_ITEM = 5
+    INVALID_UNIT = 6
+
+    LABELS = {
+        IN_RANGE: "in range",
+        BELOW_RANGE: "below range",
+        ABOVE_RANGE: "above range",
+        MISSING_BOUNDS: "missing bounds",
+        INVALID_SIZE: "invalid size",
+        UNKNOWN_ITEM: "unknown item",
+        INVALID_UNIT: "invalid unit",
+    }
+
+
+def check_ranges(material_catalog, positions: Sequence[int], sizes: Sequence[float]) -> np.ndarray:
+    """
+    Checks every item's size against ``S lower`` and ``S upper`` in one pass.
+
+    Args:
+        material_catalog (Catalog): The catalog holding the limits.
+        positions: Catalog row position of each item.
+        sizes: Sizing value of each item.
+
+    Returns:
+        np.ndarray: A ``RangeStatus`` code per item.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    sizes = np.asarray(sizes, dtype=float)
+    s_lower = material_catalog.arrays.s_lower[positions]
+    s_upper = material_catalog.arrays.s_upper[positions]
+
+    invalid = ~np.isfinite(sizes) | (sizes <= 0)
+    missing = np.isnan(s_lower) | np.isnan(s_upper)
+    return np.select(
+        [invalid, missing, sizes < s_lower, sizes > s_upper],
+        [RangeStatus.INVALID_SIZE, RangeStatus.MISSING_BOUNDS, RangeStatus.BELOW_RANGE, RangeStatus.ABOVE_RANGE],
+        RangeStatus.IN_RANGE,
+    ).astype(np.int8)
+
+
+def priceable(status: np.ndarray, allow_extrapolation: bool = False) -> np.ndarray:
+    """
+    Mask of the items that may be priced.
+
+    Items without limits are priced as before. Items outside their limits are
+    only priced, and flagged as extrapolated, when ``allow_extrapolation`` is set.
+    """
+    ok = (status == RangeStatus.IN_RANGE) | (status == RangeStatus.MISSING_BOUNDS)
+    if allow_extrapolation:
+        ok |= (status == RangeStatus.BELOW_RANGE) | (status == RangeStatus.ABOVE_RANGE)
+    return ok
+
+
+def diagnostics(
+    material_catalog,
+    positions: Sequence[int],
+    sizes: Sequence[float],
+    status: np.ndarray,
+    allow_extrapolation: bool = False,
+) -> List[Dict]:
+    """
+    Human readable per-item diagnostics for a batch.
+
+    Returns:
+        list: One dict per item with ``status``, ``priced``, ``extrapolated`` and ``message``.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    valid = status != RangeStatus.UNKNOWN_ITEM
+    s_lower = np.full(len(status), np.nan)
+    s_upper = np.full(len(status), np.nan)
+    s_lower[valid] = material_catalog.arrays.s_lower[positions[valid]]
+    s_upper[valid] = material_catalog.arrays.s_upper[positions[valid]]
+    priced = priceable(status, allow_extrapolation)
+
+    results = []
+    for code, size, lower, upper, is_priced in zip(status.tolist(), sizes, s_lower, s_upper, priced.tolist()):
+        outside = code in (RangeStatus.BELOW_RANGE, RangeStatus.ABOVE_RANGE)
+        if code == RangeStatus.IN_RANGE:
+            message = ""
+        elif outside:
+            message = f"The input value {size} is outside {lower} to {upper}."
+            if is_priced:
+                message += " The cost is extrapolated."
+        elif code == RangeStatus.MISSING_BOUNDS:
+            message = "The catalog has no sizing limits for this item."
+        elif code == RangeStatus.INVALID_SIZE:
+            message = "Sizing value must be a positive number."
+        elif code == RangeStatus.INVALID_UNIT:
+            message = "The sizing unit is unknown or does not measure the catalog's sizing quantity."
+        else:
+            message = "No catalog entry matches this item."
+        results.append(
+            {
+                "status": RangeStatus.LABELS[code],
+                "priced": is_priced,
+                "extrapolated": outside and is_priced,
+                "message": message,
+            }
+        )
+    return results
@@ -0,0 +1,197 @@
+"""Lightweight in-process metrics with a Prometheus-style plaintext export.
+
+Every Dash callback request is timed on the Flask server, and functions can be
+timed with the ``timed`` decorator. Recording one observation is a bucket
+search and a few additions under a per-series lock, cheap enough to leave on in
+production.
+"""
+
+import bisect
+import functools
+import threading
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+import flask
+
+from budge.config.main import METRICS_ENABLED
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1_000, 4_000, 16_000, 64_000, 256_000, 1_000_000, 4_000_000, 16_000_000)
+
+DASH_UPDATE_PATH = "_dash-update-component"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative histogram with fixed upper bounds, as in the Prometheus data model."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[list, float, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class MetricsRegistry:
+    """Named histograms, one series per label set."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Tuple[str, Sequence[float], Dict[Labels, Histogram]]] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float], **labels) -> Histogram:
+        key = tuple(sorted(labels.items()))
+        metric = self._metrics.get(name)
+        series = metric[2].get(key) if metric else None
+        if series is None:
+            with self._lock:
+                metric = self._metrics.setdefault(name, (help_text, buckets, {}))
+                series = metric[2].setdefault(key, Histogram(metric[1]))
+        return series
+
+    def observe(self, name: str, help_text: str, buckets: Sequence[float], value: float, **labels) -> None:
+        self.histogram(name, help_text, buckets, **labels).observe(value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._metrics.clear()
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            metrics = [(name, help_text, dict(series)) for name, (help_text, _, series) in self._metrics.items()]
+        for name, help_text, series in sorted(metrics):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in sorted(series.items()):
+                counts, total, count = histogram.snapshot()
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total!r}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def timed(func=None, *, name: Optional[str] = None):
+    """
+    Records the duration of every call of the decorated function.
+
+    Can be used bare (``@timed``) or with an explicit metric label
+    (``@timed(name="estimation.run")``).
+    """
+    if func is None:
+        return functools.partial(timed, name=name)
+    label = name or f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not METRICS_ENABLED:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            REGISTRY.observe(
+                "budge_function_duration_seconds",
+                "Duration of instrumented functions.",
+                LATENCY_BUCKETS,
+                time.perf_counter() - start,
+                function=label,
+            )
+
+    return wrapper
+
+
+def callback_name() -> str:
+    """Output id of the Dash callback handled by the current request."""
+    body = flask.request.get_json(silent=True) or {}
+    return str(body.get("output", "unknown"))
+
+
+def is_callback_request() -> bool:
+    return flask.request.method == "POST" and flask.request.path.endswith(DASH_UPDATE_PATH)
+
+
+def instrument_app(dash_app, route: str) -> None:
+    """
+    Times every Dash callback request and serves the metrics at ``route``.
+
+    Args:
+        dash_app (dash.Dash): The app whose callbacks are timed.
+        route (str): URL of the plaintext metrics endpoint.
+    """
+    server = dash_app.server
+
+    @server.route(route)
+    def metrics():
+        return flask.Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+    if not METRICS_ENABLED:
+        return
+
+    @server.before_request
+    def start_callback_timer():
+        if is_callback_request():
+            flask.g.budge_callback_start = time.perf_counter()
+
+    @server.after_request
+    def record_callback(response):
+        start = flask.g.pop("budge_callback_start", None)
+        if start is None:
+            return response
+        duration = time.perf_counter() - start
+        callback = callback_name()
+        REGISTRY.observe(
+            "budge_callback_duration_seconds",
+            "Server-side duration of Dash callback requests.",
+            LATENCY_BUCKETS,
+            duration,
+            callback=callback,
+            status=str(response.status_code),
+        )
+        REGISTRY.observe(
+            "budge_callback_request_bytes",
+            "Size of Dash callback request bodies.",
+            SIZE_BUCKETS,
+            flask.request.content_length or 0,
+            callback=callback,
+        )
+        REGISTRY.observe(
+            "budge_callback_response_bytes",
+            "Size of Dash callback response bodies.",
+            SIZE_BUCKETS,
+            response.calculate_content_length() or 0,
+            callback=callback,
+        )
+        return response
@@ -0,0 +1,151 @@
+"""Per-callback accounting of how many bytes each store adds to Dash requests and responses."""
+
+import json
+import logging
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+import flask
+
+from budge.config.main import (
+    DATA_STORE,
+    PAYLOAD_TRACKING,
+    PAYLOAD_WARN_BYTES,
+    STORE_ID,
+)
+from budge.monitoring.metrics import REGISTRY, SIZE_BUCKETS, callback_name, is_callback_request
+
+logger = logging.getLogger(__name__)
+
+TRACKED_STORES = (STORE_ID, DATA_STORE)
+
+REQUEST = "request"
+RESPONSE = "response"
+
+
+def serialized_size(value) -> int:
+    """Bytes the value takes up as compact JSON."""
+    return len(json.dumps(value, separators=(",", ":"), default=str))
+
+
+def _flatten(entries) -> Iterable[dict]:
+    for entry in entries or []:
+        if isinstance(entry, list):
+            yield from _flatten(entry)
+        elif isinstance(entry, dict):
+            yield entry
+
+
+class PayloadStats:
+    """Running count, total and maximum of store payload sizes per (callback, store, direction)."""
+
+    def __init__(self):
+        self._stats: Dict[Tuple[str, str, str], List[int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, callback: str, store: str, direction: str, size: int) -> None:
+        key = (callback, store, direction)
+        with self._lock:
+            stats = self._stats.setdefault(key, [0, 0, 0])
+            stats[0] += 1
+            stats[1] += size
+            stats[2] = max(stats[2], size)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def top(self, limit: int = 20) -> List[dict]:
+        """The biggest offenders by total bytes moved."""
+        with self._lock:
+            items = [(key, list(stats)) for key, stats in self._stats.items()]
+        items.sort(key=lambda item: item[1][1], reverse=True)
+        return [
+            {
+                "callback": callback,
+                "store": store,
+                "direction": direction,
+                "count": count,
+                "total_bytes": total,
+                "mean_bytes": total // count,
+                "max_bytes": largest,
+            }
+            for (callback, store, direction), (count, total, largest) in items[:limit]
+        ]
+
+    def render(self, limit: int = 20) -> str:
+        """Plaintext table of the top offenders."""
+        header = f"{'total':>12} {'mean':>10} {'max':>10} {'count':>7}  {'direction':<9} {'store':<22} callback"
+        lines = [header, "-" * len(header)]
+        for row in self.top(limit):
+            lines.append(
+                f"{row['total_bytes']:>12} {row['mean_bytes']:>10} {row['max_bytes']:>10} {row['count']:>7}  "
+                f"{row['direction']:<9} {row['store']:<22} {row['callback']}"
+            )
+        return "\n".join(lines) + "\n"
+
+
+STATS = PayloadStats()
+
+
+def record(callback: str, store: str, direction: str, size: int) -> None:
+    STATS.record(callback, store, direction, size)
+    REGISTRY.observe(
+        "budge_store_payload_bytes",
+        "Serialized size of tracked stores in Dash callback requests and responses.",
+        SIZE_BUCKETS,
+        size,
+        callback=callback,
+        store=store,
+        direction=direction,
+    )
+    if size > PAYLOAD_WARN_BYTES:
+        logger.warning(
+            "Store %s is %d bytes in the %s of callback %s (threshold %d)",
+            store,
+            size,
+            direction,
+            callback,
+            PAYLOAD_WARN_BYTES,
+        )
+
+
+def instrument_app(dash_app, route: str, stores: Tuple[str, ...] = TRACKED_STORES) -> None:
+    """
+    Records the size of each tracked store in every callback request and response.
+
+    Args:
+        dash_app (dash.Dash): The app to instrument.
+        route (str): URL of the plaintext summary of the top offenders.
+        stores (tuple): Component ids of the stores to track.
+    """
+    server = dash_app.server
+
+    @server.route(route)
+    def payload_summary():
+        return flask.Response(STATS.render(), mimetype="text/plain")
+
+    if not PAYLOAD_TRACKING:
+        return
+
+    @server.after_request
+    def record_store_sizes(response):
+        if not is_callback_request() or response.status_code != 200:
+            return response
+        body = flask.request.get_json(silent=True) or {}
+        callback = callback_name()
+
+        for entry in _flatten(body.get("inputs", []) + body.get("state", [])):
+            if entry.get("id") in stores:
+                record(callback, entry["id"], REQUEST, serialized_size(entry.get("value")))
+
+        outputs = body.get("outputs")
+        outputs = outputs if isinstance(outputs, list) else [outputs]
+        output_ids = {entry.get("id") for entry in _flatten(outputs)} & set(stores)
+        if output_ids:
+            # only parse the response when it can contain a tracked store
+            updates = json.loads(response.get_data()).get("response", {})
+            for store in output_ids:
+                if store in updates:
+                    record(callback, store, RESPONSE, serialized_size(updates[store]))
+        return response
@@ -0,0 +1,126 @@
+"""Opt-in profiling of Dash callback requests.
+
+Profiling is switched on for every callback with ``BUDGE_PROFILE=1``, or for a
+single request by sending the ``X-Budge-Profile`` header together with the
+configured token, or from an allow-listed address. Either can be narrowed to
+the callbacks whose output id contains ``BUDGE_PROFILE_TARGET`` or the header
+value. Profiles are written as pstats files, which ``python -m pstats``,
+snakeviz and similar viewers open directly.
+"""
+
+import cProfile
+import hmac
+import logging
+import os
+import re
+import threading
+import time
+from typing import Optional
+
+import flask
+
+from budge.config.main import (
+    PROFILE_ALLOWED_ADDRS,
+    PROFILE_DIR,
+    PROFILE_ENABLED,
+    PROFILE_KEEP,
+    PROFILE_TARGET,
+    PROFILE_TOKEN,
+)
+from budge.monitoring.metrics import callback_name, is_callback_request
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Budge-Profile"
+TOKEN_HEADER = "X-Budge-Profile-Token"
+
+# profiling slows a request several-fold, so only one request is profiled at a time
+_profile_lock = threading.Lock()
+
+
+def requested_target() -> Optional[str]:
+    """
+    The callback filter for the current request, or None if it should not be profiled.
+
+    An empty string means "any callback".
+    """
+    header = flask.request.headers.get(PROFILE_HEADER)
+    if header is not None and header_allowed():
+        return "" if header.strip().lower() in ("", "1", "true", "yes") else header.strip()
+    if PROFILE_ENABLED:
+        return PROFILE_TARGET
+    return None
+
+
+def header_allowed() -> bool:
+    """Whether the client sent the profiling token or connects from an allow-listed address."""
+    token = flask.request.headers.get(TOKEN_HEADER)
+    if PROFILE_TOKEN and token is not None and hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode()):
+        return True
+    return flask.request.remote_addr in PROFILE_ALLOWED_ADDRS
+
+
+def profile_path(directory: str, callback: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", callback).strip("-")[:80] or "callback"
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(directory, f"{stamp}-{int(time.time() * 1000) % 1000:03d}-{slug}.prof")
+
+
+def prune_profiles(directory: str, keep: int) -> None:
+    """Deletes the oldest profiles so at most ``keep`` are left."""
+    profiles = [
+        os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".prof")
+    ]
+    profiles.sort(key=os.path.getmtime)
+    for path in profiles[: max(len(profiles) - keep, 0)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def instrument_app(dash_app, directory: str = PROFILE_DIR, keep: int = PROFILE_KEEP) -> None:
+    """
+    Profiles the callback requests that ask for it and writes the results to ``directory``.
+
+    The hooks are always installed, since the header can enable profiling
+    without a restart; requests that do not ask for profiling only pay for a
+    header lookup.
+    """
+    server = dash_app.server
+
+    @server.before_request
+    def start_profiler():
+        if not is_callback_request():
+            return
+        target = requested_target()
+        if target is None or target not in callback_name():
+            return
+        if not _profile_lock.acquire(blocking=False):
+            logger.info("Skipping profile of %s, another request is being profiled", callback_name())
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # from Python 3.12, another profiling tool is active in this process
+            _profile_lock.release()
+            return
+        flask.g.budge_profiler = profiler
+
+    @server.teardown_request
+    def stop_profiler(_exception=None):
+        profiler = flask.g.pop("budge_profiler", None)
+        if profiler is None:
+            return
+        try:
+            profiler.disable()
+            os.makedirs(directory, exist_ok=True)
+            path = profile_path(directory, callback_name())
+            profiler.dump_stats(path)
+            prune_profiles(directory, keep)
+            logger.info("Wrote profile %s", path)
+        except OSError:
+            logger.exception("Failed to write profile")
+        finally:
+            _profile_lock.release()
@@ -1,3 +1,4 @@
+import json
 import os
 import traceback
 from typing import Final
@@ -12,12 +13,14 @@ from agility.components import (
     InputCustom,
     MessageCustom,
 )
-from dash import Dash, Input, Output, State, html
+from dash import Dash, Input, Output, State, dash_table, dcc, html
 from dash.exceptions import PreventUpdate
+from dash_ag_grid import AgGrid
 
-from budge.config.main import DATA_STORE, STORE_ID
+from budge.config.main import DATA_STORE, MAX_PARALLEL_UNITS, STORE_ID
+from budge.core import catalog, splitting, units
 from budge.core.definitions import Factors
-from budge.project import estimation
+from budge.project import estimation, line_items, storage
 
 dash.register_page(__name__)
 app: Dash = dash.get_app()
@@ -44,20 +47,97 @@ class PageIDs:
         self.feedback_run: Final[str] = f"{prefix}_feedback_run"
         self.output: Final[str] = f"{prefix}_output"
 
+        self.search_dropdown: Final[str] = f"{prefix}_search_dropdown"
         self.method_dropdown: Final[str] = f"{prefix}_method_dropdown"
         self.plant_dropdown: Final[str] = f"{prefix}_plant_dropdown"
         self.equipment_dropdown: Final[str] = f"{prefix}_equipment_dropdown"
         self.equipment_type_dropdown: Final[str] = f"{prefix}_equipment_type_dropdown"
         self.sizing_quantity_input: Final[str] = f"{prefix}_sizing_quantity_input"
+        self.extrapolation_checklist: Final[str] = f"{prefix}_extrapolation_checklist"
+        self.area_input: Final[str] = f"{prefix}_area_input"
+        self.sizing_unit_dropdown: Final[str] = f"{prefix}_sizing_unit_dropdown"
+        self.summary_output: Final[str] = f"{prefix}_summary_output"
         self.purchased_equipment_cost_output: Final[str] = (
             f"{prefix}_purchased_equipment_cost_output"
         )
         self.total_cost_output: Final[str] = f"{prefix}_total_cost_output"
+        self.priced_by_output: Final[str] = f"{prefix}_priced_by_output"
+        self.total_fixed_capital_cost_output: Final[str] = (
+            f"{prefix}_total_fixed_capital_cost_output"
+        )
+        self.project_total_output: Final[str] = f"{prefix}_project_total_output"
+        self.line_item_grid: Final[str] = f"{prefix}_line_item_grid"
+        self.line_item_refresh: Final[str] = f"{prefix}_line_item_refresh"
+        self.feedback_line_items: Final[str] = f"{prefix}_feedback_line_items"
+        self.split_objective: Final[str] = f"{prefix}_split_objective"
+        self.split_btn: Final[str] = f"{prefix}_split_btn"
+        self.split_output: Final[str] = f"{prefix}_split_output"
+        self.split_apply_btn: Final[str] = f"{prefix}_split_apply_btn"
+        self.feedback_split: Final[str] = f"{prefix}_feedback_split"
+        self.project_factor_inputs: Final[dict] = {
+            name: f"{prefix}_project_{name}_input" for name, _ in PROJECT_FACTORS
+        }
+        self.scenario_table: Final[str] = f"{prefix}_scenario_table"
+        self.add_scenario_btn: Final[str] = f"{prefix}_add_scenario_btn"
+        self.scenario_output: Final[str] = f"{prefix}_scenario_output"
+
 
+PROJECT_FACTORS = [
+    ("offsites_factor", "Offsites Factor"),
+    ("design_and_engineering_factor", "Design & Engineering Factor"),
+    ("contingency", "Contingency"),
+    ("location_factor", "Location Factor"),
+]
 
 ids = PageIDs()
 
+CURRENCY_FORMAT = {"function": "params.value == null ? 'n/a' : d3.format('$,.2f')(params.value)"}
+
+LINE_ITEM_COLUMNS = [
+    {"field": "method", "headerName": "Method", "filter": "agTextColumnFilter"},
+    {"field": "plant_type", "headerName": "Plant Type", "filter": "agTextColumnFilter"},
+    {"field": "equipment", "headerName": "Equipment", "filter": "agTextColumnFilter"},
+    {"field": "equipment_type", "headerName": "Equipment Type", "filter": "agTextColumnFilter"},
+    {"field": "area", "headerName": "Area", "filter": "agTextColumnFilter"},
+    {
+        "field": "sizing_value",
+        "headerName": "Sizing Value",
+        "filter": "agNumberColumnFilter",
+        "editable": True,
+        "cellEditor": "agNumberCellEditor",
+    },
+    {"field": "sizing_unit", "headerName": "Unit", "filter": "agTextColumnFilter"},
+    {
+        "field": "purchased_cost",
+        "headerName": "Purchased Cost",
+        "filter": "agNumberColumnFilter",
+        "valueFormatter": CURRENCY_FORMAT,
+    },
+    {
+        "field": "total_fixed_capital_cost",
+        "headerName": "Total Fixed Capital Cost",
+        "filter": "agNumberColumnFilter",
+        "valueFormatter": CURRENCY_FORMAT,
+    },
+    {"field": "status", "headerName": "Status", "filter": "agTextColumnFilter"},
+]
+
 PAGE_TITLE = "Capital Cost Estimation"
+SEARCH_LIMIT = 25
+
+SCENARIO_COLUMNS = [
+    {"name": "Scenario", "id": "name"},
+    {"name": "Offsites", "id": "offsites_factor", "type": "numeric"},
+    {"name": "Design & Eng.", "id": "design_and_engineering_factor", "type": "numeric"},
+    {"name": "Contingency", "id": "contingency", "type": "numeric"},
+    {"name": "Location", "id": "location_factor", "type": "numeric"},
+]
+SUMMARY_COLUMNS = [
+    {"name": "Method", "id": "method"},
+    {"name": "Priced Items", "id": "items"},
+    {"name": "Installed Cost", "id": "installed_cost"},
+    {"name": "Total Fixed Capital Cost", "id": "total_fixed_capital_cost"},
+]
 
 layout = html.Div(
     [
@@ -77,6 +157,64 @@ layout = html.Div(
         html.Div(id=ids.run_container, className="px-6 pb-2 w-96"),
         html.Div(id=ids.feedback_run, className="px-6 pb-2 w-96"),
         # html.Div(id=ids.output, className="px-6 pb-2 w-60"),
+        html.Div(
+            [
+                html.H1("Line Items", className="dash-h1"),
+                html.P(
+                    "Rows are loaded, sorted and filtered on the server. Edit a sizing value to reprice its row.",
+                    className="text-sm text-gray-500",
+                ),
+                html.Div(
+                    [
+                        ButtonCustom(id=ids.add_btn, label="Add Current Selection", color="bg-gray-500").layout,
+                        ButtonCustom(id=ids.delete_btn, label="Delete Selected", color="bg-gray-500").layout,
+                    ],
+                    className="flex gap-2 w-96",
+                ),
+                html.Div(id=ids.feedback_line_items, className="pt-2"),
+                AgGrid(
+                    id=ids.line_item_grid,
+                    columnDefs=LINE_ITEM_COLUMNS,
+                    defaultColDef={"sortable": True, "resizable": True, "floatingFilter": True},
+                    rowModelType="infinite",
+                    getRowId="params.data.item_id",
+                    dashGridOptions={
+                        "rowSelection": "multiple",
+                        "cacheBlockSize": line_items.DEFAULT_BLOCK,
+                        "maxBlocksInCache": 20,
+                    },
+                    style={"height": "480px"},
+                    className="ag-theme-alpine pt-2",
+                ),
+                dcc.Store(id=ids.line_item_refresh),
+            ],
+            className="px-6 pb-5",
+        ),
+        html.Div(
+            [
+                html.H1("Parallel Units", className="dash-h1"),
+                html.P(
+                    "Finds the cheapest number and sizes of parallel units for line items above their sizing range.",
+                    className="text-sm text-gray-500",
+                ),
+                dcc.RadioItems(
+                    id=ids.split_objective,
+                    options=[
+                        {"label": " Minimize total fixed capital cost", "value": splitting.TOTAL_FIXED_CAPITAL_COST},
+                        {"label": " Minimize installed cost", "value": splitting.INSTALLED_COST},
+                    ],
+                    value=splitting.TOTAL_FIXED_CAPITAL_COST,
+                    className="mt-2",
+                ),
+                html.Div(
+                    ButtonCustom(id=ids.split_btn, label="Find Parallel Units", color="bg-gray-500").layout,
+                    className="w-96",
+                ),
+                html.Div(id=ids.split_output, className="pt-2"),
+                html.Div(id=ids.feedback_split, className="pt-2 w-96"),
+            ],
+            className="px-6 pb-5",
+        ),
         html.Div(
             id=ids.output,
             className="px-6 pb-5 w-96 rounded shadow-lg",
@@ -102,7 +240,7 @@ layout = html.Div(
 )
 def load_status(data):
     """loading the data"""
-    if data is None:
+    if storage.resolve(data) is None:
         return MessageCustom(
             messages="Project not loaded. Go to start page and create new or open existing project.",
             success=False,
@@ -114,39 +252,61 @@ def load_status(data):
     Output(ids.input, "children"),
     Output(ids.save_container, "children"),
     Input(STORE_ID, "data"),
-    State(DATA_STORE, "data"),
 )
-def display_input(data, material_data):
+def display_input(data):
     """displaying input"""
 
+    data = storage.resolve(data)
     if data is None:
         raise PreventUpdate
 
     estimation_input = data.get("estimation_input", {})
     estimation_input, errors = estimation.validate_input(estimation_input)
-    df = pd.DataFrame(material_data)
+    material_catalog = catalog.get_catalog()
 
     method_options = [
-        {"label": method, "value": method} for method in df[Factors.METHOD].unique()
+        {"label": method, "value": method}
+        for method in material_catalog.options(Factors.METHOD)
     ]
 
     plant_options = [
-        {"label": plant, "value": plant} for plant in df[Factors.PLANT_TYPE].unique()
+        {"label": plant, "value": plant}
+        for plant in material_catalog.options(Factors.PLANT_TYPE)
     ]
 
     equipment_options = [
         {"label": equipment, "value": equipment}
-        for equipment in df[Factors.EQUIPMENT].unique()
+        for equipment in material_catalog.options(Factors.EQUIPMENT)
     ]
 
     equipment_type_options = [
         {"label": equipment_type, "value": equipment_type}
-        for equipment_type in df[Factors.EQUIPMENT_TYPE].unique()
+        for equipment_type in material_catalog.options(Factors.EQUIPMENT_TYPE)
+    ]
+
+    row = material_catalog.index.get(estimation.item_key(estimation_input))
+    unit_options = [
+        {"label": unit, "value": unit}
+        for unit in (units.REGISTRY.compatible(material_catalog.row(row).units) if row is not None else [])
     ]
 
+    project_factors = estimation.get_project_factors(data)
+
     input_fields = html.Div(
         [
             html.H1("Input", className="dash-h1"),
+            html.Div(
+                [
+                    html.Label("Search Equipment", className="font-bold"),
+                    dcc.Dropdown(
+                        id=ids.search_dropdown,
+                        options=[],
+                        placeholder="Type to search equipment, type or sizing quantity",
+                        searchable=True,
+                    ),
+                ],
+                className="mb-4",
+            ),
             DropdownCustom(
                 id=ids.method_dropdown,
                 label="Select Method",
@@ -183,6 +343,70 @@ def display_input(data, material_data):
                 error_message=errors.get("sizing_value", ""),
                 help_text="Enter sizing value",
             ).layout,
+            DropdownCustom(
+                id=ids.sizing_unit_dropdown,
+                label="Sizing Unit",
+                value=estimation_input.get("sizing_unit") or "",
+                options=unit_options,
+                error_message=errors.get("sizing_unit", ""),
+            ).layout,
+            InputCustom(
+                id=ids.area_input,
+                label="Project Area",
+                value=estimation_input.get("area") or "",
+                error_message=errors.get("area", ""),
+                help_text="Optional, e.g. Area 100; used to group the project totals",
+            ).layout,
+            dcc.Checklist(
+                id=ids.extrapolation_checklist,
+                options=[{"label": " Allow extrapolation outside the sizing range", "value": "allow"}],
+                value=["allow"] if estimation_input.get("allow_extrapolation") else [],
+                className="mt-2",
+            ),
+            html.Div(
+                [
+                    html.Label("Scenarios", className="font-bold"),
+                    html.P(
+                        "Empty factors keep the catalog value.",
+                        className="text-sm text-gray-500",
+                    ),
+                    dash_table.DataTable(
+                        id=ids.scenario_table,
+                        columns=[{**column, "editable": True} for column in SCENARIO_COLUMNS],
+                        data=estimation.get_scenarios(data),
+                        editable=True,
+                        row_deletable=True,
+                        style_cell={"textAlign": "left", "padding": "4px"},
+                    ),
+                    html.Button(
+                        "Add Scenario",
+                        id=ids.add_scenario_btn,
+                        className="bg-gray-300 p-1 mt-2 w-40",
+                    ),
+                ],
+                className="mt-4",
+            ),
+            html.Div(
+                [
+                    html.Label("Project Factors", className="font-bold"),
+                    html.P(
+                        "Override the catalog factors for the whole project. Empty factors keep the catalog value.",
+                        className="text-sm text-gray-500",
+                    ),
+                ]
+                + [
+                    InputCustom(
+                        id=ids.project_factor_inputs[name],
+                        type="number",
+                        label=label,
+                        value=project_factors.get(name),
+                        error_message="",
+                        help_text="Catalog value",
+                    ).layout
+                    for name, label in PROJECT_FACTORS
+                ],
+                className="mt-4",
+            ),
         ]
     )
 
@@ -195,20 +419,58 @@ def display_input(data, material_data):
     return input_fields, save_btn
 
 
+# Callback to search the catalog as the user types
+@app.callback(
+    Output(ids.search_dropdown, "options"),
+    Input(ids.search_dropdown, "search_value"),
+)
+def update_search_options(search_value):
+    if not search_value:
+        raise PreventUpdate
+    matches = catalog.get_catalog().search(search_value, limit=SEARCH_LIMIT)
+    key_columns = [Factors.METHOD, Factors.PLANT_TYPE, Factors.EQUIPMENT, Factors.EQUIPMENT_TYPE]
+    return [
+        {
+            "label": f"{row[Factors.EQUIPMENT]} - {row[Factors.EQUIPMENT_TYPE]} "
+            f"({row[Factors.SIZING_QUANTITY]}) | {row[Factors.METHOD]}, {row[Factors.PLANT_TYPE]}",
+            # the row key rather than its position, which changes when the catalog reloads
+            "value": json.dumps([row[column] for column in key_columns]),
+            # matches are fuzzy, so stop the dropdown from filtering them again by label
+            "search": search_value,
+        }
+        for _, row in matches.iterrows()
+    ]
+
+
+# Callback to fill in all selections from a search result
+@app.callback(
+    Output(ids.method_dropdown, "value"),
+    Output(ids.plant_dropdown, "value"),
+    Output(ids.equipment_dropdown, "value"),
+    Output(ids.equipment_type_dropdown, "value"),
+    Input(ids.search_dropdown, "value"),
+    prevent_initial_call=True,
+)
+def apply_search_selection(value):
+    if value is None:
+        raise PreventUpdate
+    key = tuple(json.loads(value))
+    if catalog.get_catalog().index.get(key) is None:
+        # the row is gone from a reloaded catalog
+        raise PreventUpdate
+    return key
+
+
 # Callbacks to update options based on selections
 @app.callback(
     Output(ids.plant_dropdown, "options"),
     Input(ids.method_dropdown, "value"),
     State(STORE_ID, "data"),
-    State(DATA_STORE, "data"),
 )
-def update_plant_options(method_choice, data, material_data):
+def update_plant_options(method_choice, data):
     if method_choice:
-        df = pd.DataFrame(material_data)
-        plant_types = (
-            df[df[Factors.METHOD] == method_choice][Factors.PLANT_TYPE]
-            .dropna()
-            .unique()
+        plant_types = catalog.get_catalog().options(
+            Factors.PLANT_TYPE, {Factors.METHOD: method_choice}
         )
         return [{"label": plant, "value": plant} for plant in plant_types]
     return []
@@ -217,15 +479,11 @@ def update_plant_options(method_choice, data, material_data):
 @app.callback(
     Output(ids.equipment_dropdown, "options"),
     Input(ids.plant_dropdown, "value"),
-    State(DATA_STORE, "data"),
 )
-def update_equipment_options(plant_choice, material_data):
+def update_equipment_options(plant_choice):
     if plant_choice:
-        df = pd.DataFrame(material_data)
-        equipment_types = (
-            df[df[Factors.PLANT_TYPE] == plant_choice][Factors.EQUIPMENT]
-            .dropna()
-            .unique()
+        equipment_types = catalog.get_catalog().options(
+            Factors.EQUIPMENT, {Factors.PLANT_TYPE: plant_choice}
         )
         return [
             {"label": equipment, "value": equipment} for equipment in equipment_types
@@ -241,18 +499,16 @@ def update_equipment_options(plant_choice, material_data):
         Input(ids.equipment_dropdown, "value"),
         Input(STORE_ID, "data"),
     ],
-    State(DATA_STORE, "data"),
 )
-def update_equipment_type_options(
-    method_choice, plant_choice, equipment_choice, _, material_data
-):
+def update_equipment_type_options(method_choice, plant_choice, equipment_choice, _):
     if method_choice and plant_choice and equipment_choice:
-        specific_types = (
-            estimation.filter_material_data(
-                material_data, method_choice, plant_choice, equipment_choice
-            )[Factors.EQUIPMENT_TYPE]
-            .dropna()
-            .unique()
+        specific_types = catalog.get_catalog().options(
+            Factors.EQUIPMENT_TYPE,
+            {
+                Factors.METHOD: method_choice,
+                Factors.PLANT_TYPE: plant_choice,
+                Factors.EQUIPMENT: equipment_choice,
+            },
         )
         return [
             {"label": equipment_type, "value": equipment_type}
@@ -261,8 +517,60 @@ def update_equipment_type_options(
     return []
 
 
-# Update Sizing Label and Input Placeholder based on selected specific equipment type
-@app.callback(
+# Update Sizing Label and Input Placeholder based on selected specific equipment type, in the
+# browser, from the catalog it downloads once per version from the versioned catalog endpoint
+app.clientside_callback(
+    """
+    async function(method, plantType, equipment, equipmentType, catalogStore) {
+        const fallback = "Enter sizing value";
+        if (!(method && plantType && equipment && equipmentType && catalogStore && catalogStore.url)) {
+            return fallback;
+        }
+        const catalogs = window.budgeCatalogs = window.budgeCatalogs || {};
+        const url = catalogStore.url;
+        if (!catalogs[url]) {
+            catalogs[url] = fetch(url)
+                .then(response => {
+                    if (!response.ok) {
+                        throw new Error(`Catalog ${catalogStore.version}: ${response.status}`);
+                    }
+                    return response.json();
+                })
+                .then(document => {
+                    const columns = document.columns;
+                    const cell = (name, row) => "codes" in columns[name]
+                        ? columns[name].categories[columns[name].codes[row]]
+                        : columns[name].values[row];
+                    const rows = new Map();
+                    for (let row = 0; row < document.rows; row++) {
+                        const key = ["Method", "Plant Type", "Equipment", "Equipment Type"].map(name => cell(name, row));
+                        rows.set(JSON.stringify(key), {
+                            quantity: cell("Sizing Quantity", row),
+                            unit: cell("Units", row),
+                            lower: cell("S lower", row),
+                            upper: cell("S upper", row),
+                        });
+                    }
+                    return rows;
+                });
+        }
+        let rows;
+        try {
+            rows = await catalogs[url];
+        } catch (error) {
+            delete catalogs[url];
+            return window.dash_clientside.no_update;
+        }
+        const row = rows.get(JSON.stringify([method, plantType, equipment, equipmentType]));
+        if (!row) {
+            return fallback;
+        }
+        if (row.lower === null || row.upper === null) {
+            return `Enter ${row.quantity} in ${row.unit}`;
+        }
+        return `Enter ${row.quantity} in ${row.unit} between ${row.lower} and ${row.upper}`;
+    }
+    """,
     Output(f"{ids.sizing_quantity_input}-hel", "value"),
     [
         Input(ids.method_dropdown, "value"),
@@ -272,28 +580,43 @@ def update_equipment_type_options(
     ],
     State(DATA_STORE, "data"),
 )
-def update_sizing_label(
-    method_choice, plant_choice, equipment_choice, type_choice, material_data
-):
-    if method_choice and plant_choice and equipment_choice and type_choice:
-        selected_row = estimation.filter_material_data(
-            material_data, method_choice, plant_choice, equipment_choice, type_choice
-        )
-        selected_row = selected_row.iloc[0]
-
-        sizing_quantity = selected_row[Factors.SIZING_QUANTITY]
-        units = selected_row[Factors.UNITS]
-        s_lower = selected_row[Factors.S_LOWER]
-        s_upper = selected_row[Factors.S_UPPER]
-
-        if np.isnan(s_lower) or np.isnan(s_upper):
-            placeholder = f"Enter {sizing_quantity} in {units}"
-        else:
-            placeholder = (
-                f"Enter {sizing_quantity} in {units} between {s_lower} and {s_upper}"
-            )
-        return placeholder
-    return "Enter sizing value11"
+
+
+# Offer the units the selected equipment type's sizing quantity can be entered in
+@app.callback(
+    Output(ids.sizing_unit_dropdown, "options"),
+    Output(ids.sizing_unit_dropdown, "value"),
+    [
+        Input(ids.method_dropdown, "value"),
+        Input(ids.plant_dropdown, "value"),
+        Input(ids.equipment_dropdown, "value"),
+        Input(ids.equipment_type_dropdown, "value"),
+    ],
+    State(ids.sizing_unit_dropdown, "value"),
+)
+def update_sizing_units(method_choice, plant_choice, equipment_choice, type_choice, current):
+    position = catalog.get_catalog().index.get((method_choice, plant_choice, equipment_choice, type_choice))
+    if position is None:
+        return [], None
+    compatible = units.REGISTRY.compatible(catalog.get_catalog().row(position).units)
+    # keep the chosen unit while it still measures the sizing quantity, else the catalog unit
+    value = current if current in compatible else (compatible[0] if compatible else None)
+    return [{"label": unit, "value": unit} for unit in compatible], value
+
+
+# Callback to add an empty scenario row
+@app.callback(
+    Output(ids.scenario_table, "data"),
+    Input(ids.add_scenario_btn, "n_clicks"),
+    State(ids.scenario_table, "data"),
+    prevent_initial_call=True,
+)
+def add_scenario(n_clicks, rows):
+    if n_clicks is None:
+        raise PreventUpdate
+    rows = rows or []
+    rows.append({"name": f"scenario {len(rows) + 1}"})
+    return rows
 
 
 # Callback to save data
@@ -308,24 +631,70 @@ def update_sizing_label(
         State(ids.equipment_dropdown, "value"),
         State(ids.equipment_type_dropdown, "value"),
         State(ids.sizing_quantity_input, "value"),
+        State(ids.extrapolation_checklist, "value"),
+        State(ids.sizing_unit_dropdown, "value"),
+        State(ids.area_input, "value"),
+        State(ids.scenario_table, "data"),
+        *[State(ids.project_factor_inputs[name], "value") for name, _ in PROJECT_FACTORS],
         State(STORE_ID, "data"),
     ],
     prevent_initial_call=True,
 )
-def save_data(n_clicks, method, plant, equipment, equipment_type, sizing_value, data):
+def save_data(
+    n_clicks,
+    method,
+    plant,
+    equipment,
+    equipment_type,
+    sizing_value,
+    extrapolation,
+    sizing_unit,
+    area,
+    scenario_rows,
+    offsites_factor,
+    design_and_engineering_factor,
+    contingency,
+    location_factor,
+    data,
+):
 
     if n_clicks is None:
         raise PreventUpdate
+    data = storage.resolve(data)
     estimation_input = {
         "method": method,
         "plant_type": plant,
         "equipment": equipment,
         "equipment_type": equipment_type,
         "sizing_value": sizing_value,
+        "allow_extrapolation": "allow" in (extrapolation or []),
+        "sizing_unit": sizing_unit,
+        "area": area,
     }
     data["estimation_input"] = estimation_input
 
-    data = estimation.save_reset(data)
+    scenario_list, scenario_errors = estimation.validate_scenarios(scenario_rows)
+    if scenario_errors:
+        return dash.no_update, MessageCustom(messages=scenario_errors, success=False).layout, None
+    data["scenarios"] = scenario_list
+
+    project_factors, factor_errors = estimation.validate_project_factors(
+        {
+            "offsites_factor": offsites_factor,
+            "design_and_engineering_factor": design_and_engineering_factor,
+            "contingency": contingency,
+            "location_factor": location_factor,
+        }
+    )
+    if factor_errors:
+        return dash.no_update, MessageCustom(messages=factor_errors, success=False).layout, None
+    data["project_factors"] = project_factors
+
+    # the previous output is kept; display_output flags the parts the changes made stale
+    try:
+        data = storage.persist(data)
+    except storage.QuotaExceededError as e:
+        return dash.no_update, MessageCustom(messages=str(e), success=False).layout, None
     return (
         data,
         MessageCustom(messages="Data saved successfully", success=True).layout,
@@ -339,6 +708,7 @@ def save_data(n_clicks, method, plant, equipment, equipment_type, sizing_value,
     Input(STORE_ID, "data"),
 )
 def display_run_btn(data):
+    data = storage.resolve(data)
     if data is None:
         raise PreventUpdate
 
@@ -361,33 +731,33 @@ def display_run_btn(data):
     Output(ids.feedback_save, "children"),
     Input(ids.run_btn, "n_clicks"),
     State(STORE_ID, "data"),
-    State(DATA_STORE, "data"),
     prevent_initial_call=True,
 )
-def run_calculation(n_clicks, data, material_data):
+def run_calculation(n_clicks, data):
     if n_clicks is None:
         raise PreventUpdate
     message = []
+    data = storage.resolve(data)
 
     is_ready, msgs = estimation.all_inputs_ready(data)
 
     if is_ready:
         try:
-            data = estimation.run_calculation(data, material_data)
+            data = estimation.run_calculation(data, catalog.get_catalog())
             # data = estimation.run_reset(data)
             msg = "Calculation successful"
             feedback_html = MessageCustom(messages=msg, success=True).layout
-            return data, feedback_html, None
+            return storage.persist(data), feedback_html, None
         except Exception as e:
             traceback.print_exc()
             message.append("Failure in Calculations")
             message.append(f"Error: {str(e)}")
             feedback_html = MessageCustom(messages=message, success=False).layout
-            return data, feedback_html, None
+            return dash.no_update, feedback_html, None
     else:
         message.extend(msgs)
         feedback_html = MessageCustom(messages=message, success=False).layout
-        return data, feedback_html, None
+        return dash.no_update, feedback_html, None
 
 
 # Callback to display the output
@@ -397,6 +767,7 @@ def run_calculation(n_clicks, data, material_data):
     prevent_initial_call=True,
 )
 def display_output(data):
+    data = storage.resolve(data)
     if not data:
         return None
     estimation_output = data.get("estimation_output", None)
@@ -405,12 +776,33 @@ def display_output(data):
         return None
     estimation_output = data.get("estimation_output", {})
 
+    diagnostic_message = estimation_output.get("diagnostics", {}).get("message")
+    material_catalog = catalog.get_catalog()
+    stale_message = None
+    if estimation_output.get("catalog_version") != material_catalog.version:
+        stale_message = MessageCustom(
+            messages="The material factor catalog has been updated since this result was calculated. Run again to refresh it.",
+            success=False,
+        ).layout
+    else:
+        stale = estimation.stale_nodes(data, material_catalog)
+        if stale:
+            stale_message = MessageCustom(
+                messages=f"Out of date since the last run: {', '.join(stale)}. Run again to refresh.",
+                success=False,
+            ).layout
+    totals = estimation_output.get("totals")
+
     return html.Div(
         [
             html.H1(
                 "Output",
                 className="dash-h1",
             ),
+            stale_message,
+            MessageCustom(messages=diagnostic_message, success=False).layout
+            if diagnostic_message
+            else None,
             DisplayField(
                 id=ids.purchased_equipment_cost_output,
                 label="Purchased Equipment Cost",
@@ -421,5 +813,259 @@ def display_output(data):
                 label="ISBL cost",
                 value=estimation_output["total_cost_output"],
             ).layout,
+            DisplayField(
+                id=ids.total_fixed_capital_cost_output,
+                label="Total Fixed Capital Cost",
+                value=estimation_output.get("total_fixed_capital_cost_output", "n/a"),
+            ).layout,
+            DisplayField(
+                id=ids.priced_by_output,
+                label="Priced By",
+                value=estimation_output.get("priced_by", ""),
+            ).layout,
+            DisplayField(
+                id=ids.project_total_output,
+                label=f"Project Total Fixed Capital Cost ({totals['priced']} of {totals['items']} items priced)",
+                value=estimation.format_cost(totals["total_fixed_capital_cost"]),
+            ).layout
+            if totals
+            else None,
+            html.Div(
+                [
+                    html.Label("Project Summary by Method", className="font-bold"),
+                    dash_table.DataTable(
+                        id=ids.summary_output,
+                        columns=SUMMARY_COLUMNS,
+                        data=[
+                            {
+                                "method": row["method"],
+                                "items": f"{row['priced.purchased_cost']} of {row['count']}",
+                                "installed_cost": estimation.format_cost(row["installed_cost"]),
+                                "total_fixed_capital_cost": estimation.format_cost(row["total_fixed_capital_cost"])
+                                if row["priced.total_fixed_capital_cost"]
+                                else "n/a",
+                            }
+                            for row in estimation_output["summary"]
+                        ],
+                        style_cell={"textAlign": "left", "padding": "4px"},
+                    ),
+                ],
+                className="mt-4",
+            )
+            if estimation_output.get("summary")
+            else None,
+            html.Div(
+                [
+                    html.Label("Total Fixed Capital Cost by Scenario", className="font-bold"),
+                    dash_table.DataTable(
+                        id=ids.scenario_output,
+                        columns=SCENARIO_COLUMNS
+                        + [{"name": "Total Fixed Capital Cost", "id": "total_fixed_capital_cost"}],
+                        data=estimation_output["scenarios"],
+                        style_cell={"textAlign": "left", "padding": "4px"},
+                    ),
+                ],
+                className="mt-4",
+            )
+            if estimation_output.get("scenarios")
+            else None,
+        ]
+    )
+
+
+# Callback to serve the line item rows in view
+@app.callback(
+    Output(ids.line_item_grid, "getRowsResponse"),
+    Input(ids.line_item_grid, "getRowsRequest"),
+    State(STORE_ID, "data"),
+)
+def get_line_item_rows(request, data):
+    data = storage.resolve(data)
+    if not request or data is None:
+        raise PreventUpdate
+    return line_items.get_table(data, catalog.get_catalog()).block(request)
+
+
+# Reload the rows in view whenever the project changes, e.g. after an edit
+app.clientside_callback(
+    """
+    function(data, gridId) {
+        const api = dash_ag_grid.getApi(gridId);
+        if (api) { api.refreshInfiniteCache(); }
+        return null;
+    }
+    """,
+    Output(ids.line_item_refresh, "data"),
+    Input(STORE_ID, "data"),
+    State(ids.line_item_grid, "id"),
+    prevent_initial_call=True,
+)
+
+
+# Callback to reprice a line item when its sizing value is edited
+@app.callback(
+    Output(STORE_ID, "data", allow_duplicate=True),
+    Output(ids.feedback_line_items, "children", allow_duplicate=True),
+    Input(ids.line_item_grid, "cellValueChanged"),
+    State(STORE_ID, "data"),
+    prevent_initial_call=True,
+)
+def edit_line_item(changes, data):
+    data = storage.resolve(data)
+    if not changes or data is None:
+        raise PreventUpdate
+    stored = dash.no_update
+    for change in changes if isinstance(changes, list) else [changes]:
+        try:
+            stored = line_items.set_sizing_value(
+                data, int(change["data"]["item_id"]), change["value"], catalog.get_catalog()
+            )
+        except (ValueError, storage.QuotaExceededError) as e:
+            return stored, MessageCustom(messages=str(e), success=False).layout
+    return stored, None
+
+
+# Callback to add the current selection as a line item
+@app.callback(
+    Output(STORE_ID, "data", allow_duplicate=True),
+    Output(ids.feedback_line_items, "children", allow_duplicate=True),
+    Input(ids.add_btn, "n_clicks"),
+    State(ids.method_dropdown, "value"),
+    State(ids.plant_dropdown, "value"),
+    State(ids.equipment_dropdown, "value"),
+    State(ids.equipment_type_dropdown, "value"),
+    State(ids.sizing_quantity_input, "value"),
+    State(ids.extrapolation_checklist, "value"),
+    State(ids.sizing_unit_dropdown, "value"),
+    State(ids.area_input, "value"),
+    State(STORE_ID, "data"),
+    prevent_initial_call=True,
+)
+def add_line_item(
+    n_clicks, method, plant, equipment, equipment_type, sizing_value, extrapolation, sizing_unit, area, data
+):
+    if n_clicks is None:
+        raise PreventUpdate
+    data = storage.resolve(data)
+    if data is None:
+        raise PreventUpdate
+    item = {
+        "method": method,
+        "plant_type": plant,
+        "equipment": equipment,
+        "equipment_type": equipment_type,
+        "sizing_value": sizing_value,
+        "allow_extrapolation": "allow" in (extrapolation or []),
+        "sizing_unit": sizing_unit,
+        "area": area,
+    }
+    item, errors = estimation.validate_input(item)
+    if errors:
+        messages = [f"{field}: {error}" for field, error in errors.items()]
+        return dash.no_update, MessageCustom(messages=messages, success=False).layout
+    data = line_items.add_line_item(data, item)
+    try:
+        return storage.persist(data), None
+    except storage.QuotaExceededError as e:
+        return dash.no_update, MessageCustom(messages=str(e), success=False).layout
+
+
+# Callback to delete the selected line items
+@app.callback(
+    Output(STORE_ID, "data", allow_duplicate=True),
+    Output(ids.feedback_line_items, "children", allow_duplicate=True),
+    Input(ids.delete_btn, "n_clicks"),
+    State(ids.line_item_grid, "selectedRows"),
+    State(STORE_ID, "data"),
+    prevent_initial_call=True,
+)
+def delete_line_items(n_clicks, selected_rows, data):
+    if n_clicks is None or not selected_rows:
+        raise PreventUpdate
+    data = storage.resolve(data)
+    if data is None:
+        raise PreventUpdate
+    data = line_items.delete_line_items(data, [row["item_id"] for row in selected_rows])
+    return storage.persist(data), None
+
+
+def unit_sizes(suggestion):
+    if not suggestion["units"]:
+        return ""
+    if suggestion["units"] == 1 or np.isclose(suggestion["unit_size"], suggestion["last_unit_size"]):
+        return f"{suggestion['units']} x {suggestion['last_unit_size']:,.4g}"
+    return f"{suggestion['units'] - 1} x {suggestion['unit_size']:,.4g} + 1 x {suggestion['last_unit_size']:,.4g}"
+
+
+# Callback to find the cheapest parallel units for the line items
+@app.callback(
+    Output(ids.split_output, "children"),
+    Input(ids.split_btn, "n_clicks"),
+    State(ids.split_objective, "value"),
+    State(STORE_ID, "data"),
+    prevent_initial_call=True,
+)
+def find_parallel_units(n_clicks, objective, data):
+    data = storage.resolve(data)
+    if n_clicks is None or data is None:
+        raise PreventUpdate
+    suggestions = estimation.suggest_parallel_units(data, catalog.get_catalog(), objective)
+    if not suggestions:
+        return MessageCustom(messages="No line item needs parallel units.", success=True).layout
+    rows = [
+        {
+            "Line Item": f"{suggestion['item_id'] + 1}: {suggestion['equipment_type']}",
+            "Sizing Value": f"{suggestion['sizing_value']:,.4g}",
+            "S upper": f"{suggestion['s_upper']:,.4g}",
+            "Units": suggestion["units"] or f"more than {MAX_PARALLEL_UNITS}",
+            "Unit Sizes": unit_sizes(suggestion),
+            "Cost": estimation.format_cost(suggestion["cost"]),
+            "Single Unit Cost": estimation.format_cost(suggestion["single_unit_cost"]),
+        }
+        for suggestion in suggestions
+    ]
+    return html.Div(
+        [
+            dash_table.DataTable(
+                id=f"{ids.split_output}_table",
+                columns=[{"name": column, "id": column} for column in rows[0]],
+                data=rows,
+                page_size=20,
+                style_cell={"textAlign": "left", "padding": "4px"},
+                style_header={"fontWeight": "bold"},
+            ),
+            html.P(
+                "Single unit cost is the extrapolated cost of one unit of the full size.",
+                className="text-sm text-gray-500 pt-1",
+            ),
+            html.Div(
+                ButtonCustom(id=ids.split_apply_btn, label="Split Line Items", color="bg-blue-500").layout,
+                className="w-96 pt-2",
+            ),
         ]
     )
+
+
+# Callback to replace the line items by their parallel units
+@app.callback(
+    Output(STORE_ID, "data", allow_duplicate=True),
+    Output(ids.feedback_split, "children"),
+    Input(ids.split_apply_btn, "n_clicks"),
+    State(ids.split_objective, "value"),
+    State(STORE_ID, "data"),
+    prevent_initial_call=True,
+)
+def apply_parallel_units(n_clicks, objective, data):
+    data = storage.resolve(data)
+    if n_clicks is None or data is None:
+        raise PreventUpdate
+    suggestions = estimation.suggest_parallel_units(data, catalog.get_catalog(), objective)
+    split = [suggestion for suggestion in suggestions if suggestion["units"] > 1]
+    if not split:
+        return dash.no_update, MessageCustom(messages="No line item to split.", success=False).layout
+    data = estimation.apply_parallel_units(data, split)
+    try:
+        stored = storage.persist(data)
+    except storage.QuotaExceededError as e:
+        return dash.no_update, MessageCustom(messages=str(e), success=False).layout
+    return stored, MessageCustom(messages=f"Split {len(split)} line items into parallel units.", success=True).layout
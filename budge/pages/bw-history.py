@@ -0,0 +1,225 @@
+import os
+import time
+from typing import Final
+
+import dash
+import numpy as np
+from agility.components import ButtonCustom, MessageCustom
+from dash import Dash, Input, Output, State, dash_table, dcc, html
+from dash.exceptions import PreventUpdate
+
+from budge.config.main import STORE_ID
+from budge.core import catalog
+from budge.project import estimation, history, storage
+
+dash.register_page(__name__)
+app: Dash = dash.get_app()
+
+PAGE_TITLE = "History"
+
+
+class PageIDs:
+    def __init__(self) -> None:
+        filename = os.path.basename(__file__)
+        prefix: Final[str] = filename.replace(".py", "")
+        self.prefix: Final[str] = prefix
+        self.status: Final[str] = f"{prefix}_status"
+        self.revisions: Final[str] = f"{prefix}_revisions"
+        self.undo_container: Final[str] = f"{prefix}_undo_container"
+        self.undo_btn: Final[str] = f"{prefix}_undo_btn"
+        self.feedback_undo: Final[str] = f"{prefix}_feedback_undo"
+        self.old_dropdown: Final[str] = f"{prefix}_old_dropdown"
+        self.new_dropdown: Final[str] = f"{prefix}_new_dropdown"
+        self.compare: Final[str] = f"{prefix}_compare"
+
+
+ids = PageIDs()
+
+COST_LABELS = {
+    "purchased_cost": "Purchased Equipment Cost",
+    "installed_cost": "Installed Cost",
+    "total_fixed_capital_cost": "Total Fixed Capital Cost",
+}
+
+layout = html.Div(
+    [
+        html.H1("budge", className="app-title"),
+        html.H2(PAGE_TITLE, className="page-title"),
+        html.Hr(),
+        html.Div(id=ids.status),
+        html.Div(id=ids.undo_container, className="px-6 pb-2 w-96"),
+        html.Div(id=ids.feedback_undo, className="px-6 pb-2 w-96"),
+        html.Div(id=ids.revisions, className="px-6 pb-2"),
+        html.Div(
+            [
+                html.H3("Compare Revisions", className="font-bold pt-4 pb-2"),
+                html.Label("From revision"),
+                dcc.Dropdown(id=ids.old_dropdown, options=[], clearable=False),
+                html.Label("To revision", className="pt-2"),
+                dcc.Dropdown(id=ids.new_dropdown, options=[], clearable=False),
+            ],
+            className="px-6 pb-2 w-96",
+        ),
+        html.Div(id=ids.compare, className="px-6 pb-4"),
+    ],
+    className="w-full",
+)
+
+
+def signed_cost(value):
+    if value is None or not np.isfinite(value):
+        return "n/a"
+    return f"{'+' if value > 0 else '-' if value < 0 else ''}${abs(value):,.2f}"
+
+
+# callback to show why the history is not available
+@app.callback(
+    Output(ids.status, "children"),
+    [Input(STORE_ID, "data")],
+)
+def load_status(data):
+    data = storage.resolve(data)
+    if data is None:
+        return MessageCustom(
+            messages="Project not loaded. Go to start page and create new or open existing project.",
+            success=False,
+        ).layout
+    if not history.is_available(data):
+        return MessageCustom(
+            messages="Version history is recorded for projects stored on the server. Set BUDGE_PROJECT_DB to enable it.",
+            success=False,
+        ).layout
+    return None
+
+
+# callback to list the revisions and fill the revision dropdowns
+@app.callback(
+    Output(ids.revisions, "children"),
+    Output(ids.undo_container, "children"),
+    Output(ids.old_dropdown, "options"),
+    Output(ids.old_dropdown, "value"),
+    Output(ids.new_dropdown, "options"),
+    Output(ids.new_dropdown, "value"),
+    [Input(STORE_ID, "data")],
+)
+def display_revisions(data):
+    data = storage.resolve(data)
+    revisions = history.revisions(data)
+    if not revisions:
+        return None, None, [], None, [], None
+
+    rows = [
+        {
+            "Revision": revision["revision"],
+            "Saved": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(revision["created"])),
+            "Changes": revision["summary"],
+        }
+        for revision in revisions
+    ]
+    options = [
+        {"label": f"{row['Revision']} ({row['Saved']})", "value": row["Revision"]} for row in rows
+    ]
+    table = html.Div(
+        [
+            html.H3("Revisions", className="font-bold pt-4 pb-2"),
+            dash_table.DataTable(
+                id=f"{ids.revisions}_table",
+                columns=[{"name": column, "id": column} for column in rows[0]],
+                data=rows,
+                page_size=20,
+                style_cell={"textAlign": "left", "padding": "4px"},
+                style_header={"fontWeight": "bold"},
+            ),
+        ]
+    )
+    undo_btn = ButtonCustom(id=ids.undo_btn, label="Undo Last Save", color="bg-gray-500").layout
+    old_value = rows[1]["Revision"] if len(rows) > 1 else rows[0]["Revision"]
+    return table, undo_btn if len(rows) > 1 else None, options, old_value, options, rows[0]["Revision"]
+
+
+# callback to restore the revision before the current one
+@app.callback(
+    Output(STORE_ID, "data", allow_duplicate=True),
+    Output(ids.feedback_undo, "children"),
+    Input(ids.undo_btn, "n_clicks"),
+    State(STORE_ID, "data"),
+    prevent_initial_call=True,
+)
+def undo(n_clicks, data):
+    if n_clicks is None:
+        raise PreventUpdate
+    reference = history.undo(storage.resolve(data))
+    if reference is None:
+        return dash.no_update, MessageCustom(messages="Nothing to undo.", success=False).layout
+    return reference, MessageCustom(
+        messages=f"Restored the previous revision as revision {reference[storage.REVISION]}.",
+        success=True,
+    ).layout
+
+
+# callback to show the changes and their cost impact between two revisions
+@app.callback(
+    Output(ids.compare, "children"),
+    Input(ids.old_dropdown, "value"),
+    Input(ids.new_dropdown, "value"),
+    State(STORE_ID, "data"),
+)
+def compare_revisions(old_revision, new_revision, data):
+    if old_revision is None or new_revision is None:
+        return None
+    result = history.compare(storage.resolve(data), old_revision, new_revision, catalog.get_catalog())
+    if result is None:
+        return MessageCustom(messages="That revision is no longer stored.", success=False).layout
+
+    document = result["diff"]["document"]
+    changed_keys = [
+        html.Li(f"{key}: {'recalculated' if change is None else 'changed'}") for key, change in document.items()
+    ]
+    item_changes = result["diff"]["line_items"]
+    counts = ", ".join(f"{len(item_changes[change])} {change}" for change in ("added", "removed", "changed"))
+
+    totals = result["cost_delta"]["totals"]
+    total_rows = [
+        {
+            "Cost": COST_LABELS[key],
+            f"Revision {old_revision}": estimation.format_cost(values["old"]),
+            f"Revision {new_revision}": estimation.format_cost(values["new"]),
+            "Change": signed_cost(values["delta"]),
+        }
+        for key, values in totals.items()
+    ]
+    item_rows = [
+        {
+            "Change": row["change"],
+            "Line Item": row["item"],
+            f"Revision {old_revision}": estimation.format_cost(row["old"]),
+            f"Revision {new_revision}": estimation.format_cost(row["new"]),
+            "Cost Change": signed_cost(row["delta"]),
+        }
+        for row in result["cost_delta"]["items"]
+    ]
+    return html.Div(
+        [
+            html.H3("Changes", className="font-bold pt-4 pb-2"),
+            html.Ul(changed_keys) if changed_keys else html.P("No project settings changed."),
+            html.P(f"Line items: {counts}."),
+            html.H3("Cost Impact", className="font-bold pt-4 pb-2"),
+            dash_table.DataTable(
+                id=f"{ids.compare}_totals",
+                columns=[{"name": column, "id": column} for column in total_rows[0]],
+                data=total_rows,
+                style_cell={"textAlign": "left", "padding": "4px"},
+                style_header={"fontWeight": "bold"},
+            ),
+            dash_table.DataTable(
+                id=f"{ids.compare}_items",
+                columns=[{"name": column, "id": column} for column in item_rows[0]],
+                data=item_rows,
+                page_size=20,
+                style_cell={"textAlign": "left", "padding": "4px"},
+                style_header={"fontWeight": "bold"},
+            )
+            if item_rows
+            else None,
+        ]
+    )
@@ -4,13 +4,9 @@ import dash
 import pandas as pd
 from dash import Dash, Input, Output, State, dcc, html, dash_table
 from dash.exceptions import PreventUpdate
-from dash_ag_grid import AgGrid
 from plotly import graph_objects as go
 import plotly.express as px
-from collections import namedtuple
 from typing import Final
-import traceback
-import math
 from flask import Flask, send_from_directory  # Import Flask
 
 from agility.components import (
@@ -24,7 +20,9 @@ from agility.components import (
 )
 
 from budge.config.main import STORE_ID
+from budge.core import catalog
 from budge.project import Project as PRJ
+from budge.project import charts, estimation, export, graph, storage
 # from budge.project.report import generate_report
 
 from typing import Final
@@ -51,6 +49,15 @@ class PageIDs:
         self.run_container: Final[str] = f"{prefix}_run_container"
         self.feedback_run: Final[str] = f"{prefix}_feedback_run"
         self.report_download: Final[str] = f"{prefix}_report_download"
+        self.stale: Final[str] = f"{prefix}_stale"
+        self.scenarios: Final[str] = f"{prefix}_scenarios"
+        self.charts: Final[str] = f"{prefix}_charts"
+        self.rollup_dimension: Final[str] = f"{prefix}_rollup_dimension"
+        self.rollup: Final[str] = f"{prefix}_rollup"
+        self.export_container: Final[str] = f"{prefix}_export_container"
+        self.export_xlsx_btn: Final[str] = f"{prefix}_export_xlsx_btn"
+        self.export_parquet_btn: Final[str] = f"{prefix}_export_parquet_btn"
+        self.export_download: Final[str] = f"{prefix}_export_download"
 
 
 ids = PageIDs()
@@ -70,11 +77,46 @@ layout = html.Div(
         html.Hr(),
         html.Div(id=ids.status),
         html.Div(id=ids.input, className="px-6 pb-2 w-96"),
+        html.Div(id=ids.stale, className="px-6 pb-2 w-96"),
+        html.Div(id=ids.scenarios, className="px-6 pb-2"),
+        html.Div(id=ids.charts, className="px-6 pb-2"),
+        html.Div(
+            [
+                html.H3("Cost by Group", className="font-bold pt-4 pb-2"),
+                dcc.Dropdown(
+                    id=ids.rollup_dimension,
+                    options=[{"label": label, "value": value} for value, label in graph.ROLLUP_DIMENSIONS.items()],
+                    value="plant_type",
+                    clearable=False,
+                    className="w-64 pb-2",
+                ),
+                html.Div(id=ids.rollup),
+            ],
+            className="px-6 pb-2",
+        ),
         html.Div(id=ids.save_container, className="px-6 pb-2 w-96"),
         html.Div(id=ids.feedback_save, className="px-6 pb-2 w-96"),
         html.Div(id=ids.run_container, className="px-6 pb-2 w-96"),
         html.Div(id=ids.feedback_run, className="px-6 pb-4 w-96"),
         html.Div(id=ids.report_download, className="px-6 pb-2"),
+        html.Div(
+            [
+                html.H3("Export Line Items", className="font-bold pt-4 pb-2"),
+                html.Button(
+                    "Export Excel",
+                    id=ids.export_xlsx_btn,
+                    className="bg-green-600 text-white p-1 w-40 mr-2",
+                ),
+                html.Button(
+                    "Export Parquet",
+                    id=ids.export_parquet_btn,
+                    className="bg-gray-600 text-white p-1 w-40",
+                ),
+                html.Div(id=ids.export_download, className="pt-2"),
+            ],
+            id=ids.export_container,
+            className="px-6 pb-2",
+        ),
     ],
     className="w-full",
 )
@@ -86,7 +128,7 @@ layout = html.Div(
     [Input(STORE_ID, "data")],
 )
 def load_status(data):
-    if data is None:
+    if storage.resolve(data) is None:
         return MessageCustom(
             messages="Project not loaded. Go to start page and create new or open existing project.",
             success=False,
@@ -100,6 +142,7 @@ def load_status(data):
     [Input(STORE_ID, "data")],
 )
 def display_input(data):
+    data = storage.resolve(data)
     if data is None:
         raise PreventUpdate
 
@@ -149,12 +192,142 @@ def display_input(data):
     return progress_layout
 
 
+# callback to flag a generated report whose inputs have changed since
+@app.callback(
+    Output(ids.stale, "children"),
+    [Input(STORE_ID, "data")],
+)
+def display_stale(data):
+    data = storage.resolve(data)
+    if not data:
+        return None
+    node_key = (data.get("report") or {}).get("node_key")
+    if node_key is None or node_key == estimation.report_node_key(data, catalog.get_catalog()):
+        return None
+    return MessageCustom(
+        messages="The project has changed since the report was generated. Generate it again to refresh it.",
+        success=False,
+    ).layout
+
+
+# callback to compare the scenarios of the last estimation side by side
+@app.callback(
+    Output(ids.scenarios, "children"),
+    [Input(STORE_ID, "data")],
+)
+def display_scenarios(data):
+    data = storage.resolve(data)
+    if not data:
+        return None
+    scenarios = data.get("estimation_output", {}).get("scenarios")
+    if not scenarios:
+        return None
+
+    def factor(value):
+        return "n/a" if value is None else value
+
+    df = pd.DataFrame(
+        {
+            "Scenario": [s["name"] for s in scenarios],
+            "Offsites": [factor(s["offsites_factor"]) for s in scenarios],
+            "Design & Eng.": [factor(s["design_and_engineering_factor"]) for s in scenarios],
+            "Contingency": [factor(s["contingency"]) for s in scenarios],
+            "Location": [factor(s["location_factor"]) for s in scenarios],
+            "Total Fixed Capital Cost": [s["total_fixed_capital_cost"] for s in scenarios],
+        }
+    )
+    return html.Div(
+        [
+            html.H3("Scenario Comparison", className="font-bold pt-4 pb-2"),
+            dash_table.DataTable(
+                id=f"{ids.scenarios}_table",
+                columns=[{"name": i, "id": i} for i in df.columns],
+                data=df.to_dict("records"),
+                style_cell={"textAlign": "left", "padding": "10px"},
+                style_header={
+                    "backgroundColor": "light-grey",
+                    "fontWeight": "bold",
+                    "textAlign": "center",
+                },
+            ),
+        ]
+    )
+
+
+# callback to total the line items by plant type, equipment, area or method
+@app.callback(
+    Output(ids.rollup, "children"),
+    [Input(STORE_ID, "data"), Input(ids.rollup_dimension, "value")],
+)
+def display_rollup(data, dimension):
+    data = storage.resolve(data)
+    if not data or not estimation.project_line_items(data):
+        return None
+    rows = estimation.project_rollup(data, catalog.get_catalog(), dimension)
+    label = graph.ROLLUP_DIMENSIONS[dimension]
+    table = [
+        {
+            label: row[dimension],
+            "Items": row["count"],
+            "Priced": row["priced.total_fixed_capital_cost"],
+            "Purchased Cost": estimation.format_cost(row["purchased_cost"]),
+            "Installed Cost": estimation.format_cost(row["installed_cost"]),
+            "Total Fixed Capital Cost": estimation.format_cost(row["total_fixed_capital_cost"]),
+        }
+        for row in rows
+    ]
+    table.append(
+        {
+            label: "Total",
+            "Items": sum(row["count"] for row in rows),
+            "Priced": sum(row["priced.total_fixed_capital_cost"] for row in rows),
+            "Purchased Cost": estimation.format_cost(sum(row["purchased_cost"] for row in rows)),
+            "Installed Cost": estimation.format_cost(sum(row["installed_cost"] for row in rows)),
+            "Total Fixed Capital Cost": estimation.format_cost(sum(row["total_fixed_capital_cost"] for row in rows)),
+        }
+    )
+    return dash_table.DataTable(
+        id=f"{ids.rollup}_table",
+        columns=[{"name": i, "id": i} for i in table[0]],
+        data=table,
+        style_cell={"textAlign": "left", "padding": "10px"},
+        style_header={
+            "backgroundColor": "light-grey",
+            "fontWeight": "bold",
+            "textAlign": "center",
+        },
+        style_data_conditional=[{"if": {"row_index": len(table) - 1}, "fontWeight": "bold"}],
+    )
+
+
+# callback to draw the cost breakdown charts
+@app.callback(
+    Output(ids.charts, "children"),
+    [Input(STORE_ID, "data")],
+)
+def display_charts(data):
+    data = storage.resolve(data)
+    if not data:
+        return None
+    figures = charts.get_figures(data, catalog.get_catalog())
+    if figures is None:
+        return None
+    waterfall, pareto = figures
+    return html.Div(
+        [
+            dcc.Graph(id=f"{ids.charts}_waterfall", figure=waterfall),
+            dcc.Graph(id=f"{ids.charts}_pareto", figure=pareto),
+        ]
+    )
+
+
 # callback to show generate report button if all steps are completed
 @app.callback(
     Output(ids.run_container, "children"),
     [Input(STORE_ID, "data")],
 )
 def show_run_button(data):
+    data = storage.resolve(data)
     if not data:
         return None
     progress_dict = PRJ.get_progress(data)
@@ -179,6 +352,7 @@ def report_run(n_clicks, data):
     if n_clicks is None:
         raise PreventUpdate
 
+    data = storage.resolve(data)
     memory_output = generate_report(data)
     with tempfile.NamedTemporaryFile(delete=False, suffix=".zip") as tmp:
         tmp.write(memory_output.getvalue())
@@ -186,21 +360,50 @@ def report_run(n_clicks, data):
 
     report_link = html.A(
         "Click to Download Report",
-        href=f"/budge/download/{os.path.basename(tmp_path)}",
+        href=app.get_relative_path(f"/download/{os.path.basename(tmp_path)}"),
         target="_blank",
         style={"color": "blue", "textDecoration": "underline"},
     )
-    report = {"report": "generated"}
+    report = {
+        "report": "generated",
+        "node_key": estimation.report_node_key(data, catalog.get_catalog()),
+    }
     data["report"] = report
     msg = MessageCustom(
         messages="Report generated successfully.",
         success=True,
     )
-    return report_link, msg.layout, data
+    return report_link, msg.layout, storage.persist(data)
+
+
+# callback to export the priced line items as a typed columnar file
+@app.callback(
+    Output(ids.export_download, "children"),
+    Input(ids.export_xlsx_btn, "n_clicks"),
+    Input(ids.export_parquet_btn, "n_clicks"),
+    State(STORE_ID, "data"),
+    prevent_initial_call=True,
+)
+def export_line_items(xlsx_clicks, parquet_clicks, data):
+    data = storage.resolve(data)
+    if data is None:
+        raise PreventUpdate
+    fmt = export.XLSX if dash.ctx.triggered_id == ids.export_xlsx_btn else export.PARQUET
+    try:
+        path = export.export_project(data, catalog.get_catalog(), fmt, tempfile.gettempdir())
+    except ImportError as e:
+        return MessageCustom(messages=str(e), success=False).layout
+
+    return html.A(
+        f"Click to Download {os.path.basename(path)}",
+        href=app.get_relative_path(f"/download/{os.path.basename(path)}"),
+        target="_blank",
+        style={"color": "blue", "textDecoration": "underline"},
+    )
 
 
 # Serve the file from the temporary directory
-@app.server.route("/budge/download/<filename>")
+@app.server.route(f"{app.config.routes_pathname_prefix}download/<filename>")
 def serve_file(filename):
     directory = tempfile.gettempdir()
     return send_from_directory(directory, filename, as_attachment=True)
@@ -10,7 +10,7 @@ from dash.exceptions import PreventUpdate
 from agility.components import ButtonCustom, InputCustom, MessageCustom, FileHandler
 
 from budge.config.main import STORE_ID, PROJECT_NAME, PROJECT_SLUG
-from budge.project import Project, start
+from budge.project import Project, start, storage
 
 
 # from my_dash_app.components.file_handler import FileHandler
@@ -88,6 +88,7 @@ layout = (
     [Input(STORE_ID, "data"), Input("url", "pathname")],
 )
 def meta_input_display(data, pathname):
+    data = storage.resolve(data)
     if not data:
         return None
     data = data or {}  # Ensure data is always a dictionary
@@ -165,6 +166,7 @@ def update_project_meta_input(
         raise PreventUpdate  # Do nothing if the button hasn't been clicked
 
     # Check if the store already contains data to prevent overwriting other data unintentionally.
+    data = storage.resolve(data)
     if data is None or "meta_input" not in data:
         raise PreventUpdate
     meta_input = {}
@@ -176,5 +178,5 @@ def update_project_meta_input(
     meta_input, errors = start.validate_meta_input(meta_input)
     if not errors:
         data["meta_input"] = meta_input
-        return data
+        return storage.persist(data)
     return dash.no_update
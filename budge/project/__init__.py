@@ -2,6 +2,8 @@ from typing import Dict, Tuple
 
 from agility.project import DashProject
 
+from budge.project import storage
+
 
 class Project(DashProject):
     """
@@ -46,6 +48,8 @@ class Project(DashProject):
         progress = {}
         progress["Start"] = 0
 
+        data = storage.resolve(data)
+
         if data is None:
             return progress
 
@@ -0,0 +1,159 @@
+"""Cost breakdown figures for the report page.
+
+Figures are built from the batch pricing arrays and cached by a hash of the
+project's inputs and the catalog version, so re-rendering the report page for
+an unchanged project costs a dictionary lookup. However long the line item
+list, the figures have a fixed number of bars: the waterfall sums over all
+items, and the Pareto chart shows the largest items and lumps the rest into
+one bar.
+"""
+
+import hashlib
+import json
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+from plotly import graph_objects as go
+
+from budge.core import catalog, pricing
+from budge.core.cache import SharedCache
+from budge.monitoring.metrics import timed
+from budge.project import estimation
+
+FIGURE_CACHE_SIZE = 32
+PARETO_TOP_ITEMS = 25
+
+# project keys the figures depend on
+FIGURE_INPUTS = ("estimation_input", "line_items", "scenarios", "project_factors")
+
+
+def project_hash(data: dict, catalog_version: str) -> str:
+    """Hash of everything the figures are computed from."""
+    digest = hashlib.sha256(catalog_version.encode())
+    inputs = {key: data.get(key) for key in FIGURE_INPUTS}
+    digest.update(json.dumps(inputs, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def waterfall_figure(steps: Dict[str, float], item_count: int) -> go.Figure:
+    """Waterfall from purchased equipment cost through each factor to total fixed capital cost."""
+    labels = [label for _, label in pricing.BREAKDOWN_STEPS] + ["Total Fixed Capital Cost"]
+    values = [steps[key] for key, _ in pricing.BREAKDOWN_STEPS]
+    fig = go.Figure(
+        go.Waterfall(
+            x=labels,
+            y=values + [0],
+            measure=["absolute"] + ["relative"] * (len(values) - 1) + ["total"],
+            text=[f"${v:,.0f}" for v in values] + [f"${sum(values):,.0f}"],
+            textposition="outside",
+            connector={"line": {"color": "#9CA3AF"}},
+        )
+    )
+    fig.update_layout(
+        title=f"Cost Breakdown ({item_count} material factor item{'s' if item_count != 1 else ''})",
+        yaxis_title="Cost ($)",
+        showlegend=False,
+        margin={"t": 60, "b": 120},
+    )
+    return fig
+
+
+def pareto_figure(costs: np.ndarray, label: Callable[[int], str], top: int = PARETO_TOP_ITEMS) -> go.Figure:
+    """
+    Pareto chart of the most expensive items with the cumulative share of the total.
+
+    Only the ``top`` largest items get a bar; the rest are summed into one
+    "Other" bar, so the figure size does not grow with the item count.
+
+    Args:
+        costs: Cost of each item.
+        label: Returns the bar label of the item at an index; only called for the largest items.
+        top (int): Number of items that get their own bar.
+    """
+    costs = np.where(np.isfinite(costs), costs, 0.0)
+    total = costs.sum()
+    if len(costs) > top:
+        # O(n) selection of the largest items, then sort only those
+        largest = np.argpartition(costs, -top)[-top:]
+    else:
+        largest = np.arange(len(costs))
+    largest = largest[np.argsort(costs[largest])[::-1]]
+
+    bar_labels = [label(i) for i in largest.tolist()]
+    bar_values = costs[largest].tolist()
+    rest = len(costs) - len(largest)
+    if rest:
+        bar_labels.append(f"Other ({rest} items)")
+        bar_values.append(float(total - costs[largest].sum()))
+    cumulative = np.cumsum(bar_values) / total * 100 if total else np.zeros(len(bar_values))
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=bar_labels, y=bar_values, name="Cost", marker_color="#3B82F6"))
+    fig.add_trace(
+        go.Scatter(
+            x=bar_labels,
+            y=cumulative,
+            name="Cumulative %",
+            yaxis="y2",
+            mode="lines+markers",
+            marker_color="#F59E0B",
+        )
+    )
+    fig.update_layout(
+        title="Top Line Items by Cost",
+        yaxis={"title": "Cost ($)"},
+        yaxis2={"title": "Cumulative %", "overlaying": "y", "side": "right", "range": [0, 105]},
+        legend={"orientation": "h", "y": 1.1},
+        margin={"t": 60, "b": 160},
+    )
+    return fig
+
+
+@timed
+def build_figures(data: dict, material_catalog) -> Optional[Tuple[dict, dict]]:
+    """
+    Prices the project's line items and builds the waterfall and Pareto figures.
+
+    Returns:
+        tuple: The two figures as dicts, or None if the project has no priced items.
+    """
+    line_items = estimation.project_line_items(data)
+    if not line_items:
+        return None
+    allow_extrapolation = bool((data.get("estimation_input") or {}).get("allow_extrapolation"))
+    project_factors = estimation.get_project_factors(data)
+    costs = estimation.price_line_items(
+        line_items, material_catalog, allow_extrapolation, project_factors=project_factors
+    )
+    positions = costs["positions"]
+    priced = np.isfinite(costs["purchased_cost"])
+    if not priced.any():
+        return None
+
+    material_factors = priced & ~material_catalog.arrays.is_hand[positions]
+    breakdown = pricing.cost_breakdown(
+        material_catalog, positions[material_factors], costs["purchased_cost"][material_factors], project_factors
+    )
+    steps = {key: float(np.nansum(values)) for key, values in breakdown.items()}
+
+    # Hand items have no total fixed capital cost; rank them by installed cost
+    item_costs = np.where(
+        np.isfinite(costs["total_fixed_capital_cost"]), costs["total_fixed_capital_cost"], costs["installed_cost"]
+    )
+    def label(i):
+        return f"{i + 1}. {line_items[i].get('equipment')} - {line_items[i].get('equipment_type')}"
+
+    return (
+        waterfall_figure(steps, int(material_factors.sum())).to_dict(),
+        pareto_figure(item_costs, label).to_dict(),
+    )
+
+
+_cache = SharedCache(FIGURE_CACHE_SIZE)
+catalog.add_reload_listener(lambda old, new: _cache.clear())
+
+
+def get_figures(data: dict, material_catalog) -> Optional[Tuple[dict, dict]]:
+    """``build_figures``, cached by project hash. Least recently used figures are dropped first."""
+    key = project_hash(data, material_catalog.version)
+    return _cache.get_or_compute(key, lambda: build_figures(data, material_catalog))
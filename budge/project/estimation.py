@@ -1,108 +1,93 @@
-import pandas as pd
 import numpy as np
 from agility.utils.pydantic import validate_data
 
 from budge.schemas.estimation import EstimationInput
-from budge.core.definitions import Factors
-from budge.config.main import STORE_ID, DATA_STORE
+from budge.schemas.scenario import ProjectFactors, Scenario
+from budge.core import pricing, rollup, scenarios, splitting, units
+from budge.core.validation import RangeStatus, check_ranges, diagnostics
+from budge.monitoring.metrics import timed
+from budge.project import graph
+from budge.project.storage import LINE_ITEMS
+from budge.config.main import MAX_PARALLEL_UNITS
 
-import traceback
 
+@timed
+def validate_input(page_input):
+    """
+    Check if the page_input data is valid.
+    """
+    page_input, errors = validate_data(page_input, EstimationInput)
+    return page_input, errors
 
-def filter_material_data(
-    data, method=None, plant_type=None, equipment=None, equipment_type=None
-):
+
+@timed
+def validate_scenarios(rows):
     """
-    Helper function to filter material data based on specified criteria.
-    Filters are only applied if their corresponding parameter is not None or empty.
+    Validates the scenario table rows.
 
     Parameters:
-    - data: pd.DataFrame or dict
-        The input data containing material information. It can be a DataFrame or a dictionary that can be converted to a DataFrame.
-    - method: str, optional
-        The method to filter by. If None or empty, this filter is ignored.
-    - plant_type: str, optional
-        The plant type to filter by. If None or empty, this filter is ignored.
-    - equipment: str, optional
-        The equipment to filter by. If None or empty, this filter is ignored.
-    - equipment_type: str, optional
-        The equipment type to filter by. If None or empty, this filter is ignored.
+    - rows: list of dict
+        One dict per scenario with a name and optional factor overrides.
 
     Returns:
-    - pd.DataFrame
-        Filtered dataframe based on the input criteria.
-
-    Raises:
-    - KeyError: If the filtered dataframe is empty.
-    - ValueError: If data is not in a valid format or required columns are missing.
-    """
-    # Ensure data is a DataFrame
-    if isinstance(data, dict):
-        data = pd.DataFrame(data)
-    elif not isinstance(data, pd.DataFrame):
-        raise ValueError(
-            "Input data must be a DataFrame or a dictionary convertible to a DataFrame."
-        )
+    - tuple
+        The validated scenarios and a list of error messages.
+    """
+    valid, msgs, names = [], [], set()
+    for row in rows or []:
+        row, errors = validate_data(row, Scenario)
+        name = str(row.get("name") or "").strip()
+        if errors:
+            msgs.extend([f"Scenario {name or '?'}: {field}: {error}" for field, error in errors.items()])
+            continue
+        if name in names:
+            msgs.append(f"Scenario {name}: name is used twice.")
+            continue
+        names.add(name)
+        valid.append(Scenario(**row).model_dump())
+    return valid, msgs
+
+
+@timed
+def validate_project_factors(values):
+    """
+    Validates the project-level factor overrides.
 
-    # Check if required columns are present
-    required_columns = {
-        Factors.METHOD,
-        Factors.PLANT_TYPE,
-        Factors.EQUIPMENT,
-        Factors.EQUIPMENT_TYPE,
-    }
-    missing_columns = required_columns - set(data.columns)
-    if missing_columns:
-        raise ValueError(
-            f"The following required columns are missing in the data: {', '.join(missing_columns)}"
-        )
+    Parameters:
+    - values: dict
+        Factor name to value; empty values keep the catalog factor.
 
-    # Start with the full dataframe and apply filters only if criteria are provided
-    filtered_data = data
-    if method:
-        filtered_data = filtered_data[filtered_data[Factors.METHOD] == method]
-        if filtered_data.empty:
-            raise KeyError(
-                "Empty Dataframe! Check the input criteria as no matching data was found."
-            )
-    if plant_type:
-        filtered_data = filtered_data[filtered_data[Factors.PLANT_TYPE] == plant_type]
-        if filtered_data.empty:
-            raise KeyError(
-                "Empty Dataframe! Check the input criteria as no matching data was found."
-            )
-    if equipment:
-        filtered_data = filtered_data[filtered_data[Factors.EQUIPMENT] == equipment]
-        if filtered_data.empty:
-            raise KeyError(
-                "Empty Dataframe! Check the input criteria as no matching data was found."
-            )
-    if equipment_type:
-        filtered_data = filtered_data[
-            filtered_data[Factors.EQUIPMENT_TYPE] == equipment_type
-        ]
-        if filtered_data.empty:
-            raise KeyError(
-                "Empty Dataframe! Check the input criteria as no matching data was found."
-            )
-
-    # Check if filtered data is empty
-    if filtered_data.empty:
-        raise KeyError(
-            "Empty Dataframe! Check the input criteria as no matching data was found."
-        )
+    Returns:
+    - tuple
+        The validated factors, with None for the ones left to the catalog, and a list of error messages.
+    """
+    values, errors = validate_data(values, ProjectFactors)
+    if errors:
+        return values, [f"{field}: {error}" for field, error in errors.items()]
+    return ProjectFactors(**values).model_dump(), []
 
-    return filtered_data
 
+def get_project_factors(data):
+    """The project-level factor overrides; empty if the project uses the catalog factors."""
+    return data.get("project_factors") or {}
+
+
+def project_line_items(data):
+    """The line items of a project: its line item list, or the single estimation input if it has none."""
+    line_items = data.get(LINE_ITEMS)
+    if line_items:
+        return line_items
+    if data.get("estimation_input"):
+        return [data["estimation_input"]]
+    return []
 
-def validate_input(page_input):
-    """
-    Check if the page_input data is valid.
-    """
-    page_input, errors = validate_data(page_input, EstimationInput)
-    return page_input, errors
 
+def get_scenarios(data):
+    """The project's scenarios, or just the base scenario (catalog factors) if it defines none."""
+    return data.get("scenarios") or [{"name": scenarios.BASE_SCENARIO}]
 
+
+@timed
 def all_inputs_ready(data):
     msgs = []
     ready = True
@@ -122,75 +107,300 @@ def all_inputs_ready(data):
     return ready, msgs
 
 
-def run_calculation(data, material_data):
-    estimation_output = {"result": "This is the output of the calculation"}
-    # estimation_input = data["estimation_input"]
-    estimation_input = EstimationInput(**data["estimation_input"])
+def item_key(item):
+    """The catalog key of a line item."""
+    return (item.get("method"), item.get("plant_type"), item.get("equipment"), item.get("equipment_type"))
+
+
+@timed
+def resolve_line_items(line_items, material_catalog):
+    """
+    Looks up the catalog row of every line item.
+
+    Parameters:
+    - line_items: list of dict
+        Items with the EstimationInput fields.
+    - material_catalog: Catalog
+        The catalog to look the items up in.
+
+    Returns:
+    - tuple
+        Catalog positions (0 for unknown items), a mask of the items found in
+        the catalog, the sizing values in catalog units (NaN where missing or
+        invalid) and a mask of the items whose sizing unit converts to the catalog unit.
+    """
+    count = len(line_items)
+    positions = np.zeros(count, dtype=np.int64)
+    known = np.zeros(count, dtype=bool)
+    sizes = np.full(count, np.nan)
+    index = material_catalog.index
+    for i, item in enumerate(line_items):
+        position = index.get(item_key(item))
+        if position is not None:
+            positions[i] = position
+            known[i] = True
+        try:
+            sizes[i] = float(item.get("sizing_value"))
+        except (TypeError, ValueError):
+            pass
+    sizes, convertible = units.to_catalog_units(
+        material_catalog, positions, sizes, [item.get("sizing_unit") for item in line_items]
+    )
+    return positions, known, sizes, convertible
 
-    selected_row = filter_material_data(
-        material_data, estimation_input.method, estimation_input.plant_type, estimation_input.equipment, estimation_input.equipment_type
+
+@timed
+def price_line_items(line_items, material_catalog, allow_extrapolation=False, scenario_list=None, project_factors=None):
+    """
+    Prices a list of line items in one batch.
+
+    Items that cannot be priced (unknown catalog entry, invalid size, size out
+    of range) are reported in the diagnostics and get NaN costs; they never stop
+    the rest of the batch from being priced.
+
+    Parameters:
+    - line_items: list of dict
+        Items with the EstimationInput fields.
+    - material_catalog: Catalog
+        The catalog to price against.
+    - allow_extrapolation: bool
+        Price items outside their sizing limits, flagged as extrapolated.
+    - scenario_list: list of dict, optional
+        Scenarios to price every item under.
+    - project_factors: dict, optional
+        Project overrides of the factors that give the total fixed capital
+        cost, as in ``get_project_factors``; the catalog factors if None.
+
+    Returns:
+    - dict
+        The cost arrays and status codes of ``pricing.price_items`` plus a
+        ``diagnostics`` list with one dict per item and the catalog
+        ``positions`` of the items (0 for unknown items). With ``scenario_list``,
+        ``scenarios`` holds the items x scenarios arrays of
+        ``scenarios.price_scenarios``.
+    """
+    positions, known, sizes, convertible = resolve_line_items(line_items, material_catalog)
+    costs = pricing.price_items(material_catalog, positions, sizes, allow_extrapolation)
+    if project_factors:
+        project = [{"name": "project", **project_factors}]
+        costs["total_fixed_capital_cost"] = scenarios.price_scenarios(
+            material_catalog, positions, costs["isbl_cost"], project
+        )["total_fixed_capital_cost"][:, 0]
+    for name in ("purchased_cost", "installed_cost", "isbl_cost", "total_fixed_capital_cost"):
+        costs[name][~known] = np.nan
+    costs["status"][~convertible] = RangeStatus.INVALID_UNIT
+    costs["status"][~known] = RangeStatus.UNKNOWN_ITEM
+    costs["positions"] = positions
+    costs["diagnostics"] = diagnostics(
+        material_catalog, positions, sizes, costs["status"], allow_extrapolation
     )
-    selected_row = selected_row.iloc[0]
-    s_lower = selected_row[Factors.S_LOWER]
-    s_upper = selected_row[Factors.S_UPPER]
-
-
-    if not (np.isnan(s_lower) or np.isnan(s_upper)) and not (
-        s_lower <= estimation_input.sizing_value <= s_upper
-    ):
-        return "", f"Error: The input value must be between {s_lower} and {s_upper}."
-
-    if selected_row.empty:
-        raise ValueError("No matching data found for the selected options.")
-
-    a = selected_row[Factors.A]
-    b = selected_row[Factors.B]
-    n = selected_row[Factors.N]
-
-    purchased_equipment_cost = a + b * (estimation_input.sizing_value) ** float(n)
-    purchased_cost_output = f"${purchased_equipment_cost:,.2f}"
-
-    if estimation_input.method == "Hand":
-        installation_factor = selected_row[Factors.INSTALLATION_FACTOR]
-        installed_equipment_cost = purchased_equipment_cost * installation_factor
-        total_cost_output = f"${installed_equipment_cost:,.2f}"
-    else:
-        fm = selected_row[Factors.MATERIAL_FACTOR]
-        fer = selected_row[Factors.EQUIPMENT_ERECTION_FACTOR]
-        fp = selected_row[Factors.PIPING_FACTOR]
-        fi = selected_row[Factors.INSTRUMENTATION_AND_CONTROL_FACTOR]
-        fel = selected_row[Factors.ELECTRICAL_FACTOR]
-        fc = selected_row[Factors.CIVIL_FACTOR]
-        fs = selected_row[Factors.STRUCTURES_AND_BUILDINGS_FACTOR]
-        fl = selected_row[Factors.LAGGING_AND_PAINT_FACTOR]
-        OS = selected_row[Factors.OFFSITES_FACTOR]
-        DE = selected_row[Factors.DESIGN_AND_ENGINEERING_FACTOR]
-        X = selected_row[Factors.CONTINGENCY]
-        location_factor = selected_row[Factors.LOCATION_FACTOR]
-
-        ISBL_cost = purchased_equipment_cost * (
-            (1 + float(fp)) * fm + (fer + fel + fi + fc + fs + fl)
+    if scenario_list is not None:
+        costs["scenarios"] = scenarios.price_scenarios(
+            material_catalog, positions, costs["isbl_cost"], scenario_list
         )
-        total_fixed_capital_cost = ISBL_cost * (1 + OS) * (1 + DE + X) * location_factor
-        total_cost_output = f"${ISBL_cost:,.2f}"
+    return costs
+
+
+@timed
+def suggest_parallel_units(data, material_catalog, objective=splitting.TOTAL_FIXED_CAPITAL_COST):
+    """
+    Finds the cheapest parallel-unit design of the project's line items.
+
+    Parameters:
+    - data: dict
+        The project.
+    - material_catalog: Catalog
+        The catalog to price against.
+    - objective: str
+        "installed_cost" or "total_fixed_capital_cost", the cost to minimize.
+
+    Returns:
+    - list of dict
+        One suggestion per line item above its sizing range, with the
+        ``item_id`` (position in the line item list), the ``units`` (0 if no
+        design of up to MAX_PARALLEL_UNITS units fits), the ``unit_size`` of the first
+        ``units - 1`` units, the ``last_unit_size``, the ``cost`` of the
+        design and the extrapolated ``single_unit_cost``.
+    """
+    line_items = data.get(LINE_ITEMS) or []
+    positions, known, sizes, _ = resolve_line_items(line_items, material_catalog)
+    status = check_ranges(material_catalog, positions, sizes)
+    designs = splitting.split_units(
+        material_catalog,
+        positions,
+        sizes,
+        objective,
+        get_project_factors(data),
+        max_units=MAX_PARALLEL_UNITS,
+    )
+    s_upper = material_catalog.arrays.s_upper[positions]
+    suggestions = []
+    for i in np.flatnonzero(known & (status == RangeStatus.ABOVE_RANGE)).tolist():
+        suggestions.append(
+            {
+                "item_id": i,
+                "equipment_type": line_items[i].get("equipment_type"),
+                "sizing_value": float(sizes[i]),
+                "s_upper": float(s_upper[i]),
+                "units": int(designs["units"][i]),
+                "unit_size": float(designs["unit_size"][i]),
+                "last_unit_size": float(designs["last_unit_size"][i]),
+                "cost": float(designs["cost"][i]),
+                "single_unit_cost": float(designs["single_unit_cost"][i]),
+            }
+        )
+    return suggestions
+
+
+def apply_parallel_units(data, suggestions):
+    """Replaces every line item with a design of several units by one line item per unit. Returns the project."""
+    designs = {suggestion["item_id"]: suggestion for suggestion in suggestions if suggestion["units"] > 1}
+    line_items = []
+    for i, item in enumerate(data.get(LINE_ITEMS) or []):
+        design = designs.get(i)
+        if design is None:
+            line_items.append(item)
+            continue
+        unit_sizes = [design["unit_size"]] * (design["units"] - 1) + [design["last_unit_size"]]
+        # the unit sizes are in catalog units
+        line_items.extend(dict(item, sizing_value=size, sizing_unit=None) for size in unit_sizes)
+    data[LINE_ITEMS] = line_items
+    return data
+
+
+def format_cost(value):
+    return "n/a" if value is None or not np.isfinite(value) else f"${value:,.2f}"
+
+
+def graph_inputs(data, material_catalog, line_items):
+    """The ``graph.PROJECT_GRAPH`` inputs for pricing ``line_items`` with the project's settings."""
+    estimation_input = data.get("estimation_input") or {}
+    return graph.project_inputs(
+        line_items,
+        material_catalog.version,
+        estimation_input.get("allow_extrapolation"),
+        get_project_factors(data),
+        get_scenarios(data),
+    )
+
+
+@timed
+def run_calculation(data, material_catalog):
+    """
+    Prices the estimation input and the project totals.
+
+    Only the parts of the computation whose inputs changed since the last run
+    are recomputed; see ``budge.project.graph``. The node keys are stored with
+    the output so ``stale_nodes`` can tell later which parts are out of date.
+    """
+    estimation_input = EstimationInput(**data["estimation_input"])
+
+    item_inputs = graph_inputs(data, material_catalog, [estimation_input.model_dump()])
+    item, item_keys, item_recomputed = graph.PROJECT_GRAPH.evaluate(material_catalog, item_inputs)
+    diagnostic = diagnostics(
+        material_catalog,
+        item["rows"]["positions"],
+        item["purchased"]["sizes"],
+        item["purchased"]["status"],
+        estimation_input.allow_extrapolation,
+    )[0]
+    if not diagnostic["priced"]:
+        raise ValueError(diagnostic["message"])
+
+    project, project_keys, project_recomputed = graph.PROJECT_GRAPH.evaluate(
+        material_catalog, graph_inputs(data, material_catalog, project_line_items(data))
+    )
 
     estimation_output = {}
-    estimation_output["purchased_cost_output"] = f"{purchased_cost_output}"
-    estimation_output["total_cost_output"] = f"{total_cost_output}"
+    estimation_output["purchased_cost_output"] = format_cost(item["purchased"]["purchased_cost"][0])
+    # installed cost for the Hand method, ISBL cost for material factors
+    estimation_output["total_cost_output"] = format_cost(item["isbl"]["installed_cost"][0])
+    estimation_output["total_fixed_capital_cost_output"] = format_cost(
+        item["total_fixed_capital_cost"]["total_fixed_capital_cost"][0]
+    )
+    estimation_output["catalog_version"] = material_catalog.version
+    estimation_output["priced_by"] = str(item["rows"]["layer"][0])
+    estimation_output["diagnostics"] = diagnostic
+    scenario_costs = item["scenarios"]
+    estimation_output["scenarios"] = [
+        {
+            "name": scenario["name"],
+            **{
+                name: None if np.isnan(scenario_costs[name][0, i]) else float(scenario_costs[name][0, i])
+                for name in scenarios.SCENARIO_FACTORS
+            },
+            "total_fixed_capital_cost": format_cost(scenario_costs["total_fixed_capital_cost"][0, i]),
+        }
+        for i, scenario in enumerate(item_inputs["scenarios"])
+    ]
+    estimation_output["totals"] = project["totals"]
+    estimation_output["summary"] = rollup_rows(project["rollups"], "method")
+    estimation_output["node_keys"] = {"item": item_keys, "project": project_keys}
+    estimation_output["recomputed"] = list(dict.fromkeys(item_recomputed + project_recomputed))
 
     data["estimation_output"] = estimation_output
     return data
 
 
-def save_reset(data):
-    try:
-        data.pop("estimation_output")
-        data = run_reset(data)
-    except KeyError:
-        pass
-    return data
+def rollup_rows(rollups, dimension):
+    """The groups of one dimension of the ``rollups`` graph node as table rows, largest total fixed capital cost first."""
+    rows = rollup.to_rows(rollups[dimension], [dimension], graph.ROLLUP_VALUES)
+    return sorted(rows, key=lambda row: row["total_fixed_capital_cost"], reverse=True)
+
+
+@timed
+def project_rollup(data, material_catalog, dimension):
+    """
+    Totals of the project's line items grouped along one dimension.
+
+    Parameters:
+    - data: dict
+        The project.
+    - material_catalog: Catalog
+        The catalog to price against.
+    - dimension: str
+        One of ``graph.ROLLUP_DIMENSIONS``: "plant_type", "equipment", "area" or "method".
+
+    Returns:
+    - list of dict
+        One row per group with the group label under ``dimension``, the item
+        ``count`` and, for each of ``graph.ROLLUP_VALUES``, the sum of the
+        priced items and their count under ``priced.<value>``.
+    """
+    if dimension not in graph.ROLLUP_DIMENSIONS:
+        raise ValueError(f"Unknown rollup dimension '{dimension}', expected one of {', '.join(graph.ROLLUP_DIMENSIONS)}")
+    values, _, _ = graph.PROJECT_GRAPH.evaluate(
+        material_catalog, graph_inputs(data, material_catalog, project_line_items(data))
+    )
+    return rollup_rows(values["rollups"], dimension)
+
+
+def stale_nodes(data, material_catalog):
+    """
+    Labels of the parts of the estimation output that are out of date, e.g. ["total fixed capital cost", ...].
+
+    Empty when there is no output or it matches the current inputs and catalog.
+    """
+    estimation_output = data.get("estimation_output") or {}
+    recorded = estimation_output.get("node_keys")
+    if not recorded or not data.get("estimation_input"):
+        return []
+    stale = graph.PROJECT_GRAPH.stale(
+        graph_inputs(data, material_catalog, [data["estimation_input"]]), recorded.get("item")
+    )
+    stale += graph.PROJECT_GRAPH.stale(
+        graph_inputs(data, material_catalog, project_line_items(data)), recorded.get("project")
+    )
+    return [graph.PROJECT_GRAPH.labels[name] for name in dict.fromkeys(stale)]
+
+
+def report_node_key(data, material_catalog):
+    """Key of the report node for the current project inputs; stored with a generated report."""
+    inputs = graph_inputs(data, material_catalog, project_line_items(data))
+    return graph.PROJECT_GRAPH.keys(inputs)["report"]
 
 
+@timed
 def run_reset(data):
     try:
         data.pop(
@@ -0,0 +1,245 @@
+"""Columnar export of priced line items to Parquet and Excel.
+
+Line items are priced and written in chunks, so memory use stays flat however
+long the list is. Costs are written as raw floats; formatting is left to the
+reader (Excel gets a currency number format). Parquet needs ``pyarrow`` and
+Excel needs ``xlsxwriter``; both are optional dependencies, installed with
+``pip install budge[export]``.
+"""
+
+import math
+import os
+import re
+import tempfile
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from budge.core import units
+from budge.core.validation import RangeStatus, priceable
+from budge.monitoring.metrics import timed
+from budge.project import estimation
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = pq = None
+
+try:
+    import xlsxwriter
+except ImportError:  # optional dependency
+    xlsxwriter = None
+
+PARQUET = "parquet"
+XLSX = "xlsx"
+FORMATS = (PARQUET, XLSX)
+
+CHUNK_ROWS = 10_000
+
+TEXT_COLUMNS = ("method", "plant_type", "equipment", "equipment_type", "sizing_unit", "status", "priced_by")
+FLOAT_COLUMNS = ("sizing_value", "purchased_cost", "installed_cost", "isbl_cost", "total_fixed_capital_cost")
+BOOL_COLUMNS = ("priced", "extrapolated")
+COST_COLUMNS = ("purchased_cost", "installed_cost", "isbl_cost", "total_fixed_capital_cost")
+
+SCENARIO_COLUMN = "total_fixed_capital_cost[{}]"
+
+
+def column_names(scenario_list: Sequence[dict]) -> List[str]:
+    """Export columns in file order."""
+    return (
+        list(TEXT_COLUMNS[:4])
+        + ["sizing_value", "sizing_unit"]
+        + list(FLOAT_COLUMNS[1:])
+        + [SCENARIO_COLUMN.format(s["name"]) for s in scenario_list]
+        + ["status", "priced", "extrapolated", "priced_by"]
+    )
+
+
+def result_chunks(
+    line_items: Sequence[dict],
+    material_catalog,
+    scenario_list: Sequence[dict] = (),
+    allow_extrapolation: bool = False,
+    chunk_rows: int = CHUNK_ROWS,
+    project_factors: Optional[dict] = None,
+) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Prices the line items chunk by chunk and yields each chunk as typed columns.
+
+    Yields:
+        dict: Column name -> array, in ``column_names`` order. Costs are float64
+        with NaN for items that could not be priced.
+    """
+    for start in range(0, len(line_items), chunk_rows):
+        chunk = line_items[start : start + chunk_rows]
+        costs = estimation.price_line_items(
+            chunk, material_catalog, allow_extrapolation, list(scenario_list), project_factors
+        )
+        status = costs["status"]
+        priced = priceable(status, allow_extrapolation) & (status != RangeStatus.UNKNOWN_ITEM)
+        outside = (status == RangeStatus.BELOW_RANGE) | (status == RangeStatus.ABOVE_RANGE)
+
+        columns: Dict[str, np.ndarray] = {}
+        for name in TEXT_COLUMNS[:4]:
+            columns[name] = np.array([str(item.get(name) or "") for item in chunk], dtype=object)
+        columns["sizing_value"] = np.array(
+            [_to_float(item.get("sizing_value")) for item in chunk], dtype=np.float64
+        )
+        columns["sizing_unit"] = units.entered_units(
+            material_catalog, costs["positions"], status != RangeStatus.UNKNOWN_ITEM, [item.get("sizing_unit") for item in chunk]
+        )
+        for name in COST_COLUMNS:
+            columns[name] = costs[name]
+        for i, scenario in enumerate(scenario_list):
+            columns[SCENARIO_COLUMN.format(scenario["name"])] = costs["scenarios"]["total_fixed_capital_cost"][:, i]
+        columns["status"] = np.array([RangeStatus.LABELS[code] for code in status.tolist()], dtype=object)
+        columns["priced"] = priced
+        columns["extrapolated"] = priced & outside
+        columns["priced_by"] = np.where(
+            status != RangeStatus.UNKNOWN_ITEM, material_catalog.arrays.text("layer", costs["positions"]), ""
+        ).astype(object)
+        yield columns
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _require(module, name: str, fmt: str):
+    if module is None:
+        raise ImportError(f"Exporting to {fmt} needs the optional dependency {name}: pip install {name}")
+
+
+def parquet_schema(names: Sequence[str]):
+    fields = []
+    for name in names:
+        if name in BOOL_COLUMNS:
+            fields.append(pa.field(name, pa.bool_()))
+        elif name in TEXT_COLUMNS:
+            fields.append(pa.field(name, pa.string()))
+        else:
+            fields.append(pa.field(name, pa.float64()))
+    return pa.schema(fields)
+
+
+@timed
+def write_parquet(
+    path: str, line_items, material_catalog, scenario_list=(), allow_extrapolation=False, project_factors=None
+) -> int:
+    """
+    Writes the priced line items to a Parquet file, one row group per chunk.
+
+    Returns:
+        int: Number of rows written.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    _require(pa, "pyarrow", "Parquet")
+    names = column_names(scenario_list)
+    schema = parquet_schema(names)
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for columns in result_chunks(
+            line_items, material_catalog, scenario_list, allow_extrapolation, project_factors=project_factors
+        ):
+            arrays = [pa.array(columns[name], type=schema.field(name).type, from_pandas=True) for name in names]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(columns["method"])
+        if rows == 0:
+            writer.write_table(schema.empty_table())
+    return rows
+
+
+@timed
+def write_xlsx(
+    path: str, line_items, material_catalog, scenario_list=(), allow_extrapolation=False, project_factors=None
+) -> int:
+    """
+    Writes the priced line items to an Excel workbook.
+
+    The workbook is written in constant-memory mode: each row is flushed to
+    disk as soon as it is complete. Costs that could not be priced are left blank.
+
+    Returns:
+        int: Number of rows written.
+
+    Raises:
+        ImportError: If xlsxwriter is not installed.
+    """
+    _require(xlsxwriter, "xlsxwriter", "Excel")
+    names = column_names(scenario_list)
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    try:
+        worksheet = workbook.add_worksheet("Line Items")
+        header = workbook.add_format({"bold": True})
+        currency = workbook.add_format({"num_format": "$#,##0.00"})
+        formats = [
+            currency if name in COST_COLUMNS or name.startswith("total_fixed_capital_cost[") else None
+            for name in names
+        ]
+        worksheet.write_row(0, 0, names, header)
+        worksheet.freeze_panes(1, 0)
+
+        # the typed writers skip xlsxwriter's per-cell type dispatch
+        writers = [
+            worksheet.write_boolean
+            if name in BOOL_COLUMNS
+            else worksheet.write_string
+            if name in TEXT_COLUMNS
+            else worksheet.write_number
+            for name in names
+        ]
+        row = 1
+        for columns in result_chunks(
+            line_items, material_catalog, scenario_list, allow_extrapolation, project_factors=project_factors
+        ):
+            values = [columns[name].tolist() for name in names]
+            for record in zip(*values):
+                for col, value in enumerate(record):
+                    if value != value or value == "":
+                        # NaN cost or empty text: leave the cell blank
+                        continue
+                    writers[col](row, col, value, formats[col])
+                row += 1
+    finally:
+        workbook.close()
+    return row - 1
+
+
+WRITERS = {PARQUET: write_parquet, XLSX: write_xlsx}
+
+
+def export_project(data: dict, material_catalog, fmt: str, directory: str) -> str:
+    """
+    Exports the project's priced line items to ``directory``.
+
+    Args:
+        data (dict): The project data.
+        material_catalog (Catalog): The catalog to price against.
+        fmt (str): "parquet" or "xlsx".
+        directory (str): Where to write the file.
+
+    Returns:
+        str: Path of the written file. The name is unique, so concurrent exports never collide.
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {', '.join(FORMATS)}")
+    file_name = data.get("meta_input", {}).get("file_name") or "Project_Data"
+    file_name = re.sub(r"[^A-Za-z0-9_-]+", "_", file_name)
+    fd, path = tempfile.mkstemp(prefix=f"{file_name}_line_items_", suffix=f".{fmt}", dir=directory)
+    os.close(fd)
+    estimation_input = data.get("estimation_input") or {}
+    WRITERS[fmt](
+        path,
+        estimation.project_line_items(data),
+        material_catalog,
+        estimation.get_scenarios(data),
+        bool(estimation_input.get("allow_extrapolation")),
+        estimation.get_project_factors(data),
+    )
+    return path
@@ -0,0 +1,298 @@
+"""Dependency-tracked, incremental recomputation of project results.
+
+A project's estimate is computed as a chain of nodes::
+
+    catalog rows -> purchased cost -> ISBL cost -> total fixed capital cost -> rollups -> project totals -> report
+                                               \\-> scenarios
+
+Every node has a key: a hash of the project inputs it reads and the keys of
+the nodes it depends on. Node results are memoized by key, so after a change
+only the nodes whose key changed are recomputed. With a shared result cache
+configured (``budge.core.result_store``), results missing from the memo are
+also looked up on disk, so they survive restarts and are shared by the
+worker processes of the host. Changing the project location
+factor, for example, changes the keys from the total fixed capital cost down,
+while the purchased and ISBL costs are served from the memo. Comparing the
+keys recorded with a result against the current keys tells which parts of
+the result are stale.
+"""
+
+import hashlib
+import json
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from budge.core import catalog, pricing, rollup, scenarios, units
+from budge.core.cache import SharedCache, freeze
+from budge.core.result_store import ResultStore, get_result_store
+from budge.core.definitions import Factors
+from budge.core.validation import RangeStatus
+
+MEMO_SIZE = 128
+
+# rollup dimension -> label; the catalog columns are grouped by the catalog's own codes
+ROLLUP_DIMENSIONS = {
+    "plant_type": "Plant Type",
+    "equipment": "Equipment",
+    "area": "Project Area",
+    "method": "Method",
+}
+CATALOG_DIMENSIONS = {"plant_type": Factors.PLANT_TYPE, "equipment": Factors.EQUIPMENT, "method": Factors.METHOD}
+ROLLUP_VALUES = ("purchased_cost", "installed_cost", "total_fixed_capital_cost")
+UNASSIGNED_AREA = "Unassigned"
+
+_MISSING = object()
+
+
+def fingerprint(value) -> str:
+    """Content hash of an input value: numpy arrays by their bytes, everything else as canonical JSON."""
+    digest = hashlib.sha256()
+    if isinstance(value, np.ndarray):
+        digest.update(str((value.dtype.str, value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    else:
+        digest.update(json.dumps(value, sort_keys=True, separators=(",", ":"), default=str).encode())
+    return digest.hexdigest()
+
+
+class Node(NamedTuple):
+    """
+    One step of the computation.
+
+    Attributes:
+        name (str): Node name, used as the key of its result.
+        label (str): Human readable name shown in stale warnings.
+        inputs (tuple): Names of the project inputs the node reads.
+        deps (tuple): Names of the nodes whose results it uses.
+        compute (callable): ``compute(context, inputs, deps)`` with dicts of the
+            declared inputs and dependency results; returns the node result.
+    """
+
+    name: str
+    label: str
+    inputs: Tuple[str, ...]
+    deps: Tuple[str, ...]
+    compute: Callable[[Any, Dict[str, Any], Dict[str, Any]], Any]
+
+
+class DependencyGraph:
+    """
+    A set of nodes, listed in dependency order, with a shared memo of their results.
+
+    The memo is shared by all threads. Node results are made read-only when
+    they are stored, since every later evaluation with the same key gets the
+    same objects.
+
+    Args:
+        nodes (list): The nodes; every node must come after the nodes it depends on.
+        memo_size (int): Number of node results kept, least recently used dropped first.
+        store (callable, optional): Returns the ``ResultStore`` that backs the memo, or None for none.
+    """
+
+    def __init__(
+        self,
+        nodes: Sequence[Node],
+        memo_size: int = MEMO_SIZE,
+        store: Callable[[], Optional[ResultStore]] = lambda: None,
+    ):
+        self.nodes = list(nodes)
+        seen = set()
+        for node in self.nodes:
+            missing = [dep for dep in node.deps if dep not in seen]
+            if missing:
+                raise ValueError(f"Node {node.name} depends on {', '.join(missing)}, which must come first.")
+            seen.add(node.name)
+        self.labels = {node.name: node.label for node in self.nodes}
+        self._memo = SharedCache(memo_size)
+        self._store = store
+
+    def keys(self, inputs: Dict[str, Any]) -> Dict[str, str]:
+        """The key of every node for the given inputs."""
+        input_hashes = {name: fingerprint(value) for name, value in inputs.items()}
+        keys: Dict[str, str] = {}
+        for node in self.nodes:
+            parts = [node.name]
+            parts += [f"{name}={input_hashes[name]}" for name in node.inputs]
+            parts += [f"{dep}={keys[dep]}" for dep in node.deps]
+            keys[node.name] = hashlib.sha256("|".join(parts).encode()).hexdigest()[:32]
+        return keys
+
+    def evaluate(self, context, inputs: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, str], List[str]]:
+        """
+        Computes every node, reusing memoized results whose key has not changed.
+
+        Args:
+            context: Passed through to every ``compute``, e.g. the catalog; its
+                ``version``, if any, is recorded with the results put in the store.
+            inputs (dict): The project inputs.
+
+        Returns:
+            tuple: The node results, the node keys and the names of the nodes that were recomputed.
+        """
+        keys = self.keys(inputs)
+        store = self._store()
+        values: Dict[str, Any] = {}
+        recomputed = []
+        for node in self.nodes:
+            key = keys[node.name]
+            value = self._memo.get(key, _MISSING)
+            if value is _MISSING and store is not None:
+                value = store.get(key, _MISSING)
+                if value is not _MISSING:
+                    value = self._memo.put(key, freeze(value))
+            if value is _MISSING:
+                result = node.compute(
+                    context,
+                    {name: inputs[name] for name in node.inputs},
+                    {dep: values[dep] for dep in node.deps},
+                )
+                value = self._memo.put(key, freeze(result))
+                recomputed.append(node.name)
+                if store is not None:
+                    store.put(key, value, getattr(context, "version", ""))
+            values[node.name] = value
+        return values, keys, recomputed
+
+    def stale(self, inputs: Dict[str, Any], recorded: Optional[Dict[str, str]]) -> List[str]:
+        """Names of the nodes whose recorded key no longer matches the inputs, in dependency order."""
+        if not recorded:
+            return []
+        keys = self.keys(inputs)
+        return [name for name, key in keys.items() if name in recorded and recorded[name] != key]
+
+    def clear(self) -> None:
+        self._memo.clear()
+
+
+def _rows(material_catalog, inputs, deps):
+    index = material_catalog.index
+    found = [index.get(tuple(key)) for key in inputs["item_keys"]]
+    known = np.array([position is not None for position in found], dtype=bool)
+    positions = np.array([position or 0 for position in found], dtype=np.int64)
+    return {"positions": positions, "known": known, "layer": material_catalog.arrays.text("layer", positions)}
+
+
+def _purchased(material_catalog, inputs, deps):
+    rows = deps["rows"]
+    sizes = np.array(
+        [np.nan if size is None else size for size in inputs["sizes"]], dtype=np.float64
+    )
+    sizes, convertible = units.to_catalog_units(material_catalog, rows["positions"], sizes, inputs["units"])
+    purchased, status = pricing.checked_purchased_cost(
+        material_catalog, rows["positions"], sizes, inputs["allow_extrapolation"]
+    )
+    status[~convertible] = RangeStatus.INVALID_UNIT
+    purchased[~rows["known"]] = np.nan
+    status[~rows["known"]] = RangeStatus.UNKNOWN_ITEM
+    return {"purchased_cost": purchased, "status": status, "sizes": sizes}
+
+
+def _isbl(material_catalog, inputs, deps):
+    positions = deps["rows"]["positions"]
+    purchased = deps["purchased"]["purchased_cost"]
+    isbl = pricing.isbl_cost(material_catalog, positions, purchased)
+    return {
+        "isbl_cost": isbl,
+        "installed_cost": pricing.installed_cost(material_catalog, positions, purchased, isbl),
+    }
+
+
+def _total_fixed_capital_cost(material_catalog, inputs, deps):
+    project = [{"name": "project", **(inputs["project_factors"] or {})}]
+    costs = scenarios.price_scenarios(
+        material_catalog, deps["rows"]["positions"], deps["isbl"]["isbl_cost"], project
+    )
+    return {"total_fixed_capital_cost": costs["total_fixed_capital_cost"][:, 0]}
+
+
+def _scenarios(material_catalog, inputs, deps):
+    return scenarios.price_scenarios(
+        material_catalog, deps["rows"]["positions"], deps["isbl"]["isbl_cost"], inputs["scenarios"]
+    )
+
+
+def _rollups(material_catalog, inputs, deps):
+    rows = deps["rows"]
+    groups = {
+        dimension: rollup.catalog_codes(material_catalog, column, rows["positions"], rows["known"])
+        for dimension, column in CATALOG_DIMENSIONS.items()
+    }
+    groups["area"] = rollup.value_codes(inputs["areas"], UNASSIGNED_AREA)
+    measures = rollup.Measures(
+        {
+            "purchased_cost": deps["purchased"]["purchased_cost"],
+            "installed_cost": deps["isbl"]["installed_cost"],
+            "total_fixed_capital_cost": deps["total_fixed_capital_cost"]["total_fixed_capital_cost"],
+        }
+    )
+    return {dimension: rollup.rollup([groups[dimension]], measures) for dimension in ROLLUP_DIMENSIONS}
+
+
+def _totals(material_catalog, inputs, deps):
+    # every rollup covers all items once; the method rollup has the fewest groups
+    by_method = deps["rollups"]["method"]
+    return {
+        "items": int(by_method["count"].sum()),
+        "priced": int(by_method["priced.purchased_cost"].sum()),
+        **{name: float(by_method[name].sum()) for name in ROLLUP_VALUES},
+    }
+
+
+def _report(material_catalog, inputs, deps):
+    # the report summarizes the project totals; its key changes whenever they do
+    return dict(deps["totals"])
+
+
+PROJECT_GRAPH = DependencyGraph(
+    [
+        Node("rows", "catalog rows", ("catalog_version", "item_keys"), (), _rows),
+        Node("purchased", "purchased cost", ("sizes", "units", "allow_extrapolation"), ("rows",), _purchased),
+        Node("isbl", "ISBL cost", (), ("rows", "purchased"), _isbl),
+        Node(
+            "total_fixed_capital_cost",
+            "total fixed capital cost",
+            ("project_factors",),
+            ("rows", "isbl"),
+            _total_fixed_capital_cost,
+        ),
+        Node("scenarios", "scenarios", ("scenarios",), ("rows", "isbl"), _scenarios),
+        Node(
+            "rollups",
+            "grouped totals",
+            ("areas",),
+            ("rows", "purchased", "isbl", "total_fixed_capital_cost"),
+            _rollups,
+        ),
+        Node("totals", "project totals", (), ("rollups",), _totals),
+        Node("report", "report", (), ("totals",), _report),
+    ],
+    store=get_result_store,
+)
+
+
+# results computed from an older catalog version cannot be hit again
+catalog.add_reload_listener(lambda old, new: PROJECT_GRAPH.clear())
+
+
+def project_inputs(line_items, catalog_version: str, allow_extrapolation=False, project_factors=None, scenario_list=()):
+    """The inputs of ``PROJECT_GRAPH`` for a list of line items."""
+    sizes = []
+    for item in line_items:
+        try:
+            sizes.append(float(item.get("sizing_value")))
+        except (TypeError, ValueError):
+            sizes.append(None)
+    return {
+        "catalog_version": catalog_version,
+        "item_keys": [
+            [item.get("method"), item.get("plant_type"), item.get("equipment"), item.get("equipment_type")]
+            for item in line_items
+        ],
+        "sizes": sizes,
+        "units": [item.get("sizing_unit") for item in line_items],
+        "areas": [item.get("area") for item in line_items],
+        "allow_extrapolation": bool(allow_extrapolation),
+        "project_factors": project_factors or {},
+        "scenarios": list(scenario_list),
+    }
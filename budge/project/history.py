@@ -0,0 +1,153 @@
+"""Diffs and cost deltas between revisions of a project.
+
+The revisions themselves are recorded by ``storage.ProjectRepository``; see
+there for how they are stored. Line items are compared by content hash, so
+an item that was edited, moved or left alone is told apart without
+comparing every field.
+"""
+
+import difflib
+import json
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from budge.project import estimation, graph, storage
+from budge.project.storage import DERIVED_KEYS, LINE_ITEMS, PROJECT_ID, REVISION, item_hash
+
+
+def item_changes(old: Sequence[str], new: Sequence[str]) -> Dict[str, list]:
+    """
+    Line item changes between two item hash lists.
+
+    Returns:
+        dict: ``added`` (indices in ``new``), ``removed`` (indices in ``old``)
+        and ``changed`` (``(old index, new index)`` pairs).
+    """
+    added, removed, changed = [], [], []
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        paired = min(i2 - i1, j2 - j1) if tag == "replace" else 0
+        changed.extend((i1 + k, j1 + k) for k in range(paired))
+        removed.extend(range(i1 + paired, i2))
+        added.extend(range(j1 + paired, j2))
+    return {"added": added, "removed": removed, "changed": changed}
+
+
+def line_item_hashes(line_items: Sequence[dict]) -> List[str]:
+    return [item_hash(json.dumps(item)) for item in line_items or []]
+
+
+def diff(old: dict, new: dict) -> dict:
+    """
+    Differences between two revisions of a project.
+
+    Returns:
+        dict: ``document``, the changed project keys with their old and new
+        values (derived results only by name), and ``line_items``, as
+        returned by ``item_changes``.
+    """
+    document = {}
+    for key in sorted(set(old) | set(new)):
+        if key in (LINE_ITEMS, PROJECT_ID, REVISION) or old.get(key) == new.get(key):
+            continue
+        if key in DERIVED_KEYS:
+            document[key] = None
+        else:
+            document[key] = {"old": old.get(key), "new": new.get(key)}
+    return {
+        "document": document,
+        "line_items": item_changes(line_item_hashes(old.get(LINE_ITEMS)), line_item_hashes(new.get(LINE_ITEMS)))
+    }
+
+
+def _item_costs(data: dict, material_catalog):
+    line_items = estimation.project_line_items(data)
+    values, _, _ = graph.PROJECT_GRAPH.evaluate(
+        material_catalog, estimation.graph_inputs(data, material_catalog, line_items)
+    )
+    # Hand items have no total fixed capital cost; they count with their installed cost
+    total = values["total_fixed_capital_cost"]["total_fixed_capital_cost"]
+    costs = np.where(np.isfinite(total), total, values["isbl"]["installed_cost"])
+    return line_items, costs, values["totals"]
+
+
+def _label(item: dict) -> str:
+    return f"{item.get('equipment')} - {item.get('equipment_type')} ({item.get('sizing_value')})"
+
+
+def cost_delta(old: dict, new: dict, material_catalog) -> dict:
+    """
+    Cost impact of the changes between two revisions, priced against the current catalog.
+
+    Returns:
+        dict: ``totals``, the old, new and delta of each project total, and
+        ``items``, one row per added, removed or changed line item with its
+        old and new cost (NaN where it did not exist or could not be priced).
+    """
+    old_items, old_costs, old_totals = _item_costs(old, material_catalog)
+    new_items, new_costs, new_totals = _item_costs(new, material_catalog)
+    changes = item_changes(line_item_hashes(old_items), line_item_hashes(new_items))
+
+    rows = []
+    for i, j in changes["changed"]:
+        rows.append({"change": "changed", "item": _label(new_items[j]), "old": old_costs[i], "new": new_costs[j]})
+    for j in changes["added"]:
+        rows.append({"change": "added", "item": _label(new_items[j]), "old": np.nan, "new": new_costs[j]})
+    for i in changes["removed"]:
+        rows.append({"change": "removed", "item": _label(old_items[i]), "old": old_costs[i], "new": np.nan})
+    for row in rows:
+        row["delta"] = float(np.nan_to_num(row["new"]) - np.nan_to_num(row["old"]))
+        row["old"], row["new"] = float(row["old"]), float(row["new"])
+
+    totals = {
+        key: {"old": old_totals[key], "new": new_totals[key], "delta": new_totals[key] - old_totals[key]}
+        for key in ("purchased_cost", "installed_cost", "total_fixed_capital_cost")
+    }
+    return {"totals": totals, "items": rows}
+
+
+def is_available(data: dict) -> bool:
+    """True if the project is stored server-side, where its revisions are recorded."""
+    return bool(data) and storage.get_repository() is not None and PROJECT_ID in data
+
+
+def revisions(data: dict) -> List[dict]:
+    """The recorded revisions of the project, newest first; empty without server-side storage."""
+    if not is_available(data):
+        return []
+    return storage.get_repository().revisions(data[PROJECT_ID])
+
+
+def compare(data: dict, old_revision: int, new_revision: int, material_catalog) -> Optional[dict]:
+    """
+    ``diff`` and ``cost_delta`` between two revisions of the project.
+
+    Returns:
+        dict: ``diff`` and ``cost_delta``, or None if either revision is no longer stored.
+    """
+    if not is_available(data):
+        return None
+    repository = storage.get_repository()
+    old = repository.load_revision(data[PROJECT_ID], old_revision)
+    new = repository.load_revision(data[PROJECT_ID], new_revision)
+    if old is None or new is None:
+        return None
+    return {"diff": diff(old, new), "cost_delta": cost_delta(old, new, material_catalog)}
+
+
+def undo(data: dict) -> Optional[dict]:
+    """
+    Restores the revision before the current one.
+
+    Returns:
+        dict: What the browser store should hold, or None if there is nothing to undo.
+    """
+    if not is_available(data):
+        return None
+    revision = storage.get_repository().undo(data[PROJECT_ID])
+    if revision is None:
+        return None
+    return {PROJECT_ID: data[PROJECT_ID], REVISION: revision}
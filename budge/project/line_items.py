@@ -0,0 +1,283 @@
+"""Server-side row model for the line item grid.
+
+The grid on the estimation page only holds the rows in view and asks the
+server for each block as the user scrolls, sorts or filters. The line items
+of a project are priced once and turned into a ``LineItemTable``: one array
+per column, with the text columns as integer codes into their sorted distinct
+values. Filters then compare codes, sorting is an ``np.lexsort`` over codes
+and numbers, and a block is a slice of the sorted, filtered positions. Tables
+are cached by project revision (or content hash) and catalog version, and
+the sort orders by sort model, so scrolling costs a slice and a few dozen
+dicts per block.
+
+Editing a row reprices only that row and stores a patched copy of the table
+under the project's new key.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from budge.core import catalog, units
+from budge.core.cache import SharedCache
+from budge.core.validation import RangeStatus
+from budge.monitoring.metrics import timed
+from budge.project import estimation, graph, storage
+from budge.project.storage import LINE_ITEMS, PROJECT_ID, REVISION
+
+ITEM_ID = "item_id"
+TEXT_COLUMNS = ("method", "plant_type", "equipment", "equipment_type", "sizing_unit", "area", "status")
+NUMBER_COLUMNS = ("sizing_value", "purchased_cost", "total_fixed_capital_cost")
+
+TABLE_CACHE_SIZE = 64
+DEFAULT_BLOCK = 100
+
+_tables = SharedCache(TABLE_CACHE_SIZE)
+catalog.add_reload_listener(lambda old, new: _tables.clear())
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def item_values(data: dict, line_items: Sequence[dict], material_catalog) -> Dict[str, np.ndarray]:
+    """Costs, status and sizing unit of the line items, priced with the project's factors."""
+    values, _, _ = graph.PROJECT_GRAPH.evaluate(
+        material_catalog, estimation.graph_inputs(data, material_catalog, line_items)
+    )
+    total = values["total_fixed_capital_cost"]["total_fixed_capital_cost"]
+    rows = values["rows"]
+    return {
+        "sizing_unit": units.entered_units(
+            material_catalog, rows["positions"], rows["known"], [item.get("sizing_unit") for item in line_items]
+        ),
+        "purchased_cost": values["purchased"]["purchased_cost"],
+        # Hand items have no total fixed capital cost; show their installed cost
+        "total_fixed_capital_cost": np.where(np.isfinite(total), total, values["isbl"]["installed_cost"]),
+        "status": np.array([RangeStatus.LABELS[code] for code in values["purchased"]["status"].tolist()], dtype=object),
+    }
+
+
+class LineItemTable:
+    """
+    The priced line items of one project revision, as sortable, filterable columns.
+
+    A table is never modified once built; ``with_row`` returns a patched copy.
+
+    Args:
+        codes (dict): Text column -> integer code of each row into ``categories``.
+        categories (dict): Text column -> sorted distinct values.
+        numbers (dict): Number column -> float64 values, NaN where missing.
+    """
+
+    def __init__(self, codes: Dict[str, np.ndarray], categories: Dict[str, np.ndarray], numbers: Dict[str, np.ndarray]):
+        self.codes = codes
+        self.categories = categories
+        self.numbers = numbers
+        self._orders: Dict[tuple, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.numbers["sizing_value"])
+
+    @classmethod
+    def build(cls, line_items: Sequence[dict], values: Dict[str, np.ndarray]) -> "LineItemTable":
+        codes, categories = {}, {}
+        for column in TEXT_COLUMNS:
+            raw = values[column] if column in values else [item.get(column) for item in line_items]
+            categorical = pd.Categorical(pd.Series(raw, dtype=object).fillna("").astype(str))
+            codes[column] = categorical.codes.astype(np.int32)
+            categories[column] = np.asarray(categorical.categories, dtype=object)
+        numbers = {
+            "sizing_value": np.array([_to_float(item.get("sizing_value")) for item in line_items], dtype=np.float64),
+            "purchased_cost": np.asarray(values["purchased_cost"], dtype=np.float64),
+            "total_fixed_capital_cost": np.asarray(values["total_fixed_capital_cost"], dtype=np.float64),
+        }
+        return cls(codes, categories, numbers)
+
+    def with_row(self, position: int, item: dict, values: Dict[str, np.ndarray]) -> "LineItemTable":
+        """A copy of the table with the row at ``position`` replaced by the single priced ``item``."""
+        row = LineItemTable.build([item], values)
+        codes, categories = {}, {}
+        for column in TEXT_COLUMNS:
+            value = row.categories[column][row.codes[column][0]]
+            known = self.categories[column]
+            slot = int(np.searchsorted(known, value))
+            codes[column] = self.codes[column].copy()
+            if slot < len(known) and known[slot] == value:
+                categories[column] = known
+            else:
+                # a new value: insert it in sorted order and shift the codes after it
+                categories[column] = np.insert(known, slot, value)
+                codes[column][codes[column] >= slot] += 1
+            codes[column][position] = slot
+        numbers = {}
+        for column in NUMBER_COLUMNS:
+            numbers[column] = self.numbers[column].copy()
+            numbers[column][position] = row.numbers[column][0]
+        return LineItemTable(codes, categories, numbers)
+
+    def mask(self, filter_model: Optional[dict]) -> np.ndarray:
+        """Rows matching an AG Grid filter model."""
+        mask = np.ones(len(self), dtype=bool)
+        for column, condition in (filter_model or {}).items():
+            if column in self.codes or column in self.numbers:
+                mask &= self._condition_mask(column, condition)
+        return mask
+
+    def _condition_mask(self, column: str, condition: dict) -> np.ndarray:
+        if "conditions" in condition:
+            masks = [self._condition_mask(column, c) for c in condition["conditions"]]
+            combine = np.logical_or if condition.get("operator") == "OR" else np.logical_and
+            return combine.reduce(masks)
+        kind = condition.get("type")
+        if column in self.codes:
+            return self._text_mask(column, kind, str(condition.get("filter") or "").lower())
+        return self._number_mask(column, kind, condition.get("filter"), condition.get("filterTo"))
+
+    def _text_mask(self, column: str, kind: str, text: str) -> np.ndarray:
+        # the test runs once per distinct value; rows are then matched by code
+        values = pd.Series(self.categories[column], dtype=object).str.lower()
+        tests = {
+            "contains": lambda: values.str.contains(text, regex=False),
+            "notContains": lambda: ~values.str.contains(text, regex=False),
+            "equals": lambda: values == text,
+            "notEqual": lambda: values != text,
+            "startsWith": lambda: values.str.startswith(text),
+            "endsWith": lambda: values.str.endswith(text),
+            "blank": lambda: values.str.strip() == "",
+            "notBlank": lambda: values.str.strip() != "",
+        }
+        if kind not in tests:
+            return np.ones(len(self), dtype=bool)
+        matching = np.flatnonzero(tests[kind]().to_numpy(dtype=bool))
+        return np.isin(self.codes[column], matching)
+
+    def _number_mask(self, column: str, kind: str, value, value_to) -> np.ndarray:
+        numbers = self.numbers[column]
+        if kind == "blank":
+            return np.isnan(numbers)
+        if kind == "notBlank":
+            return ~np.isnan(numbers)
+        value, value_to = _to_float(value), _to_float(value_to)
+        tests = {
+            "equals": lambda: numbers == value,
+            "notEqual": lambda: numbers != value,
+            "lessThan": lambda: numbers < value,
+            "lessThanOrEqual": lambda: numbers <= value,
+            "greaterThan": lambda: numbers > value,
+            "greaterThanOrEqual": lambda: numbers >= value,
+            "inRange": lambda: (numbers >= value) & (numbers <= value_to),
+        }
+        if kind not in tests or np.isnan(value):
+            return np.ones(len(self), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            return tests[kind]()
+
+    def order(self, sort_model: Optional[List[dict]]) -> np.ndarray:
+        """Row positions sorted by an AG Grid sort model; kept per sort model."""
+        key = tuple((s["colId"], s["sort"]) for s in sort_model or [] if s["colId"] in self.codes or s["colId"] in self.numbers)
+        order = self._orders.get(key)
+        if order is None:
+            # lexsort takes the primary key last; ties keep the line item order
+            keys = [np.arange(len(self))]
+            for column, direction in reversed(key):
+                values = self.codes[column] if column in self.codes else self.numbers[column]
+                keys.append(-values if direction == "desc" else values)
+            order = np.lexsort(keys)
+            self._orders[key] = order
+        return order
+
+    def block(self, request: dict) -> dict:
+        """
+        Answers an AG Grid ``getRowsRequest``.
+
+        Returns:
+            dict: ``rowData`` for the requested rows and ``rowCount``, the number of rows matching the filter.
+        """
+        order = self.order(request.get("sortModel"))
+        if request.get("filterModel"):
+            order = order[self.mask(request["filterModel"])[order]]
+        start = int(request.get("startRow") or 0)
+        end = int(request.get("endRow") or start + DEFAULT_BLOCK)
+        positions = order[start:end]
+        rows = [{ITEM_ID: int(position)} for position in positions.tolist()]
+        for column in TEXT_COLUMNS:
+            for row, value in zip(rows, self.categories[column][self.codes[column][positions]].tolist()):
+                row[column] = value
+        for column in NUMBER_COLUMNS:
+            for row, value in zip(rows, self.numbers[column][positions].tolist()):
+                row[column] = None if value != value else value
+        return {"rowData": rows, "rowCount": len(order)}
+
+
+def table_key(data: dict, material_catalog) -> str:
+    """Identifies the priced line items: project revision, or content hash in the browser store, plus catalog version."""
+    if data.get(PROJECT_ID) and data.get(REVISION) is not None:
+        return f"{material_catalog.version}:{data[PROJECT_ID]}:{data[REVISION]}"
+    inputs = {
+        key: data.get(key) for key in (LINE_ITEMS, "project_factors", "scenarios")
+    }
+    inputs["allow_extrapolation"] = (data.get("estimation_input") or {}).get("allow_extrapolation")
+    return f"{material_catalog.version}:{graph.fingerprint(inputs)}"
+
+
+@timed
+def get_table(data: dict, material_catalog) -> LineItemTable:
+    """The line item table of the project, built on first use."""
+
+    def build():
+        line_items = data.get(LINE_ITEMS) or []
+        return LineItemTable.build(line_items, item_values(data, line_items, material_catalog))
+
+    return _tables.get_or_compute(table_key(data, material_catalog), build)
+
+
+@timed
+def set_sizing_value(data: dict, item_id: int, value, material_catalog):
+    """
+    Changes the sizing value of one line item and reprices just that row.
+
+    Returns:
+        The new value for the browser store.
+
+    Raises:
+        ValueError: If the value is not a number, the item does not exist or
+            the server-side project was evicted.
+    """
+    line_items = data.get(LINE_ITEMS) or []
+    if not 0 <= item_id < len(line_items):
+        raise ValueError(f"Line item {item_id} does not exist.")
+    size = _to_float(value)
+    if np.isnan(size) or size <= 0:
+        raise ValueError("Sizing value must be a positive number.")
+
+    table = get_table(data, material_catalog)
+    item = dict(line_items[item_id], sizing_value=size)
+    line_items[item_id] = item
+    stored = storage.persist_line_item(data, item_id, item)
+    if stored is None:
+        raise ValueError("The project is no longer stored on the server; reload it to continue.")
+    if isinstance(stored, dict) and REVISION in stored:
+        data[REVISION] = stored[REVISION]
+    _tables.put(
+        table_key(data, material_catalog),
+        table.with_row(item_id, item, item_values(data, [item], material_catalog)),
+    )
+    return stored
+
+
+def add_line_item(data: dict, item: dict) -> dict:
+    """Appends a line item to the project. Returns the project."""
+    data[LINE_ITEMS] = (data.get(LINE_ITEMS) or []) + [item]
+    return data
+
+
+def delete_line_items(data: dict, item_ids: Sequence[int]) -> dict:
+    """Removes the line items with the given ids (positions). Returns the project."""
+    drop = set(item_ids)
+    data[LINE_ITEMS] = [item for i, item in enumerate(data.get(LINE_ITEMS) or []) if i not in drop]
+    return data
@@ -0,0 +1,682 @@
+"""Optional server-side project storage backed by a local SQLite database.
+
+When ``BUDGE_PROJECT_DB`` is set the browser store only holds a small project
+reference and callbacks read and write the project through this module.
+Line items live in their own indexed table so they can be queried across
+projects without loading every project document.
+
+Every save also records a revision. The current revision is the project
+itself; each older one is stored as a reverse delta, the changes that turn the
+revision after it back into it. Line items are stored once per project under a
+hash of their content and revisions refer to them by hash, so unchanged items
+are shared by every revision that contains them, and deleted once no kept
+revision refers to them. Undo applies one delta to the current revision.
+Older revisions are rebuilt from the nearest later snapshot, a full copy kept
+every ``HISTORY_SNAPSHOT_INTERVAL`` revisions.
+"""
+
+import difflib
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from budge.config.main import (
+    HISTORY_SNAPSHOT_INTERVAL,
+    PROJECT_DB_PATH,
+    PROJECT_HISTORY_REVISIONS,
+    PROJECT_IDLE_TIMEOUT,
+    PROJECT_MAX_BYTES,
+    PROJECT_MAX_LINE_ITEMS,
+)
+
+LINE_ITEMS = "line_items"
+PROJECT_ID = "project_id"
+REVISION = "revision"
+
+# project keys computed from the inputs rather than entered
+DERIVED_KEYS = ("estimation_output", "report")
+
+# sqlite's default limit on query parameters is 999
+QUERY_CHUNK = 900
+
+# seconds; loads refresh a project's last access at most this often, so reads rarely write
+ACCESS_RESOLUTION = 60.0
+
+# columns copied out of the line item payload so they can be indexed
+LINE_ITEM_COLUMNS = ("method", "plant_type", "equipment", "equipment_type", "sizing_value")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    project_id TEXT PRIMARY KEY,
+    document TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_projects_last_access ON projects (last_access);
+CREATE TABLE IF NOT EXISTS line_items (
+    project_id TEXT NOT NULL REFERENCES projects (project_id) ON DELETE CASCADE,
+    item_id INTEGER NOT NULL,
+    method TEXT,
+    plant_type TEXT,
+    equipment TEXT,
+    equipment_type TEXT,
+    sizing_value REAL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (project_id, item_id)
+);
+CREATE INDEX IF NOT EXISTS idx_line_items_equipment
+    ON line_items (method, plant_type, equipment, equipment_type);
+CREATE TABLE IF NOT EXISTS revisions (
+    project_id TEXT NOT NULL REFERENCES projects (project_id) ON DELETE CASCADE,
+    revision INTEGER NOT NULL,
+    created REAL NOT NULL,
+    summary TEXT NOT NULL,
+    snapshot INTEGER NOT NULL DEFAULT 0,
+    document TEXT,
+    items TEXT,
+    undo_of INTEGER,
+    PRIMARY KEY (project_id, revision)
+);
+CREATE TABLE IF NOT EXISTS item_blobs (
+    project_id TEXT NOT NULL REFERENCES projects (project_id) ON DELETE CASCADE,
+    hash TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (project_id, hash)
+);
+"""
+
+
+def item_hash(payload: str) -> str:
+    """Hash of a serialized line item."""
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def document_delta(new: dict, old: dict) -> dict:
+    """
+    The changes that turn the project document ``new`` back into ``old``.
+
+    Returns:
+        dict: ``set``, the keys to set with their old values, and ``unset``,
+        the keys ``old`` does not have.
+    """
+    return {
+        "set": {key: value for key, value in old.items() if key not in new or new[key] != value},
+        "unset": [key for key in new if key not in old],
+    }
+
+
+def apply_document_delta(document: dict, delta: dict) -> dict:
+    document = {key: value for key, value in document.items() if key not in delta["unset"]}
+    document.update(delta["set"])
+    return document
+
+
+def items_delta(new: Sequence[str], old: Sequence[str]) -> List[Tuple[int, int, List[str]]]:
+    """
+    The changes that turn the item hash list ``new`` back into ``old``.
+
+    Returns:
+        list: ``(start, end, hashes)``: replace ``new[start:end]`` by ``hashes``; in ascending order.
+    """
+    matcher = difflib.SequenceMatcher(None, new, old, autojunk=False)
+    return [
+        (i1, i2, list(old[j1:j2]))
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def apply_items_delta(hashes: Sequence[str], delta) -> List[str]:
+    hashes = list(hashes)
+    # right to left, so the positions of the earlier slices stay valid
+    for start, end, replacement in reversed(delta):
+        hashes[start:end] = replacement
+    return hashes
+
+
+def delta_hashes(items_json: str, snapshot: bool) -> List[str]:
+    """The item hashes a stored revision refers to: all of a snapshot's, or those a delta puts back."""
+    items = json.loads(items_json)
+    if snapshot:
+        return items
+    return [h for _, _, replacement in items for h in replacement]
+
+
+def summarize(old: dict, new: dict, delta) -> str:
+    """
+    One line description of a revision, e.g. "scenarios; 2 line items changed".
+
+    Args:
+        old (dict): The previous document.
+        new (dict): The document of the revision.
+        delta (list): The ``items_delta`` from the revision back to the previous one.
+    """
+    parts = []
+    keys = sorted(key for key in set(old) | set(new) if old.get(key) != new.get(key) and key not in DERIVED_KEYS)
+    if keys:
+        parts.append(", ".join(keys))
+    counts = {"added": 0, "removed": 0, "changed": 0}
+    for start, end, replacement in delta:
+        paired = min(end - start, len(replacement))
+        counts["changed"] += paired
+        counts["added"] += end - start - paired
+        counts["removed"] += len(replacement) - paired
+    for change, count in counts.items():
+        if count:
+            parts.append(f"{count} line item{'s' if count != 1 else ''} {change}")
+    if not parts and any(old.get(key) != new.get(key) for key in DERIVED_KEYS):
+        parts.append("results")
+    return "; ".join(parts) or "no changes"
+
+
+class QuotaExceededError(ValueError):
+    """Raised when a project would exceed the configured size quotas."""
+
+
+class ProjectRepository:
+    """
+    Stores projects and their line items in a SQLite database.
+
+    Args:
+        path (str): Database file. Use ":memory:" only for single-threaded use.
+        max_bytes (int): Maximum serialized size of a project.
+        max_line_items (int): Maximum number of line items in a project.
+        idle_timeout (float): Seconds after the last access before a project is evicted.
+        history (int): Revisions kept per project; 0 disables the history.
+        snapshot_interval (int): A full snapshot is kept every this many revisions.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = PROJECT_MAX_BYTES,
+        max_line_items: int = PROJECT_MAX_LINE_ITEMS,
+        idle_timeout: float = PROJECT_IDLE_TIMEOUT,
+        history: int = PROJECT_HISTORY_REVISIONS,
+        snapshot_interval: int = HISTORY_SNAPSHOT_INTERVAL,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_line_items = max_line_items
+        self.idle_timeout = idle_timeout
+        self.history = history
+        self.snapshot_interval = max(snapshot_interval, 1)
+        self._local = threading.local()
+        self._last_eviction = 0.0
+        connection = self._connection()
+        connection.executescript(SCHEMA)
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(revisions)")]
+        if "undo_of" not in columns:
+            # databases created before undo kept its place in the history
+            connection.execute("ALTER TABLE revisions ADD COLUMN undo_of INTEGER")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite connections cannot be shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            self._local.connection = connection
+        return connection
+
+    def create(self, data: dict) -> str:
+        """Stores a new project and returns its id."""
+        project_id = uuid.uuid4().hex
+        self.save(project_id, data)
+        return project_id
+
+    def save(self, project_id: str, data: dict) -> int:
+        """
+        Replaces the stored project with ``data``.
+
+        Returns:
+            int: The new revision number of the project.
+
+        Raises:
+            QuotaExceededError: If the project is larger than the quotas allow.
+        """
+        return self._save(project_id, data)
+
+    def _save(self, project_id: str, data: dict, undo_of: Optional[int] = None) -> int:
+        document = {k: v for k, v in data.items() if k not in (LINE_ITEMS, PROJECT_ID, REVISION)}
+        document_json = json.dumps(document)
+        line_items = data.get(LINE_ITEMS) or []
+        if len(line_items) > self.max_line_items:
+            raise QuotaExceededError(
+                f"Project has {len(line_items)} line items, the limit is {self.max_line_items}."
+            )
+        rows = [self._line_item_row(project_id, item_id, item) for item_id, item in enumerate(line_items)]
+        size_bytes = len(document_json) + sum(len(row[-1]) for row in rows)
+        if size_bytes > self.max_bytes:
+            raise QuotaExceededError(
+                f"Project size is {size_bytes} bytes, the limit is {self.max_bytes} bytes."
+            )
+
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            # take the write lock before reading the current revision, so concurrent saves cannot both build on it
+            connection.execute("BEGIN IMMEDIATE")
+            previous = self._head(connection, project_id) if self.history else None
+            connection.execute(
+                """
+                INSERT INTO projects (project_id, document, size_bytes, revision, created, last_access)
+                VALUES (?, ?, ?, 1, ?, ?)
+                ON CONFLICT (project_id) DO UPDATE SET
+                    document = excluded.document,
+                    size_bytes = excluded.size_bytes,
+                    revision = projects.revision + 1,
+                    last_access = excluded.last_access
+                """,
+                (project_id, document_json, size_bytes, now, now),
+            )
+            connection.execute("DELETE FROM line_items WHERE project_id = ?", (project_id,))
+            connection.executemany(
+                "INSERT INTO line_items VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            (revision,) = connection.execute(
+                "SELECT revision FROM projects WHERE project_id = ?", (project_id,)
+            ).fetchone()
+            if self.history:
+                payloads = [row[-1] for row in rows]
+                self._record_revision(connection, project_id, previous, revision, document, payloads, now, undo_of)
+        self._maybe_evict(now)
+        return revision
+
+    def load(self, project_id: str) -> Optional[dict]:
+        """Returns the full project, or None if it does not exist or was evicted."""
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT document, revision, last_access FROM projects WHERE project_id = ?", (project_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[2] > min(ACCESS_RESOLUTION, self.idle_timeout / 2):
+            with connection:
+                connection.execute(
+                    "UPDATE projects SET last_access = ? WHERE project_id = ?",
+                    (now, project_id),
+                )
+        data = json.loads(row[0])
+        line_items = self.get_line_items(project_id)
+        if line_items:
+            data[LINE_ITEMS] = line_items
+        data[PROJECT_ID] = project_id
+        data[REVISION] = row[1]
+        return data
+
+    def delete(self, project_id: str) -> None:
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM projects WHERE project_id = ?", (project_id,))
+
+    def get_line_items(self, project_id: str) -> List[dict]:
+        rows = self._connection().execute(
+            "SELECT payload FROM line_items WHERE project_id = ? ORDER BY item_id",
+            (project_id,),
+        )
+        return [json.loads(payload) for (payload,) in rows]
+
+    def set_line_item(self, project_id: str, item_id: int, item: dict) -> Optional[int]:
+        """
+        Inserts or replaces a single line item without rewriting the project.
+
+        Returns:
+            int: The new revision number, or None if the project does not exist or was evicted.
+
+        Raises:
+            QuotaExceededError: If the project would be larger than the quotas allow.
+        """
+        row = self._line_item_row(project_id, item_id, item)
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            project = connection.execute(
+                "SELECT size_bytes FROM projects WHERE project_id = ?", (project_id,)
+            ).fetchone()
+            if project is None:
+                return None
+            count, replaced_bytes = connection.execute(
+                """
+                SELECT COUNT(*), COALESCE(SUM(CASE WHEN item_id = ? THEN LENGTH(payload) END), 0)
+                FROM line_items WHERE project_id = ?
+                """,
+                (item_id, project_id),
+            ).fetchone()
+            if not replaced_bytes:
+                count += 1
+            if count > self.max_line_items:
+                raise QuotaExceededError(
+                    f"Project would have {count} line items, the limit is {self.max_line_items}."
+                )
+            size_bytes = project[0] - replaced_bytes + len(row[-1])
+            if size_bytes > self.max_bytes:
+                raise QuotaExceededError(
+                    f"Project size would be {size_bytes} bytes, the limit is {self.max_bytes} bytes."
+                )
+            previous = self._head(connection, project_id) if self.history else None
+            connection.execute("INSERT OR REPLACE INTO line_items VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row)
+            now = time.time()
+            connection.execute(
+                "UPDATE projects SET revision = revision + 1, size_bytes = ?, last_access = ? WHERE project_id = ?",
+                (size_bytes, now, project_id),
+            )
+            if previous is not None:
+                payloads = [payload for _, payload in self._payload_rows(connection, project_id)]
+                self._record_revision(
+                    connection, project_id, previous, previous[0] + 1, previous[1], payloads, now
+                )
+            (revision,) = connection.execute(
+                "SELECT revision FROM projects WHERE project_id = ?", (project_id,)
+            ).fetchone()
+        return revision
+
+    def revisions(self, project_id: str) -> List[dict]:
+        """The recorded revisions of a project, newest first, each with its ``revision``, ``created`` and ``summary``."""
+        rows = self._connection().execute(
+            "SELECT revision, created, summary FROM revisions WHERE project_id = ? ORDER BY revision DESC",
+            (project_id,),
+        )
+        return [{"revision": revision, "created": created, "summary": summary} for revision, created, summary in rows]
+
+    def load_revision(self, project_id: str, revision: int) -> Optional[dict]:
+        """
+        Rebuilds a past revision of a project.
+
+        Returns:
+            dict: The project as it was saved at ``revision``, or None if the
+            project or that revision is no longer stored.
+        """
+        connection = self._connection()
+        head = self._head(connection, project_id)
+        if head is None or revision > head[0]:
+            return None
+        if revision == head[0]:
+            return self.load(project_id)
+        rows = connection.execute(
+            """
+            SELECT revision, snapshot, document, items FROM revisions
+            WHERE project_id = ? AND revision >= ? AND revision < ?
+            ORDER BY revision DESC
+            """,
+            (project_id, revision, head[0]),
+        ).fetchall()
+        if not rows or rows[-1][0] != revision or rows[0][0] != head[0] - 1:
+            return None
+
+        # start from the oldest snapshot that is not older than the revision, or else the current revision
+        start = next((i for i in range(len(rows) - 1, -1, -1) if rows[i][1]), None)
+        if start is None:
+            document, hashes = head[1], head[2]
+            deltas = rows
+        else:
+            document, hashes = json.loads(rows[start][2]), json.loads(rows[start][3])
+            deltas = rows[start + 1 :]
+        for _, _, document_json, items_json in deltas:
+            document = apply_document_delta(document, json.loads(document_json))
+            hashes = apply_items_delta(hashes, json.loads(items_json))
+
+        payloads = self._item_blobs(connection, project_id, hashes)
+        data = dict(document)
+        if hashes:
+            data[LINE_ITEMS] = [json.loads(payloads[h]) for h in hashes]
+        data[PROJECT_ID] = project_id
+        data[REVISION] = revision
+        return data
+
+    def restore(self, project_id: str, revision: int) -> Optional[int]:
+        """
+        Saves a past revision as the new current revision; later revisions are kept.
+
+        Returns:
+            int: The new revision number, or None if the revision is no longer stored.
+        """
+        data = self.load_revision(project_id, revision)
+        if data is None:
+            return None
+        return self.save(project_id, data)
+
+    def undo(self, project_id: str) -> Optional[int]:
+        """
+        Restores the revision before the current one as a new revision.
+
+        If the current revision was itself made by an undo, the revision before
+        the one that undo restored is restored instead, so repeated undos keep
+        stepping back through the history.
+
+        Returns:
+            int: The new revision number, or None if there is nothing left to undo.
+        """
+        head = self._connection().execute(
+            """
+            SELECT projects.revision, revisions.undo_of FROM projects
+            LEFT JOIN revisions ON revisions.project_id = projects.project_id AND revisions.revision = projects.revision
+            WHERE projects.project_id = ?
+            """,
+            (project_id,),
+        ).fetchone()
+        if head is None:
+            return None
+        revision, undo_of = head
+        target = (revision if undo_of is None else undo_of) - 1
+        if target < 1:
+            return None
+        data = self.load_revision(project_id, target)
+        if data is None:
+            return None
+        return self._save(project_id, data, undo_of=target)
+
+    def _head(self, connection, project_id: str):
+        """(revision, document, item hashes, item payloads) of the current revision, or None."""
+        row = connection.execute(
+            "SELECT revision, document FROM projects WHERE project_id = ?", (project_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        payloads = [payload for _, payload in self._payload_rows(connection, project_id)]
+        return row[0], json.loads(row[1]), [item_hash(payload) for payload in payloads], payloads
+
+    @staticmethod
+    def _payload_rows(connection, project_id: str):
+        return connection.execute(
+            "SELECT item_id, payload FROM line_items WHERE project_id = ? ORDER BY item_id",
+            (project_id,),
+        ).fetchall()
+
+    @staticmethod
+    def _item_blobs(connection, project_id: str, hashes: Sequence[str]) -> Dict[str, str]:
+        unique = list(set(hashes))
+        payloads = {}
+        for start in range(0, len(unique), QUERY_CHUNK):
+            chunk = unique[start : start + QUERY_CHUNK]
+            payloads.update(
+                connection.execute(
+                    f"SELECT hash, payload FROM item_blobs WHERE project_id = ? AND hash IN ({','.join('?' * len(chunk))})",
+                    (project_id, *chunk),
+                )
+            )
+        return payloads
+
+    def _record_revision(self, connection, project_id, previous, revision, document, payloads, now, undo_of=None) -> None:
+        """
+        Turns the previous current revision into a delta and records ``revision`` as the current one.
+
+        Revisions beyond the ``history`` limit are deleted, and with them the
+        item blobs no kept revision refers to.
+        """
+        hashes = [item_hash(payload) for payload in payloads]
+        connection.executemany(
+            "INSERT OR IGNORE INTO item_blobs VALUES (?, ?, ?)",
+            [(project_id, h, payload) for h, payload in zip(hashes, payloads)],
+        )
+        old_document, old_hashes = ({}, []) if previous is None else (previous[1], previous[2])
+        delta = items_delta(hashes, old_hashes)
+        if previous is not None:
+            old_revision = previous[0]
+            if old_revision % self.snapshot_interval == 0:
+                stored = (1, json.dumps(old_document), json.dumps(old_hashes))
+            else:
+                stored = (0, json.dumps(document_delta(document, old_document)), json.dumps(delta))
+            cursor = connection.execute(
+                "UPDATE revisions SET snapshot = ?, document = ?, items = ? WHERE project_id = ? AND revision = ?",
+                (*stored, project_id, old_revision),
+            )
+            if cursor.rowcount == 0:
+                # a project saved before the history was enabled; its items are not stored yet
+                connection.executemany(
+                    "INSERT OR IGNORE INTO item_blobs VALUES (?, ?, ?)",
+                    [(project_id, h, payload) for h, payload in zip(old_hashes, previous[3])],
+                )
+                connection.execute(
+                    "INSERT INTO revisions VALUES (?, ?, ?, ?, ?, ?, ?, NULL)",
+                    (project_id, old_revision, now, "", *stored),
+                )
+        connection.execute(
+            "INSERT OR REPLACE INTO revisions VALUES (?, ?, ?, ?, 0, NULL, NULL, ?)",
+            (project_id, revision, now, summarize(old_document, document, delta), undo_of),
+        )
+
+        expired = connection.execute(
+            "SELECT snapshot, items FROM revisions WHERE project_id = ? AND revision <= ? AND items IS NOT NULL",
+            (project_id, revision - self.history),
+        ).fetchall()
+        connection.execute(
+            "DELETE FROM revisions WHERE project_id = ? AND revision <= ?",
+            (project_id, revision - self.history),
+        )
+        # a kept revision is rebuilt from the current items and the hashes its
+        # later revisions put back, so only blobs the expired revisions put back
+        # can have lost their last reference
+        candidates = {h for snapshot, items in expired for h in delta_hashes(items, snapshot)}
+        candidates.difference_update(hashes)
+        if candidates:
+            for snapshot, items in connection.execute(
+                "SELECT snapshot, items FROM revisions WHERE project_id = ? AND items IS NOT NULL", (project_id,)
+            ):
+                candidates.difference_update(delta_hashes(items, snapshot))
+            connection.executemany(
+                "DELETE FROM item_blobs WHERE project_id = ? AND hash = ?",
+                [(project_id, h) for h in candidates],
+            )
+
+    def find_line_items(self, **filters) -> List[dict]:
+        """
+        Queries line items across all projects.
+
+        Args:
+            **filters: Equality filters on any of ``LINE_ITEM_COLUMNS``.
+
+        Returns:
+            list: Line items, each with the ``project_id`` it belongs to.
+        """
+        unknown = set(filters) - set(LINE_ITEM_COLUMNS)
+        if unknown:
+            raise ValueError(f"Cannot filter line items by: {', '.join(sorted(unknown))}")
+        where = " AND ".join(f"{column} = ?" for column in filters) or "1"
+        rows = self._connection().execute(
+            f"SELECT project_id, payload FROM line_items WHERE {where} ORDER BY project_id, item_id",
+            tuple(filters.values()),
+        )
+        return [{PROJECT_ID: project_id, **json.loads(payload)} for project_id, payload in rows]
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Deletes projects not accessed within ``idle_timeout``. Returns the number evicted."""
+        now = time.time() if now is None else now
+        connection = self._connection()
+        with connection:
+            cursor = connection.execute(
+                "DELETE FROM projects WHERE last_access < ?", (now - self.idle_timeout,)
+            )
+        return cursor.rowcount
+
+    def _maybe_evict(self, now: float) -> None:
+        # eviction is cheap thanks to the index, but there is no need to run it on every save
+        if now - self._last_eviction > min(self.idle_timeout, 60.0):
+            self._last_eviction = now
+            self.evict_idle(now)
+
+    @staticmethod
+    def _line_item_row(project_id: str, item_id: int, item: dict) -> tuple:
+        return (
+            project_id,
+            item_id,
+            *(item.get(column) for column in LINE_ITEM_COLUMNS),
+            json.dumps(item),
+        )
+
+
+_repository: Optional[ProjectRepository] = None
+_repository_lock = threading.Lock()
+
+
+def get_repository() -> Optional[ProjectRepository]:
+    """Returns the configured repository, or None when server-side storage is disabled."""
+    global _repository
+    if _repository is None and PROJECT_DB_PATH:
+        with _repository_lock:
+            if _repository is None:
+                _repository = ProjectRepository(PROJECT_DB_PATH)
+    return _repository
+
+
+def is_reference(data) -> bool:
+    """True if ``data`` is a reference to a server-side project rather than the project itself."""
+    return isinstance(data, dict) and PROJECT_ID in data and set(data) <= {PROJECT_ID, REVISION}
+
+
+def resolve(data):
+    """
+    Returns the full project for the data held in the browser store.
+
+    Project dicts are returned unchanged, so callbacks work the same whether or
+    not server-side storage is enabled. A reference to a project that has been
+    evicted resolves to None, which the pages treat as "project not loaded".
+    """
+    repository = get_repository()
+    if repository is None or not is_reference(data):
+        return data
+    return repository.load(data[PROJECT_ID])
+
+
+def persist(data):
+    """
+    Stores the project server-side and returns what the browser store should hold.
+
+    Without server-side storage the project itself is returned.
+    """
+    repository = get_repository()
+    if repository is None or data is None:
+        return data
+    project_id = data.get(PROJECT_ID)
+    if project_id is None:
+        project_id = repository.create(data)
+        revision = 1
+    else:
+        revision = repository.save(project_id, data)
+    # the revision makes every save a new value for the store, so dependent callbacks fire
+    return {PROJECT_ID: project_id, REVISION: revision}
+
+
+def persist_line_item(data, item_id: int, item: dict):
+    """
+    Stores one changed line item and returns what the browser store should hold.
+
+    Server-side projects only write that item's row; otherwise the project,
+    which already holds the change, is returned. Returns None if the
+    server-side project was evicted.
+    """
+    repository = get_repository()
+    if repository is None or data.get(PROJECT_ID) is None:
+        return data
+    revision = repository.set_line_item(data[PROJECT_ID], item_id, item)
+    if revision is None:
+        return None
+    return {PROJECT_ID: data[PROJECT_ID], REVISION: revision}
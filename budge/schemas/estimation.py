@@ -1,7 +1,11 @@
 """schemas/estimation.py"""
 
+from typing import Optional
+
 from pydantic import BaseModel, field_validator
 
+from budge.core.units import REGISTRY
+
 
 class EstimationInput(BaseModel):
     """Estimation input schema"""
@@ -11,6 +15,9 @@ class EstimationInput(BaseModel):
     equipment: str
     equipment_type: str
     sizing_value: float
+    sizing_unit: Optional[str] = None
+    allow_extrapolation: bool = False
+    area: Optional[str] = None
 
     @field_validator("method")
     @classmethod
@@ -46,3 +53,22 @@ class EstimationInput(BaseModel):
         if v is None or v <= 0:
             raise ValueError("Sizing quantity must be a positive number.")
         return v
+
+    @field_validator("sizing_unit", mode="before")
+    @classmethod
+    def sizing_unit_validate(cls, v):
+        # no unit means the unit of the catalog row
+        if v is None or not str(v).strip():
+            return None
+        code = REGISTRY.code(v)
+        if code is None:
+            raise ValueError(f"Unknown unit '{str(v).strip()}'.")
+        return code
+
+    @field_validator("area", mode="before")
+    @classmethod
+    def area_validate(cls, v):
+        # an empty area means the item is not assigned to one
+        if v is None or not str(v).strip():
+            return None
+        return str(v).strip()
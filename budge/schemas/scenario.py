@@ -0,0 +1,50 @@
+"""schemas/scenario.py"""
+
+from typing import Optional
+
+from pydantic import BaseModel, field_validator
+
+
+class ProjectFactors(BaseModel):
+    """Project-level factor overrides. An empty factor keeps the catalog value."""
+
+    offsites_factor: Optional[float] = None
+    design_and_engineering_factor: Optional[float] = None
+    contingency: Optional[float] = None
+    location_factor: Optional[float] = None
+
+    @field_validator(
+        "offsites_factor", "design_and_engineering_factor", "contingency", "location_factor", mode="before"
+    )
+    @classmethod
+    def blank_is_none(cls, v):
+        if isinstance(v, str) and not v.strip():
+            return None
+        return v
+
+    @field_validator("offsites_factor", "design_and_engineering_factor", "contingency")
+    @classmethod
+    def factor_validate(cls, v):
+        if v is not None and v < 0:
+            raise ValueError("Factor must not be negative.")
+        return v
+
+    @field_validator("location_factor")
+    @classmethod
+    def location_validate(cls, v):
+        if v is not None and v <= 0:
+            raise ValueError("Location factor must be a positive number.")
+        return v
+
+
+class Scenario(ProjectFactors):
+    """Named set of project-level factor overrides, priced side by side with the others."""
+
+    name: str
+
+    @field_validator("name")
+    @classmethod
+    def name_validate(cls, v):
+        if not v or not v.strip():
+            raise ValueError("Scenario name must not be empty.")
+        return v.strip()
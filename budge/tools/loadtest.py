@@ -0,0 +1,307 @@
+"""Multi-session load test of the Dash callback endpoints.
+
+Each simulated session replays what a user does in the browser: load a
+project, walk the dropdown cascade, fetch the catalog, save and run the
+estimate. Every callback step is sent to the callback endpoint exactly as the
+Dash renderer would, and the harness keeps each session's component values up
+to date from the responses.
+At the end it prints throughput, errors and p50/p95/p99 latency per step;
+failed requests only count as errors, not towards the latencies.
+
+Usage::
+
+    # start the app in-process and drive it through the Flask test client
+    python -m budge.tools.loadtest --sessions 20 --iterations 5
+
+    # drive a server that is already running
+    python -m budge.tools.loadtest --url http://127.0.0.1:5500 --sessions 50
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from budge.config.main import PROJECT_NAME, PROJECT_SLUG, STORE_ID
+
+PROJECT_DEFAULT_PATH = Path(__file__).resolve().parent.parent / "config/project_default.json"
+
+STORE = f"{STORE_ID}.data"
+ESTIMATION = "bw-estimation"
+
+
+class Step(NamedTuple):
+    """
+    One request: a callback, given by the output it updates, the input that
+    triggers it and the values the user set, or with ``path`` a GET of that
+    path under the routes prefix.
+    """
+
+    name: str
+    output: str = ""
+    trigger: str = ""
+    changes: dict = {}
+    path: str = ""
+
+
+def user_session_steps(project: dict) -> List[Step]:
+    """
+    The callback sequence of a user who opens a project and prices the equipment.
+
+    The report page is not replayed: its progress table reads page progress
+    keys that ``Project.get_progress`` never sets, and its generate button
+    calls a ``generate_report`` that is not defined, so both fail on every
+    request whatever the project holds.
+    """
+    item = project["estimation_input"]
+    return [
+        Step("display inputs", f"{ESTIMATION}_input.children", STORE),
+        Step("run button", f"{ESTIMATION}_run_container.children", STORE),
+        Step(
+            "plant options",
+            f"{ESTIMATION}_plant_dropdown.options",
+            f"{ESTIMATION}_method_dropdown.value",
+            {f"{ESTIMATION}_method_dropdown.value": item["method"]},
+        ),
+        Step(
+            "equipment options",
+            f"{ESTIMATION}_equipment_dropdown.options",
+            f"{ESTIMATION}_plant_dropdown.value",
+            {f"{ESTIMATION}_plant_dropdown.value": item["plant_type"]},
+        ),
+        Step(
+            "equipment type options",
+            f"{ESTIMATION}_equipment_type_dropdown.options",
+            f"{ESTIMATION}_equipment_dropdown.value",
+            {f"{ESTIMATION}_equipment_dropdown.value": item["equipment"]},
+        ),
+        # the sizing label is looked up in the browser, in the catalog it downloads
+        Step("catalog", path="catalog"),
+        Step(
+            "save",
+            STORE,
+            f"{ESTIMATION}_save_btn.n_clicks",
+            {
+                f"{ESTIMATION}_equipment_type_dropdown.value": item["equipment_type"],
+                f"{ESTIMATION}_sizing_quantity_input.value": item["sizing_value"],
+                f"{ESTIMATION}_save_btn.n_clicks": 1,
+            },
+        ),
+        Step("run", STORE, f"{ESTIMATION}_run_btn.n_clicks", {f"{ESTIMATION}_run_btn.n_clicks": 1}),
+        Step("display output", f"{ESTIMATION}_output.children", STORE),
+    ]
+
+
+def clean(prop_id: str) -> str:
+    """Drops the ``@hash`` Dash appends to duplicate outputs."""
+    return prop_id.split("@")[0]
+
+
+class Callback:
+    """A callback as listed by the ``_dash-dependencies`` endpoint."""
+
+    def __init__(self, spec: dict):
+        self.output = spec["output"]
+        if self.output.startswith(".."):
+            parts = self.output.strip(".").split("...")
+        else:
+            parts = [self.output]
+        self.outputs = []
+        for part in parts:
+            component_id, _, prop = part.rpartition(".")
+            self.outputs.append({"id": component_id, "property": prop})
+        self.multi = self.output.startswith("..")
+        self.inputs = spec.get("inputs", [])
+        self.state = spec.get("state", [])
+
+    def writes(self, prop_id: str) -> bool:
+        return any(clean(f"{o['id']}.{o['property']}") == prop_id for o in self.outputs)
+
+    def reads(self, prop_id: str) -> bool:
+        return any(f"{i['id']}.{i['property']}" == prop_id for i in self.inputs)
+
+    def body(self, values: dict, changed: List[str]) -> dict:
+        def with_values(specs):
+            return [
+                {**spec, "value": values.get(f"{spec['id']}.{spec['property']}")} for spec in specs
+            ]
+
+        return {
+            "output": self.output,
+            "outputs": self.outputs if self.multi else self.outputs[0],
+            "inputs": with_values(self.inputs),
+            "state": with_values(self.state),
+            "changedPropIds": changed,
+        }
+
+
+class InProcessClient:
+    """Talks to an app created in this process through the Flask test client."""
+
+    def __init__(self, server):
+        self._server = server
+        self._local = threading.local()
+
+    def _client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self._server.test_client()
+        return client
+
+    def get(self, path: str):
+        response = self._client().get(path)
+        return response.status_code, response.get_json(silent=True)
+
+    def post(self, path: str, body: dict):
+        response = self._client().post(path, json=body)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpClient:
+    """Talks to a running server over HTTP, one connection pool per thread."""
+
+    def __init__(self, url: str):
+        import requests
+
+        self._requests = requests
+        self._url = url.rstrip("/")
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        return session
+
+    def get(self, path: str):
+        response = self._session().get(self._url + path, timeout=60)
+        return response.status_code, response.json() if response.content else None
+
+    def post(self, path: str, body: dict):
+        response = self._session().post(self._url + path, json=body, timeout=60)
+        return response.status_code, response.json() if response.content else None
+
+
+class LoadTest:
+    """
+    Replays the user session steps from many sessions at once.
+
+    Args:
+        client: ``InProcessClient`` or ``HttpClient``.
+        project (dict): The project each session loads.
+        prefix (str): The Dash routes prefix, e.g. "/budge/".
+    """
+
+    def __init__(self, client, project: dict, prefix: str = f"/{PROJECT_SLUG}/"):
+        self.client = client
+        self.project = project
+        self.prefix = prefix
+        self.steps = user_session_steps(project)
+        status, dependencies = client.get(prefix + "_dash-dependencies")
+        if status != 200:
+            raise RuntimeError(f"Could not read the callback list, status {status}")
+        self.callbacks = [Callback(spec) for spec in dependencies]
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def find(self, step: Step) -> Callback:
+        for callback in self.callbacks:
+            if callback.writes(step.output) and callback.reads(step.trigger):
+                return callback
+        raise LookupError(f"No callback updates {step.output} when {step.trigger} changes")
+
+    def run_session(self) -> None:
+        # what the upload on the start page leaves in the browser
+        values = {STORE: json.loads(json.dumps(self.project))}
+        for step in self.steps:
+            callback = None if step.path else self.find(step)
+            values.update(step.changes)
+            start = time.perf_counter()
+            try:
+                if callback is None:
+                    status, _ = self.client.get(self.prefix + step.path)
+                    response = None
+                else:
+                    body = callback.body(values, [step.trigger])
+                    status, response = self.client.post(self.prefix + "_dash-update-component", body)
+            except Exception:
+                status, response = -1, None
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                if status in (200, 204):
+                    self.latencies[step.name].append(elapsed)
+                else:
+                    self.errors[step.name] += 1
+            for component_id, props in ((response or {}).get("response") or {}).items():
+                for prop, value in props.items():
+                    values[f"{component_id}.{prop}"] = value
+
+    def run(self, sessions: int, iterations: int = 1, concurrency: Optional[int] = None) -> float:
+        """Runs ``sessions * iterations`` sessions, ``concurrency`` at a time. Returns the wall time."""
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency or sessions) as pool:
+            for future in [pool.submit(self.run_session) for _ in range(sessions * iterations)]:
+                future.result()
+        return time.perf_counter() - start
+
+    def report(self, wall_time: float) -> str:
+        """Throughput plus, per step, the successful requests, the errors and the latency percentiles of the successes."""
+        errors = sum(self.errors.values())
+        total = sum(len(v) for v in self.latencies.values()) + errors
+        lines = [
+            f"{total} requests in {wall_time:.2f} s, {total / wall_time:.1f} requests/s, {errors} errors",
+            f"{'step':<24} {'ok':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}",
+        ]
+        for step in self.steps:
+            latencies = sorted(self.latencies.get(step.name, []))
+            if not latencies and not self.errors.get(step.name):
+                continue
+            if latencies:
+                percentiles = " ".join(f"{percentile(latencies, q) * 1000:>9.1f}" for q in (50, 95, 99))
+            else:
+                percentiles = " ".join(f"{'-':>9}" for _ in range(3))
+            lines.append(f"{step.name:<24} {len(latencies):>6} {self.errors.get(step.name, 0):>6} {percentiles}")
+        return "\n".join(lines)
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    index = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Base URL of a running server. Starts the app in-process if omitted.")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent simulated sessions.")
+    parser.add_argument("--iterations", type=int, default=3, help="Sessions each worker replays.")
+    parser.add_argument("--project", type=Path, default=PROJECT_DEFAULT_PATH, help="Project json each session loads.")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        client = HttpClient(args.url)
+    else:
+        from budge.app import init_app
+
+        dash_app = init_app(server=True, project_slug=PROJECT_SLUG, app_title=PROJECT_NAME)
+        client = InProcessClient(dash_app.server)
+
+    project = json.loads(args.project.read_text())
+    load_test = LoadTest(client, project)
+    # one warm-up session so imports and first-request setup are not measured
+    load_test.run_session()
+    load_test.latencies.clear()
+    load_test.errors.clear()
+
+    wall_time = load_test.run(args.sessions, args.iterations, concurrency=args.sessions)
+    print(load_test.report(wall_time))
+
+
+if __name__ == "__main__":
+    main()
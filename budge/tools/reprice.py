@@ -0,0 +1,127 @@
+"""Portfolio reprice of a large line item list on all cores.
+
+Reads line items from a CSV file with the method, plant type, equipment,
+equipment type and sizing value columns, prices them against the current
+catalog on a process pool (see ``budge.core.parallel``) and appends the costs
+to an output CSV chunk by chunk, in input order. Without ``--input`` it runs
+a benchmark on generated items instead. It prices the same items once per
+worker count, checks every run against the single-process result and prints
+the throughput and speedup.
+
+Usage::
+
+    python -m budge.tools.reprice --input portfolio.csv --output priced.csv --workers 8
+
+    python -m budge.tools.reprice --items 2000000 --workers 1,2,4,8
+"""
+
+import argparse
+import sys
+import time
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from budge.core import catalog, parallel, units
+from budge.core.validation import RangeStatus
+
+KEY_COLUMNS = ("method", "plant_type", "equipment", "equipment_type")
+
+
+def resolve_frame(
+    frame: pd.DataFrame, material_catalog: catalog.Catalog
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Catalog positions (0 for unknown items), a mask of the known items, the sizes in catalog
+    units and a mask of the sizes whose unit converts, of a line item table.
+
+    Sizes are in the ``sizing_unit`` column where the table has one, else in catalog units.
+    """
+    keys = pd.MultiIndex.from_tuples(list(material_catalog.index), names=KEY_COLUMNS)
+    found = keys.get_indexer(pd.MultiIndex.from_frame(frame[list(KEY_COLUMNS)].astype(str)))
+    known = found >= 0
+    positions = np.where(known, np.asarray(list(material_catalog.index.values()))[found], 0).astype(np.int64)
+    sizes = pd.to_numeric(frame["sizing_value"], errors="coerce").to_numpy(dtype=np.float64)
+    sizing_units = frame["sizing_unit"].to_numpy(dtype=object) if "sizing_unit" in frame else [None] * len(frame)
+    sizes, convertible = units.to_catalog_units(material_catalog, positions, sizes, sizing_units)
+    return positions, known, sizes, convertible
+
+
+def reprice(input_path: str, output_path: str, workers: int, chunk_rows: int, allow_extrapolation: bool) -> int:
+    """Prices the line items of ``input_path`` into ``output_path``. Returns the number of items."""
+    material_catalog = catalog.get_catalog()
+    frame = pd.read_csv(input_path)
+    positions, known, sizes, convertible = resolve_frame(frame, material_catalog)
+    start = 0
+    chunks = parallel.price_batches(
+        material_catalog, positions, sizes, allow_extrapolation, workers=workers, chunk_rows=chunk_rows
+    )
+    for costs in chunks:
+        stop = start + len(costs["status"])
+        chunk = frame.iloc[start:stop].copy()
+        unknown = ~known[start:stop]
+        for name in parallel.COST_FIELDS:
+            chunk[name] = np.where(unknown, np.nan, costs[name])
+        status = np.where(~convertible[start:stop], RangeStatus.INVALID_UNIT, costs["status"])
+        status = np.where(unknown, RangeStatus.UNKNOWN_ITEM, status)
+        chunk["status"] = [RangeStatus.LABELS[code] for code in status.tolist()]
+        chunk.to_csv(output_path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+        start = stop
+    return start
+
+
+def benchmark(items: int, worker_counts: List[int], chunk_rows: int) -> bool:
+    """Prices ``items`` generated items once per worker count. Returns whether every run matched."""
+    # imported here: spawned workers import this module, and stress pulls in the charts
+    from budge.tools.stress import sample_line_items
+
+    material_catalog = catalog.get_catalog()
+    line_items = sample_line_items(material_catalog, min(items, 10_000))
+    frame = pd.DataFrame(line_items).sample(items, replace=True, random_state=0)
+    positions, _, sizes, _ = resolve_frame(frame, material_catalog)
+    scenario_list = [{"name": "base"}, {"name": "remote site", "location_factor": 1.3}]
+
+    print(f"{'workers':>7} {'seconds':>8} {'items/s':>11} {'speedup':>8} {'match':>6}")
+    expected, single, ok = None, None, True
+    for workers in worker_counts:
+        start = time.perf_counter()
+        total = np.zeros(len(scenario_list))
+        for costs in parallel.price_batches(
+            material_catalog, positions, sizes, scenario_list=scenario_list, workers=workers, chunk_rows=chunk_rows
+        ):
+            total += np.nansum(costs["scenarios"], axis=0)
+        seconds = time.perf_counter() - start
+        expected = total if expected is None else expected
+        single = single or seconds
+        match = np.allclose(total, expected, rtol=1e-12)
+        ok = ok and match
+        print(f"{workers:>7} {seconds:>8.2f} {items / seconds:>11,.0f} {single / seconds:>7.2f}x {'yes' if match else 'NO':>6}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--input", help="CSV of line items to price. Runs the benchmark if omitted.")
+    parser.add_argument("--output", help="CSV the priced line items are written to.")
+    parser.add_argument(
+        "--workers", default=str(parallel.default_workers()), help="Worker processes; comma separated for the benchmark."
+    )
+    parser.add_argument("--chunk-rows", type=int, default=parallel.CHUNK_ROWS, help="Line items per task.")
+    parser.add_argument("--allow-extrapolation", action="store_true", help="Price items outside their sizing range.")
+    parser.add_argument("--items", type=int, default=1_000_000, help="Generated line items for the benchmark.")
+    args = parser.parse_args(argv)
+
+    worker_counts = [int(w) for w in args.workers.split(",")]
+    if args.input:
+        if not args.output:
+            parser.error("--output is required with --input")
+        start = time.perf_counter()
+        count = reprice(args.input, args.output, worker_counts[0], args.chunk_rows, args.allow_extrapolation)
+        print(f"Priced {count:,} line items in {time.perf_counter() - start:.1f} s.")
+        return
+    sys.exit(0 if benchmark(args.items, worker_counts, args.chunk_rows) else 1)
+
+
+if __name__ == "__main__":
+    main()
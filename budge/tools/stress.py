@@ -0,0 +1,202 @@
+"""Concurrency stress test of the shared catalog and result caches.
+
+Many threads price projects, search the catalog and draw report figures
+while another thread keeps swapping the process-wide catalog between two
+versions, the second with doubled cost coefficients. Every result is checked
+against the one computed single-threaded for the catalog version the thread
+fetched, so a result that mixes versions or comes out of a corrupted cache is
+counted as a mismatch. The run is repeated for each thread count to show how
+throughput scales.
+
+Usage::
+
+    python -m budge.tools.stress --threads 1,2,4,8 --seconds 5
+"""
+
+import argparse
+import copy
+import json
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from budge.core import catalog
+from budge.core.definitions import Factors
+from budge.project import charts, estimation, graph
+
+PROJECT_DEFAULT_PATH = Path(__file__).resolve().parent.parent / "config/project_default.json"
+
+SEARCH_QUERIES = ("vessel", "pump", "heat exchanger", "vert cs", "tank")
+LOCATION_FACTORS = (None, 0.9, 1.0, 1.15, 1.3, 1.6)
+
+
+def scaled_catalog(layers, factor: float) -> catalog.Catalog:
+    """The catalog with the ``a`` and ``b`` cost coefficients of its base layer multiplied by ``factor``."""
+    frame = catalog.read_material_data(layers[0][1])
+    frame[Factors.A] = frame[Factors.A] * factor
+    frame[Factors.B] = frame[Factors.B] * factor
+    path = Path(tempfile.mkdtemp()) / "materials_factor_scaled.csv"
+    frame.to_csv(path, index=False, encoding="ISO-8859-1")
+    return catalog.build_catalog([(layers[0][0], str(path)), *layers[1:]])
+
+
+def sample_line_items(material_catalog: catalog.Catalog, count: int, seed: int = 0) -> List[dict]:
+    """Material factor line items sized inside their range, spread over the catalog."""
+    arrays = material_catalog.arrays
+    sized = np.flatnonzero(~arrays.is_hand & np.isfinite(arrays.s_lower) & np.isfinite(arrays.s_upper))
+    rng = random.Random(seed)
+    items = []
+    for position in rng.choices(sized.tolist(), k=count):
+        row = material_catalog.row(position)
+        method, plant_type, equipment, equipment_type = row.key
+        items.append(
+            {
+                "method": method,
+                "plant_type": plant_type,
+                "equipment": equipment,
+                "equipment_type": equipment_type,
+                "sizing_value": round(rng.uniform(row.s_lower, row.s_upper), 3),
+                "allow_extrapolation": False,
+            }
+        )
+    return items
+
+
+def make_projects(base: dict, line_items: List[dict]) -> List[dict]:
+    """Variants of the project that differ in their line items and location factor."""
+    projects = []
+    for i, location_factor in enumerate(LOCATION_FACTORS):
+        project = copy.deepcopy(base)
+        project["estimation_input"] = dict(line_items[i])
+        project["line_items"] = line_items[i : i + len(line_items) // 2]
+        project["project_factors"] = {"location_factor": location_factor}
+        projects.append(project)
+    return projects
+
+
+def fingerprint(project: dict, material_catalog: catalog.Catalog) -> tuple:
+    """The results a thread computes for a project; equal results give equal fingerprints."""
+    output = estimation.run_calculation(dict(project), material_catalog)["estimation_output"]
+    costs = estimation.price_line_items(project["line_items"], material_catalog)
+    searches = tuple(tuple(material_catalog.search(query, limit=5).index) for query in SEARCH_QUERIES)
+    return (
+        output["purchased_cost_output"],
+        output["total_fixed_capital_cost_output"],
+        json.dumps(output["totals"], sort_keys=True),
+        float(np.nansum(costs["total_fixed_capital_cost"])),
+        searches,
+    )
+
+
+class StressTest:
+    """
+    Runs the workload on many threads while the catalog is swapped underneath.
+
+    Args:
+        catalogs (list): The catalog versions to swap between.
+        projects (list): The projects the workers price.
+        swap_interval (float): Seconds between catalog swaps.
+    """
+
+    def __init__(self, catalogs: List[catalog.Catalog], projects: List[dict], swap_interval: float = 0.005):
+        self.catalogs = catalogs
+        self.projects = projects
+        self.swap_interval = swap_interval
+        # single-threaded reference results, per catalog version and project
+        self.expected: Dict[Tuple[str, int], tuple] = {}
+        for material_catalog in catalogs:
+            for i, project in enumerate(projects):
+                self.expected[material_catalog.version, i] = fingerprint(project, material_catalog)
+        graph.PROJECT_GRAPH.clear()
+
+    def run(self, threads: int, seconds: float) -> dict:
+        """Runs the workload on ``threads`` threads for ``seconds``. Returns the counters."""
+        stop = threading.Event()
+        counts: Dict[str, int] = defaultdict(int)
+        lock = threading.Lock()
+
+        def swap():
+            i = 0
+            while not stop.is_set():
+                i += 1
+                catalog.set_catalog(self.catalogs[i % len(self.catalogs)])
+                with lock:
+                    counts["swaps"] += 1
+                stop.wait(self.swap_interval)
+
+        def work(seed: int):
+            rng = random.Random(seed)
+            local = defaultdict(int)
+            while not stop.is_set():
+                i = rng.randrange(len(self.projects))
+                material_catalog = catalog.get_catalog()
+                try:
+                    result = fingerprint(self.projects[i], material_catalog)
+                    charts.get_figures(self.projects[i], material_catalog)
+                except Exception as e:
+                    local["errors"] += 1
+                    print(f"error: {type(e).__name__}: {e}", file=sys.stderr)
+                    continue
+                local["operations"] += 1
+                if result != self.expected[material_catalog.version, i]:
+                    local["mismatches"] += 1
+            with lock:
+                for key, value in local.items():
+                    counts[key] += value
+
+        workers = [threading.Thread(target=work, args=(seed,)) for seed in range(threads)]
+        swapper = threading.Thread(target=swap)
+        start = time.perf_counter()
+        swapper.start()
+        for worker in workers:
+            worker.start()
+        time.sleep(seconds)
+        stop.set()
+        for worker in workers + [swapper]:
+            worker.join()
+        counts["seconds"] = time.perf_counter() - start
+        return dict(counts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", default="1,2,4,8", help="Comma separated thread counts to run.")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each run.")
+    parser.add_argument("--items", type=int, default=200, help="Line items per project.")
+    parser.add_argument("--swap-interval", type=float, default=0.005, help="Seconds between catalog swaps.")
+    args = parser.parse_args(argv)
+
+    layers = catalog.parse_layers()
+    original = catalog.get_catalog()
+    catalogs = [original, scaled_catalog(layers, 2.0)]
+    base = json.loads(PROJECT_DEFAULT_PATH.read_text())
+    projects = make_projects(base, sample_line_items(original, args.items))
+    stress_test = StressTest(catalogs, projects, args.swap_interval)
+
+    print(f"{'threads':>7} {'ops':>8} {'ops/s':>9} {'scaling':>8} {'swaps':>7} {'errors':>7} {'mismatches':>10}")
+    failed = False
+    single = None
+    try:
+        for threads in [int(t) for t in args.threads.split(",")]:
+            counts = stress_test.run(threads, args.seconds)
+            rate = counts.get("operations", 0) / counts["seconds"]
+            single = single or rate
+            print(
+                f"{threads:>7} {counts.get('operations', 0):>8} {rate:>9.1f} {rate / single if single else 0:>7.2f}x "
+                f"{counts.get('swaps', 0):>7} {counts.get('errors', 0):>7} {counts.get('mismatches', 0):>10}"
+            )
+            failed = failed or counts.get("errors", 0) or counts.get("mismatches", 0)
+    finally:
+        catalog.set_catalog(original)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
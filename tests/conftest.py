@@ -0,0 +1,32 @@
+from pathlib import Path
+
+import pytest
+
+from budge.core import catalog
+
+ROOT = Path(__file__).resolve().parent.parent
+MATERIAL_DATA = ROOT / "materials_factor.csv"
+
+
+@pytest.fixture(scope="session")
+def layers():
+    return [(catalog.BASE_LAYER, str(MATERIAL_DATA))]
+
+
+@pytest.fixture(scope="session")
+def material_catalog(layers):
+    """The repository's catalog, also made the process-wide catalog."""
+    return catalog.load_catalog(layers)
+
+
+def catalog_item(material_catalog, position: int, sizing_value: float, **fields) -> dict:
+    """A line item for the catalog row at ``position``."""
+    method, plant_type, equipment, equipment_type = material_catalog.row(position).key
+    return {
+        "method": method,
+        "plant_type": plant_type,
+        "equipment": equipment,
+        "equipment_type": equipment_type,
+        "sizing_value": sizing_value,
+        **fields,
+    }
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from budge.core import catalog
+from budge.core.definitions import Factors
+from budge.core.schema import CatalogSchemaError
+
+HEADER = "Method,Plant Type,Equipment,Equipment Type,Sizing Quantity,Units,S lower,S upper,a,b,n,Material Factor\n"
+
+
+def write_layer(tmp_path, name: str, rows: str) -> str:
+    path = tmp_path / f"{name}.csv"
+    path.write_text(HEADER + rows, encoding="ISO-8859-1")
+    return str(path)
+
+
+def test_later_layers_override_cells_they_fill(tmp_path):
+    base = write_layer(tmp_path, "base", "material factors,solid,Pump,A,Power,kW,1,10,100,10,0.8,1.0\nmaterial factors,solid,Pump,B,Power,kW,1,10,200,20,0.8,1.0\n")
+    vendor = write_layer(tmp_path, "vendor", "material factors,solid,Pump,A,,,,,150,,,\nmaterial factors,solid,Pump,C,Power,kW,2,20,300,30,0.7,1.0\n")
+    material_catalog = catalog.build_catalog([("base", base), ("vendor", vendor)])
+    row = material_catalog.find("material factors", "solid", "Pump", "A")
+    assert (row.a, row.b, row.s_upper, row.layer) == (150.0, 10.0, 10.0, "vendor")
+    assert material_catalog.find("material factors", "solid", "Pump", "B").layer == "base"
+    assert material_catalog.find("material factors", "solid", "Pump", "C").a == 300.0
+    assert len(material_catalog.data) == 3
+
+
+def test_duplicate_keys_within_a_layer_are_rejected(tmp_path):
+    rows = (
+        "material factors,solid,Pump,A,Power,kW,1,10,100,10,0.8,1.0\n"
+        "material factors,solid,Pump,B,Power,kW,1,10,100,10,0.8,1.0\n"
+        "material factors,solid,Pump,A,Power,kW,1,10,120,10,0.8,1.0\n"
+    )
+    with pytest.raises(CatalogSchemaError, match="duplicate .* on lines 2, 4"):
+        catalog.build_catalog([("base", write_layer(tmp_path, "base", rows))])
+
+
+def test_invalid_cells_are_reported_by_line(tmp_path):
+    rows = "material factors,solid,Pump,A,Power,kW,10,1,abc,10,0.8,1.0\n"
+    with pytest.raises(CatalogSchemaError) as error:
+        catalog.build_catalog([("base", write_layer(tmp_path, "base", rows))])
+    assert "a is not a number on lines 2" in str(error.value)
+    assert f"{Factors.S_LOWER} is above {Factors.S_UPPER} on lines 2" in str(error.value)
+
+
+def test_version_follows_content(tmp_path, layers):
+    first = catalog.build_catalog(layers)
+    assert catalog.build_catalog(layers).version == first.version
+    path = write_layer(tmp_path, "base", "material factors,solid,Pump,A,Power,kW,1,10,100,10,0.8,1.0\n")
+    assert catalog.build_catalog([("base", path)]).version != first.version
+
+
+def test_reload_listeners_see_both_catalogs(tmp_path, material_catalog):
+    reloads = []
+    catalog.add_reload_listener(lambda previous, current: reloads.append((previous, current)))
+    path = write_layer(tmp_path, "base", "material factors,solid,Pump,A,Power,kW,1,10,100,10,0.8,1.0\n")
+    replacement = catalog.build_catalog([("base", path)])
+    try:
+        catalog.set_catalog(replacement)
+        assert catalog.get_catalog() is replacement
+    finally:
+        catalog.set_catalog(material_catalog)
+    assert reloads == [(material_catalog, replacement), (replacement, material_catalog)]
+
+
+def test_arrays_hold_text_as_codes(material_catalog):
+    arrays = material_catalog.arrays
+    assert arrays.equipment.dtype == np.int32
+    positions = np.arange(len(arrays))
+    assert arrays.text("equipment", positions).tolist() == material_catalog.data[Factors.EQUIPMENT].astype(str).tolist()
+    assert material_catalog.row(3).key == tuple(material_catalog.data.loc[3, list(Factors.KEY_COLUMNS)])
+    assert arrays.is_hand.tolist() == (material_catalog.data[Factors.METHOD] == "Hand").tolist()
@@ -0,0 +1,43 @@
+import gzip
+from types import SimpleNamespace
+
+import flask
+import pytest
+
+from budge.core import catalog_api
+from budge.core.definitions import Factors
+
+
+@pytest.fixture
+def client(material_catalog):
+    dash_app = SimpleNamespace(server=flask.Flask(__name__))
+    catalog_api.register_routes(dash_app, "/budge/")
+    return dash_app.server.test_client()
+
+
+def test_versioned_catalog(client, material_catalog):
+    url = catalog_api.catalog_url("/budge/", material_catalog.version)
+    response = client.get(url)
+    assert response.status_code == 200
+    assert "immutable" in response.headers["Cache-Control"]
+    document = response.get_json()
+    assert document["rows"] == len(material_catalog.data)
+    equipment = document["columns"][Factors.EQUIPMENT]
+    assert [equipment["categories"][code] for code in equipment["codes"]] == material_catalog.data[Factors.EQUIPMENT].tolist()
+    assert client.get(url, headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+
+def test_gzip_has_its_own_etag(client, material_catalog):
+    url = catalog_api.catalog_url("/budge/", material_catalog.version)
+    plain = client.get(url)
+    gzipped = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(gzipped.data) == plain.data
+    assert gzipped.headers["ETag"] != plain.headers["ETag"]
+
+
+def test_current_catalog_names_its_versioned_url(client, material_catalog):
+    response = client.get("/budge/catalog")
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert response.headers["Content-Location"] == catalog_api.catalog_url("/budge/", material_catalog.version)
+    assert client.get("/budge/catalog/unknown.json").status_code == 404
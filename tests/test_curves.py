@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from budge.core.curves import CostCurves, parse_points
+from budge.core.definitions import Factors
+
+
+def curve_frame(*curves) -> pd.DataFrame:
+    rows = []
+    for i, (sizes, costs, mode) in enumerate(curves):
+        rows.append(
+            {
+                Factors.METHOD: "material factors",
+                Factors.PLANT_TYPE: "solid",
+                Factors.EQUIPMENT: "Pump",
+                Factors.EQUIPMENT_TYPE: f"Type {i}",
+                Factors.CURVE_SIZES: sizes,
+                Factors.CURVE_COSTS: costs,
+                Factors.CURVE_INTERPOLATION: mode,
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def test_parse_points():
+    np.testing.assert_array_equal(parse_points("10; 20;50"), [10.0, 20.0, 50.0])
+    assert parse_points(None).size == 0
+    assert parse_points(np.nan).size == 0
+    assert parse_points("  ").size == 0
+
+
+def test_rows_without_points_use_the_correlation():
+    curves = CostCurves.from_catalog(curve_frame(("10;20", "100;200", "linear"), (None, None, None)))
+    assert len(curves) == 1
+    np.testing.assert_array_equal(curves.curve_of_row, [0, -1])
+    np.testing.assert_array_equal(curves.bounds(), [[10.0, 20.0]])
+
+
+def test_linear_and_log_interpolation():
+    curves = CostCurves.from_catalog(
+        curve_frame(("20; 10; 40", "200; 100; 300", "linear"), ("1;100", "10;1000", ""))
+    )
+    costs = curves.evaluate([0, 0, 0, 0, 1, 1], [10.0, 15.0, 30.0, 50.0, 10.0, 1000.0])
+    # unsorted points are sorted; sizes beyond the curve extend its last segment
+    np.testing.assert_allclose(costs, [100.0, 150.0, 250.0, 350.0, 100.0, 10_000.0])
+    assert curves.evaluate([], []).size == 0
+
+
+@pytest.mark.parametrize(
+    "sizes, costs, mode",
+    [("10", "100", "linear"), ("10;20", "100", "linear"), ("10;10", "1;2", "linear"), ("0;10", "1;2", "log"), ("1;2", "1;2", "cubic")],
+)
+def test_malformed_curves_are_rejected(sizes, costs, mode):
+    with pytest.raises(ValueError):
+        CostCurves.from_catalog(curve_frame((sizes, costs, mode)))
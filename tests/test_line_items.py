@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from budge.project import line_items
+from budge.project.line_items import LineItemTable
+
+from tests.conftest import catalog_item
+
+
+def table() -> LineItemTable:
+    items = [
+        {"method": "m", "plant_type": "solid", "equipment": "Pump", "sizing_value": 3.0},
+        {"method": "m", "plant_type": "fluid", "equipment": "Tank", "sizing_value": 1.0},
+        {"method": "m", "plant_type": "solid", "equipment": "Mixer", "sizing_value": 2.0},
+    ]
+    values = {
+        "sizing_unit": np.array(["kW", "m³", "kW"], dtype=object),
+        "purchased_cost": np.array([30.0, np.nan, 20.0]),
+        "total_fixed_capital_cost": np.array([90.0, np.nan, 60.0]),
+        "status": np.array(["in range", "unknown item", "in range"], dtype=object),
+    }
+    return LineItemTable.build(items, values)
+
+
+def test_block_sorts_and_filters():
+    block = table().block(
+        {
+            "startRow": 0,
+            "endRow": 10,
+            "sortModel": [{"colId": "sizing_value", "sort": "asc"}],
+            "filterModel": {"plant_type": {"type": "equals", "filter": "SOLID"}},
+        }
+    )
+    assert block["rowCount"] == 2
+    assert [row["item_id"] for row in block["rowData"]] == [2, 0]
+    assert block["rowData"][0]["equipment"] == "Mixer"
+
+
+def test_number_filters_and_blank_costs():
+    rows = table()
+    assert rows.mask({"purchased_cost": {"type": "blank"}}).tolist() == [False, True, False]
+    assert rows.mask({"sizing_value": {"type": "inRange", "filter": 1.5, "filterTo": 3}}).tolist() == [True, False, True]
+    either = {"operator": "OR", "conditions": [{"type": "equals", "filter": "pump"}, {"type": "equals", "filter": "tank"}]}
+    assert rows.mask({"equipment": either}).tolist() == [True, True, False]
+    assert rows.block({"startRow": 1, "endRow": 2})["rowData"][0]["purchased_cost"] is None
+
+
+def test_with_row_inserts_new_categories_in_order():
+    rows = table()
+    item = {"method": "m", "plant_type": "gas", "equipment": "Blower", "sizing_value": 5.0}
+    values = {
+        "sizing_unit": np.array(["m³/h"], dtype=object),
+        "purchased_cost": np.array([50.0]),
+        "total_fixed_capital_cost": np.array([150.0]),
+        "status": np.array(["in range"], dtype=object),
+    }
+    patched = rows.with_row(1, item, values)
+    assert patched.categories["plant_type"].tolist() == ["fluid", "gas", "solid"]
+    block = patched.block({"sortModel": [{"colId": "equipment", "sort": "asc"}]})
+    assert [row["equipment"] for row in block["rowData"]] == ["Blower", "Mixer", "Pump"]
+    # the original table is unchanged
+    assert rows.block({})["rowData"][1]["equipment"] == "Tank"
+
+
+def test_set_sizing_value_reprices_one_row(material_catalog):
+    data = {"line_items": [catalog_item(material_catalog, 0, 10.0), catalog_item(material_catalog, 3, 10_000.0)]}
+    before = line_items.get_table(data, material_catalog).numbers["purchased_cost"].copy()
+    line_items.set_sizing_value(data, 0, "20", material_catalog)
+    after = line_items.get_table(data, material_catalog)
+    fresh = line_items.LineItemTable.build(
+        data["line_items"], line_items.item_values(data, data["line_items"], material_catalog)
+    )
+    np.testing.assert_allclose(after.numbers["purchased_cost"], fresh.numbers["purchased_cost"])
+    assert after.numbers["purchased_cost"][0] > before[0]
+    assert after.numbers["purchased_cost"][1] == before[1]
+
+
+@pytest.mark.parametrize("item_id, value", [(5, 10.0), (0, "abc"), (0, -1.0)])
+def test_set_sizing_value_rejects_bad_input(material_catalog, item_id, value):
+    data = {"line_items": [catalog_item(material_catalog, 0, 10.0)]}
+    with pytest.raises(ValueError):
+        line_items.set_sizing_value(data, item_id, value, material_catalog)
@@ -0,0 +1,36 @@
+import flask
+import pytest
+
+from budge.monitoring import profiling
+
+app = flask.Flask(__name__)
+
+
+def target(headers: dict, remote_addr: str = "127.0.0.1"):
+    with app.test_request_context(headers=headers, environ_base={"REMOTE_ADDR": remote_addr}):
+        return profiling.requested_target()
+
+
+@pytest.fixture(autouse=True)
+def defaults(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_ENABLED", False)
+    monkeypatch.setattr(profiling, "PROFILE_ALLOWED_ADDRS", ())
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "")
+
+
+def test_header_is_ignored_by_default():
+    assert target({profiling.PROFILE_HEADER: "1"}) is None
+
+
+def test_header_with_token(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "secret")
+    assert target({profiling.PROFILE_HEADER: "1", profiling.TOKEN_HEADER: "secret"}) == ""
+    assert target({profiling.PROFILE_HEADER: "store", profiling.TOKEN_HEADER: "secret"}) == "store"
+    assert target({profiling.PROFILE_HEADER: "1", profiling.TOKEN_HEADER: "wrong"}) is None
+    assert target({profiling.PROFILE_HEADER: "1"}) is None
+
+
+def test_header_from_allowed_address(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_ALLOWED_ADDRS", ("10.0.0.5",))
+    assert target({profiling.PROFILE_HEADER: "1"}, remote_addr="10.0.0.5") == ""
+    assert target({profiling.PROFILE_HEADER: "1"}, remote_addr="10.0.0.6") is None
@@ -0,0 +1,63 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from budge.core import result_store
+from budge.core.result_store import ResultStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultStore(str(tmp_path / "results.db"), max_bytes=10_000, max_entry_bytes=4_000)
+
+
+def test_round_trip(store):
+    assert store.put("key", {"costs": np.arange(3.0)}, version="v1")
+    np.testing.assert_array_equal(store.get("key")["costs"], [0.0, 1.0, 2.0])
+    assert store.get("missing", "default") == "default"
+    assert len(store) == 1
+
+
+def test_large_and_unpicklable_results_are_not_stored(store):
+    assert not store.put("large", b"x" * 5_000)
+    assert not store.put("lambda", lambda: None)
+    assert len(store) == 0
+
+
+def test_least_recently_used_results_are_evicted(store, monkeypatch):
+    for i in range(3):
+        monkeypatch.setattr(result_store.time, "time", lambda i=i: 1_000.0 + i * 100)
+        store.put(f"key{i}", b"x" * 3_000)
+    # a hit refreshes the access time of key0, so key1 is now the oldest
+    monkeypatch.setattr(result_store.time, "time", lambda: 2_000.0)
+    assert store.get("key0") is not None
+    store.put("key3", b"x" * 3_000)
+    assert store.size() <= store.max_bytes
+    assert store.get("key0") is not None and store.get("key3") is not None
+    assert store.get("key1") is None
+
+
+def test_clear_by_version(store):
+    store.put("a", 1, version="v1")
+    store.put("b", 2, version="v2")
+    store.clear("v1")
+    assert store.get("a") is None and store.get("b") == 2
+    store.clear()
+    assert len(store) == 0
+
+
+def test_other_format_version_is_cleared(tmp_path):
+    path = str(tmp_path / "results.db")
+    ResultStore(path).put("key", 1)
+    connection = sqlite3.connect(path)
+    connection.execute(f"PRAGMA user_version = {result_store.FORMAT_VERSION + 1}")
+    connection.commit()
+    connection.close()
+    assert ResultStore(path).get("key") is None
+
+
+def test_stores_share_the_file(tmp_path):
+    path = str(tmp_path / "results.db")
+    ResultStore(path).put("key", [1, 2])
+    assert ResultStore(path).get("key") == [1, 2]
@@ -0,0 +1,34 @@
+import numpy as np
+
+from budge.core import rollup
+from budge.core.definitions import Factors
+
+
+def test_value_codes_merge_blank_and_padded_values():
+    groups = rollup.value_codes(["B", " A", None, "", "A ", np.nan], "Unassigned")
+    labels = groups.labels[groups.codes].tolist()
+    assert labels == ["B", "A", "Unassigned", "Unassigned", "A", "Unassigned"]
+    assert groups.labels.tolist() == sorted(groups.labels.tolist())
+
+
+def test_rollup_sums_and_counts_priced_items():
+    area = rollup.value_codes(["north", "south", "north", "north"], "Unassigned")
+    measures = rollup.Measures(
+        {"purchased_cost": np.array([1.0, 2.0, np.nan, 4.0]), "count_me": np.array([1.0, 1.0, 1.0, 1.0])}
+    )
+    rows = rollup.to_rows(rollup.rollup([area], measures), ["area"], ["purchased_cost", "count_me"])
+    assert rows == [
+        {"area": "north", "count": 3, "purchased_cost": 5.0, "priced.purchased_cost": 2, "count_me": 3.0, "priced.count_me": 3},
+        {"area": "south", "count": 1, "purchased_cost": 2.0, "priced.purchased_cost": 1, "count_me": 1.0, "priced.count_me": 1},
+    ]
+
+
+def test_rollup_over_two_dimensions_keeps_only_present_groups(material_catalog):
+    positions = np.array([0, 0, 3, 3, 3])
+    known = np.array([True, True, True, True, False])
+    equipment = rollup.catalog_codes(material_catalog, Factors.EQUIPMENT, positions, known)
+    area = rollup.value_codes(["a", "b", "a", "a", "a"], "Unassigned")
+    result = rollup.rollup([equipment, area], rollup.Measures({"cost": np.arange(5, dtype=float)}))
+    groups = list(zip(*(labels.tolist() for labels in result["labels"])))
+    assert groups == [("Agitators and Mixers", "a"), ("Agitators and Mixers", "b"), ("Boilers", "a"), ("Unknown", "a")]
+    assert result["cost"].tolist() == [0.0, 1.0, 5.0, 4.0]
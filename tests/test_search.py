@@ -0,0 +1,26 @@
+from budge.core.definitions import Factors
+from budge.core.search import tokenize, trigrams
+
+
+def test_tokenize_and_trigrams():
+    assert tokenize("Vertical, CS (m³)") == ["vertical", "cs", "m³"]
+    assert trigrams("cs") == ["  c", " cs", "cs "]
+
+
+def test_search_ranks_matching_rows_first(material_catalog):
+    rows = material_catalog.search("pressure vessel vertical", limit=5)
+    assert len(rows) == 5
+    assert rows.iloc[0][Factors.EQUIPMENT] == "Pressure Vessels"
+    assert rows.iloc[0][Factors.EQUIPMENT_TYPE].startswith("Vertical")
+    assert list(rows["score"]) == sorted(rows["score"], reverse=True)
+
+
+def test_search_tolerates_typos(material_catalog):
+    rows = material_catalog.search("centrifgal compresor", limit=3)
+    assert (rows[Factors.EQUIPMENT] == "Compressors").any()
+
+
+def test_search_without_matches(material_catalog):
+    assert material_catalog.search("", limit=5).empty
+    assert material_catalog.search("zzzzqqq", limit=5).empty
+    assert len(material_catalog.search_index.search("pump", limit=2)) <= 2
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from budge.core import pricing, splitting
+
+
+def test_oversized_item_is_split_into_units_within_range(material_catalog):
+    # row 0 is sized from 5 to 75
+    result = splitting.split_units(material_catalog, [0, 0], [200.0, 50.0])
+    units, unit_size, last = result["units"], result["unit_size"], result["last_unit_size"]
+    assert units.tolist() == [3, 1]
+    assert 5.0 <= unit_size[0] <= 75.0 and 5.0 <= last[0] <= unit_size[0]
+    np.testing.assert_allclose((units[0] - 1) * unit_size[0] + last[0], 200.0)
+    np.testing.assert_allclose(last[1], 50.0)
+    assert result["cost"][1] <= result["single_unit_cost"][1] * (1 + 1e-9)
+
+
+def test_installed_cost_objective(material_catalog):
+    result = splitting.split_units(material_catalog, [0], [200.0], objective=splitting.INSTALLED_COST)
+    sizes = np.array([result["unit_size"][0]] * (result["units"][0] - 1) + [result["last_unit_size"][0]])
+    purchased = pricing.purchased_cost(material_catalog, np.zeros(len(sizes), dtype=np.int64), sizes)
+    factor = splitting.unit_cost_factor(material_catalog, np.array([0]), splitting.INSTALLED_COST)
+    np.testing.assert_allclose(result["cost"][0], purchased.sum() * factor[0])
+
+
+def test_item_that_cannot_be_split(material_catalog):
+    # below S lower no count of units fits
+    result = splitting.split_units(material_catalog, [0], [2.0], max_units=3)
+    assert result["units"].tolist() == [0]
+    assert np.isnan(result["cost"][0])
+
+
+def test_unknown_objective(material_catalog):
+    with pytest.raises(ValueError):
+        splitting.split_units(material_catalog, [0], [10.0], objective="weight")
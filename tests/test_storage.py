@@ -0,0 +1,153 @@
+import json
+import time
+
+import pytest
+
+from budge.project import storage
+from budge.project.storage import LINE_ITEMS, REVISION, ProjectRepository, QuotaExceededError
+
+
+def item(i: int, size: float = 10.0) -> dict:
+    return {"method": "material factors", "plant_type": "solid", "equipment": f"Pump {i}", "sizing_value": size}
+
+
+@pytest.fixture
+def repository(tmp_path):
+    return ProjectRepository(str(tmp_path / "projects.db"), max_bytes=5_000, max_line_items=5, snapshot_interval=3)
+
+
+def test_save_and_load(repository):
+    project_id = repository.create({"name": "plant", LINE_ITEMS: [item(0), item(1)]})
+    data = repository.load(project_id)
+    assert data["name"] == "plant"
+    assert data[LINE_ITEMS] == [item(0), item(1)]
+    assert data[REVISION] == 1
+    assert repository.load("missing") is None
+
+
+def test_line_item_quota(repository):
+    with pytest.raises(QuotaExceededError):
+        repository.create({LINE_ITEMS: [item(i) for i in range(6)]})
+    project_id = repository.create({LINE_ITEMS: [item(i) for i in range(5)]})
+    repository.set_line_item(project_id, 4, item(4, 20.0))
+    with pytest.raises(QuotaExceededError):
+        repository.set_line_item(project_id, 5, item(5))
+    assert len(repository.get_line_items(project_id)) == 5
+
+
+def test_size_quota(repository):
+    with pytest.raises(QuotaExceededError):
+        repository.create({"notes": "x" * 6_000})
+    project_id = repository.create({LINE_ITEMS: [item(0)]})
+    with pytest.raises(QuotaExceededError):
+        repository.set_line_item(project_id, 0, dict(item(0), notes="x" * 6_000))
+    # replacing an item counts its new size instead of the old one
+    for _ in range(3):
+        repository.set_line_item(project_id, 0, dict(item(0), notes="x" * 2_000))
+    assert repository.get_line_items(project_id)[0]["notes"] == "x" * 2_000
+
+
+def test_set_line_item_of_evicted_project(repository):
+    project_id = repository.create({LINE_ITEMS: [item(0)]})
+    repository.delete(project_id)
+    assert repository.set_line_item(project_id, 0, item(0, 20.0)) is None
+    assert repository.get_line_items(project_id) == []
+
+
+def test_load_refreshes_last_access_rarely(repository, monkeypatch):
+    project_id = repository.create({"name": "a"})
+    connection = repository._connection()
+    created = connection.execute("SELECT last_access FROM projects").fetchone()[0]
+    repository.load(project_id)
+    assert connection.execute("SELECT last_access FROM projects").fetchone()[0] == created
+    monkeypatch.setattr(storage.time, "time", lambda: created + 3_600)
+    repository.load(project_id)
+    assert connection.execute("SELECT last_access FROM projects").fetchone()[0] == created + 3_600
+
+
+def test_revisions_rebuild_every_saved_state(repository):
+    states = [{"name": f"v{i}", LINE_ITEMS: [item(j, 10.0 + i) for j in range(i % 4 + 1)]} for i in range(8)]
+    project_id = repository.create(states[0])
+    for state in states[1:]:
+        repository.save(project_id, state)
+    assert [r["revision"] for r in repository.revisions(project_id)] == list(range(8, 0, -1))
+    for revision, state in enumerate(states, start=1):
+        data = repository.load_revision(project_id, revision)
+        assert data["name"] == state["name"]
+        assert data.get(LINE_ITEMS, []) == state[LINE_ITEMS]
+
+
+def test_revision_summary(repository):
+    project_id = repository.create({"name": "a", LINE_ITEMS: [item(0), item(1)]})
+    repository.save(project_id, {"name": "b", LINE_ITEMS: [item(0, 99.0), item(1), item(2)]})
+    assert repository.revisions(project_id)[0]["summary"] == "name; 1 line item added; 1 line item changed"
+
+
+def test_set_line_item_records_revision(repository):
+    project_id = repository.create({LINE_ITEMS: [item(0), item(1)]})
+    revision = repository.set_line_item(project_id, 1, item(1, 50.0))
+    assert revision == 2
+    assert repository.load_revision(project_id, 1)[LINE_ITEMS] == [item(0), item(1)]
+    assert repository.load(project_id)[LINE_ITEMS] == [item(0), item(1, 50.0)]
+
+
+def test_restore(repository):
+    project_id = repository.create({"name": "a"})
+    repository.save(project_id, {"name": "b"})
+    assert repository.restore(project_id, 1) == 3
+    assert repository.load(project_id)["name"] == "a"
+    assert repository.load_revision(project_id, 2)["name"] == "b"
+    assert repository.restore(project_id, 9) is None
+
+
+def test_repeated_undo_steps_back_through_the_history(repository):
+    project_id = repository.create({"name": "a"})
+    repository.save(project_id, {"name": "b"})
+    repository.save(project_id, {"name": "c"})
+    names = []
+    while repository.undo(project_id) is not None:
+        names.append(repository.load(project_id)["name"])
+    assert names == ["b", "a"]
+    # a save after undoing starts over from the new current revision
+    repository.save(project_id, {"name": "d"})
+    repository.undo(project_id)
+    assert repository.load(project_id)["name"] == "a"
+    assert repository.undo("missing") is None
+
+
+def test_expired_item_blobs_are_deleted(tmp_path):
+    repository = ProjectRepository(str(tmp_path / "projects.db"), history=3, snapshot_interval=2)
+    project_id = repository.create({LINE_ITEMS: [item(0), item(1, 0.0)]})
+    for size in range(1, 8):
+        repository.save(project_id, {LINE_ITEMS: [item(0), item(1, float(size))]})
+    connection = repository._connection()
+    stored = {payload for (payload,) in connection.execute("SELECT payload FROM item_blobs")}
+    kept = [repository.load_revision(project_id, r["revision"]) for r in repository.revisions(project_id)]
+    referenced = {json.dumps(line_item) for data in kept for line_item in data[LINE_ITEMS]}
+    assert stored == referenced
+    assert len(stored) == 4
+
+
+def test_history_is_bounded(tmp_path):
+    repository = ProjectRepository(str(tmp_path / "projects.db"), history=3)
+    project_id = repository.create({"name": "v0"})
+    for i in range(1, 6):
+        repository.save(project_id, {"name": f"v{i}"})
+    assert [r["revision"] for r in repository.revisions(project_id)] == [6, 5, 4]
+    assert repository.load_revision(project_id, 2) is None
+    assert repository.load_revision(project_id, 4)["name"] == "v3"
+
+
+def test_find_line_items_across_projects(repository):
+    first = repository.create({LINE_ITEMS: [item(0), item(1)]})
+    second = repository.create({LINE_ITEMS: [item(1)]})
+    found = repository.find_line_items(equipment="Pump 1")
+    assert sorted(row["project_id"] for row in found) == sorted([first, second])
+    with pytest.raises(ValueError):
+        repository.find_line_items(colour="red")
+
+
+def test_idle_projects_are_evicted(repository):
+    project_id = repository.create({"name": "a"})
+    assert repository.evict_idle(now=time.time() + repository.idle_timeout + 1) == 1
+    assert repository.load(project_id) is None
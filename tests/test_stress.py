@@ -0,0 +1,38 @@
+import json
+
+from budge.core import catalog
+from budge.core.cache import SharedCache
+from budge.tools import stress
+
+
+def test_shared_cache_keeps_first_value():
+    cache = SharedCache(4)
+    assert cache.put("a", 1) == 1
+    assert cache.put("a", 2) == 1
+    assert cache.get_or_compute("a", lambda: 3) == 1
+    assert cache.get_or_compute("b", lambda: 4) == 4
+
+
+def test_shared_cache_evicts_least_recently_used():
+    cache = SharedCache(4, evict_fraction=0.25)
+    for key in "abcd":
+        cache.put(key, key)
+    cache.get("a")
+    cache.put("e", "e")
+    assert len(cache) == 4
+    assert "a" in cache and "e" in cache
+    assert "b" not in cache
+
+
+def test_threads_see_consistent_results_while_catalog_swaps(material_catalog, layers):
+    catalogs = [material_catalog, stress.scaled_catalog(layers, 2.0)]
+    base = json.loads(stress.PROJECT_DEFAULT_PATH.read_text())
+    projects = stress.make_projects(base, stress.sample_line_items(material_catalog, 20))
+    try:
+        counts = stress.StressTest(catalogs, projects, swap_interval=0.01).run(threads=3, seconds=1.0)
+    finally:
+        catalog.set_catalog(material_catalog)
+    assert counts.get("operations", 0) > 0
+    assert counts.get("swaps", 0) > 1
+    assert counts.get("errors", 0) == 0
+    assert counts.get("mismatches", 0) == 0
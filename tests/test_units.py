@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from budge.core import units
+from budge.core.units import BLANK, REGISTRY, UNKNOWN, Unit, UnitRegistry
+
+
+@pytest.mark.parametrize("text", ["m³/h", "m3/hr", " M3 per hour ", "mÂ³/h", "m^3/h"])
+def test_spellings_of_one_unit(text):
+    assert REGISTRY.code(text) == "m³/h"
+
+
+def test_blank_and_unknown_units():
+    assert REGISTRY.index(None) == BLANK
+    assert REGISTRY.index("  ") == BLANK
+    assert REGISTRY.index("furlongs") == UNKNOWN
+    assert REGISTRY.code("furlongs") is None
+    assert REGISTRY.compatible("furlongs") == []
+
+
+def test_conversion_factors():
+    from_indices = REGISTRY.indices(["m³/h", "kW", "", "kg", "furlongs"])
+    to_indices = REGISTRY.indices(["m³/s", "W", "kW", "m", "m"])
+    factors = REGISTRY.factors(from_indices, to_indices)
+    np.testing.assert_allclose(factors[:3], [1 / 3600, 1000.0, 1.0])
+    assert np.isnan(factors[3:]).all()
+
+
+def test_compatible_units_start_with_the_unit_itself():
+    compatible = REGISTRY.compatible("gpm")
+    assert compatible[0] == "gal/min"
+    assert "m³/h" in compatible and "kW" not in compatible
+
+
+def test_conflicting_aliases_are_rejected():
+    with pytest.raises(ValueError):
+        UnitRegistry([Unit("m", "length", 1.0), Unit("M", "length", 1e6)])
+
+
+def test_sizes_convert_to_catalog_units(material_catalog):
+    # row 0 is sized in kW, row 7 in m³/h
+    positions = np.array([0, 0, 7, 7])
+    sizes, convertible = units.to_catalog_units(material_catalog, positions, [10.0, 10.0, 1.0, 1.0], ["MW", None, "m³/s", "kg"])
+    np.testing.assert_allclose(sizes[:3], [10_000.0, 10.0, 3600.0])
+    assert convertible.tolist() == [True, True, True, False]
+    entered = units.entered_units(material_catalog, positions, np.ones(4, dtype=bool), ["MW", None, "m³/s", ""])
+    assert entered.tolist() == ["MW", "kW", "m³/s", "m³/h"]
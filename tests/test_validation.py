@@ -0,0 +1,43 @@
+import numpy as np
+
+from budge.core.definitions import Factors
+from budge.core.validation import RangeStatus, check_ranges, diagnostics, priceable
+
+
+def test_check_ranges(material_catalog):
+    # row 0 is sized from 5 to 75
+    positions = np.zeros(6, dtype=np.int64)
+    status = check_ranges(material_catalog, positions, [10.0, 1.0, 100.0, 0.0, np.nan, 75.0])
+    assert status.tolist() == [
+        RangeStatus.IN_RANGE,
+        RangeStatus.BELOW_RANGE,
+        RangeStatus.ABOVE_RANGE,
+        RangeStatus.INVALID_SIZE,
+        RangeStatus.INVALID_SIZE,
+        RangeStatus.IN_RANGE,
+    ]
+    assert status.dtype == np.int8
+
+
+def test_missing_bounds(material_catalog):
+    position = int(np.flatnonzero(material_catalog.data[Factors.S_LOWER].isna())[0])
+    assert check_ranges(material_catalog, [position], [10.0]).tolist() == [RangeStatus.MISSING_BOUNDS]
+
+
+def test_priceable():
+    status = np.array(
+        [RangeStatus.IN_RANGE, RangeStatus.MISSING_BOUNDS, RangeStatus.BELOW_RANGE, RangeStatus.INVALID_SIZE, RangeStatus.UNKNOWN_ITEM],
+        dtype=np.int8,
+    )
+    assert priceable(status).tolist() == [True, True, False, False, False]
+    assert priceable(status, allow_extrapolation=True).tolist() == [True, True, True, False, False]
+
+
+def test_diagnostics(material_catalog):
+    positions = np.zeros(3, dtype=np.int64)
+    sizes = [10.0, 100.0, 100.0]
+    status = np.array([RangeStatus.IN_RANGE, RangeStatus.ABOVE_RANGE, RangeStatus.UNKNOWN_ITEM], dtype=np.int8)
+    results = diagnostics(material_catalog, positions, sizes, status, allow_extrapolation=True)
+    assert results[0] == {"status": "in range", "priced": True, "extrapolated": False, "message": ""}
+    assert results[1]["extrapolated"] and results[1]["message"].endswith("The cost is extrapolated.")
+    assert results[2]["status"] == "unknown item" and not results[2]["priced"]